@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+
+'''Run the benchmark suite, and compare the timings with a stored baseline.
+
+    python benchmarks/run_benchmarks.py                  # compare with baseline.json
+    python benchmarks/run_benchmarks.py --save-baseline  # overwrite baseline.json
+    python benchmarks/run_benchmarks.py --filter readfq  # only matching benchmarks
+
+Each benchmark is run --repeat times and the fastest time is kept. A
+benchmark is reported as a regression (and the exit status is 1) when it is
+more than --tolerance times slower than the baseline. Baselines are only
+comparable on the same machine, so save one before making changes.
+'''
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+REPO_ROOT = os.path.join(BENCHMARK_DIR, '..')
+sys.path = [REPO_ROOT, BENCHMARK_DIR] + sys.path
+
+import bird_tool_utils
+from bird_tool_utils import BirdArgparser, SeqReader, SeqStats, ReadNameSet, count_records, \
+    extract_reads, sort_records, subsample_reads, track_progress, workspace
+
+import synthetic
+
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+_benchmarks = []
+
+
+def benchmark(name):
+    '''Register a benchmark. The decorated function is called with the data
+    directory and returns a callable to be timed, which returns a value that
+    is checked to be the same as in the baseline.'''
+    def decorator(setup):
+        _benchmarks.append((name, setup))
+        return setup
+    return decorator
+
+
+def _count_records(records):
+    count = 0
+    total_length = 0
+    for record in records:
+        count += 1
+        total_length += len(record[1])
+    return [count, total_length]
+
+
+def _reader_benchmark(filename, writer, parser, bytes_mode, **kwargs):
+    def setup(data_dir):
+        path = os.path.join(data_dir, filename)
+        if not os.path.exists(path):
+            writer(path, **kwargs)
+
+        def run():
+            with open(path, 'rb' if bytes_mode else 'r') as f:
+                return _count_records(getattr(SeqReader(), parser)(f, bytes_mode=bytes_mode))
+        return run
+    return setup
+
+
+_READER_CASES = [
+    ('fastq_short', 'short.fq', synthetic.write_fastq, 'readfq',
+     dict(num_records=100000, length=150)),
+    ('fastq_variable', 'variable.fq', synthetic.write_fastq, 'readfq',
+     dict(num_records=20000, length=1000, length_spread=900)),
+    ('fasta_unwrapped', 'unwrapped.fa', synthetic.write_fasta, 'readfa',
+     dict(num_records=100000, length=150)),
+    ('fasta_wrapped60', 'wrapped.fa', synthetic.write_fasta, 'readfa',
+     dict(num_records=2000, length=10000, line_width=60)),
+]
+
+for (_case, _filename, _writer, _parser, _kwargs) in _READER_CASES:
+    for _bytes_mode in (False, True):
+        benchmark('{}_{}_{}'.format(_parser, _case, 'bytes' if _bytes_mode else 'text'))(
+            _reader_benchmark(_filename, _writer, _parser, _bytes_mode, **_kwargs))
+
+
+def _short_fastq_fixture(data_dir):
+    '''Return the path of the short read FASTQ of the readfq benchmarks,
+    writing it first if needed'''
+    path = os.path.join(data_dir, 'short.fq')
+    if not os.path.exists(path):
+        synthetic.write_fastq(path, **_READER_CASES[0][4])
+    return path
+
+
+@benchmark('seqstats_fastq_short')
+def _seqstats(data_dir):
+    path = _short_fastq_fixture(data_dir)
+
+    def run():
+        summary = SeqStats.from_path(path).summary()
+        return [summary['num_records'], summary['n50'], summary['gc_fraction']]
+    return run
+
+
+@benchmark('subsample_fastq_short_fraction')
+def _subsample(data_dir):
+    path = _short_fastq_fixture(data_dir)
+
+    def run():
+        with open(path, 'rb') as f:
+            return _count_records(subsample_reads(f, fraction=0.1, seed=1))
+    return run
+
+
+@benchmark('readfq_fastq_short_bytes_progress')
+def _progress(data_dir):
+    path = _short_fastq_fixture(data_dir)
+
+    def run():
+        with open(path, 'rb') as f:
+            return _count_records(track_progress(SeqReader().readfq(f, bytes_mode=True), fp=f))
+    return run
+
+
+@benchmark('readfq_prefetch_fastq_short_bytes')
+def _prefetch(data_dir):
+    path = _short_fastq_fixture(data_dir)
+
+    def run():
+        with open(path, 'rb') as f:
+            return _count_records(SeqReader().readfq_prefetch(f, bytes_mode=True))
+    return run
+
+
+@benchmark('count_records_fastq_short')
+def _count(data_dir):
+    path = _short_fastq_fixture(data_dir)
+
+    def run():
+        return list(count_records(path))
+    return run
+
+
+@benchmark('extract_reads_fastq_short')
+def _extract(data_dir):
+    path = _short_fastq_fixture(data_dir)
+    names = ReadNameSet('read{}'.format(i) for i in range(0, 100000, 10))
+
+    def run():
+        with open(path, 'rb') as f:
+            return _count_records(extract_reads(names, f))
+    return run
+
+
+@benchmark('sort_records_fastq_short_spilled')
+def _sort(data_dir):
+    path = _short_fastq_fixture(data_dir)
+
+    def run():
+        with open(path, 'rb') as f:
+            # Small enough a budget that runs are written to disk and merged
+            return _count_records(sort_records(
+                SeqReader().readfq(f, bytes_mode=True), key='sequence', dedupe=True,
+                memory_budget=16 * 1024 * 1024, scratch_dir=data_dir))
+    return run
+
+
+@benchmark('iterable_chunks')
+def _iterable_chunks(data_dir):
+    def run():
+        return sum(1 for _ in bird_tool_utils.iterable_chunks(range(1000000), 100))
+    return run
+
+
+@benchmark('table_roff_10000_rows')
+def _table_roff(data_dir):
+    table = synthetic.random_table(10000, 5)
+
+    def run():
+        return len(bird_tool_utils.table_roff(table))
+    return run
+
+
+@benchmark('write_table_roff_10000_rows')
+def _write_table_roff(data_dir):
+    table = synthetic.random_table(10000, 5)
+
+    def run():
+        sink = io.StringIO()
+        bird_tool_utils.write_table_roff(iter(table), sink)
+        return len(sink.getvalue())
+    return run
+
+
+def _build_parser(num_subcommands):
+    parser = BirdArgparser(program='Benchmark', program_invocation='benchmark')
+    for i in range(num_subcommands):
+        subparser = parser.new_subparser('command{}'.format(i), 'description of command {}'.format(i))
+        for j in range(20):
+            subparser.add_argument('--option{}'.format(j), help='help for option {}'.format(j))
+    return parser
+
+
+@benchmark('argparser_construction_30_subcommands')
+def _argparser_construction(data_dir):
+    def run():
+        return len(_build_parser(30)._subparser_name_to_parser)
+    return run
+
+
+@benchmark('argparser_parse_the_args')
+def _argparser_parse(data_dir):
+    def run():
+        parser = _build_parser(30)
+        saved = sys.argv
+        sys.argv = ['benchmark', 'command3', '--option1', 'value']
+        try:
+            return parser.parse_the_args().option1
+        finally:
+            sys.argv = saved
+    return run
+
+
+@benchmark('import_bird_tool_utils')
+def _import(data_dir):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT
+
+    # Includes interpreter startup, as experienced when running a bird tool
+    def run():
+        subprocess.run([sys.executable, '-c', 'import bird_tool_utils'], env=env, check=True)
+        return None
+    return run
+
+
+def run_benchmarks(data_dir, name_filter=None, repeat=5):
+    '''Return a dict of benchmark name to {'seconds': fastest time,
+    'result': value returned}'''
+    results = {}
+    for name, setup in _benchmarks:
+        if name_filter is not None and name_filter not in name:
+            continue
+        run = setup(data_dir)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = run()
+            times.append(time.perf_counter() - start)
+        results[name] = {'seconds': min(times), 'result': result}
+        print('{:<45} {:>10.4f}s'.format(name, min(times)), file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''Return a list of messages describing regressions'''
+    problems = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]
+        if current['result'] != previous['result']:
+            problems.append('{}: result changed from {} to {}'.format(
+                name, previous['result'], current['result']))
+        if current['seconds'] > previous['seconds'] * tolerance:
+            problems.append('{}: {:.4f}s is more than {}x slower than the baseline {:.4f}s'.format(
+                name, current['seconds'], tolerance, previous['seconds']))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true', help='write results to the baseline file')
+    parser.add_argument('--output', help='also write results as JSON to this file')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=5, help='times to run each benchmark')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='slowdown factor reported as a regression')
+    parser.add_argument('--data-dir', help='directory to cache generated data in [default: temporary]')
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        data_dir = args.data_dir
+        if data_dir is None:
+            data_dir = stack.enter_context(workspace(prefix='bird_tool_utils-benchmark-'))
+        else:
+            os.makedirs(data_dir, exist_ok=True)
+        results = run_benchmarks(data_dir, args.filter, args.repeat)
+
+    document = {
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'benchmarks': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(document, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline found at {}, use --save-baseline to create one'.format(
+            args.baseline), file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)['benchmarks']
+    problems = compare(results, baseline, args.tolerance)
+    for problem in problems:
+        print('REGRESSION {}'.format(problem), file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+
+'''Deterministic synthetic sequence data for benchmarks. The same seed and
+parameters always produce byte-identical output.'''
+
+import random
+
+BASES = 'ACGT'
+# Phred+33 qualities 2 to 41
+QUALITIES = ''.join(chr(33 + q) for q in range(2, 42))
+
+
+def random_records(num_records, length, seed=42, quality=False, length_spread=0):
+    '''Yield (name, seq, qual) str tuples, with qual None unless quality is
+    True. Sequence lengths are uniform in length +/- length_spread.'''
+    rng = random.Random(seed)
+    for i in range(num_records):
+        record_length = length
+        if length_spread:
+            record_length = max(1, length + rng.randint(-length_spread, length_spread))
+        seq = ''.join(rng.choices(BASES, k=record_length))
+        qual = ''.join(rng.choices(QUALITIES, k=record_length)) if quality else None
+        yield 'read{} synthetic record {}'.format(i, i), seq, qual
+
+
+def write_fasta(path, num_records, length, line_width=None, seed=42, length_spread=0):
+    '''Write a FASTA file, wrapping sequences at line_width if given'''
+    with open(path, 'w') as f:
+        for name, seq, _ in random_records(num_records, length, seed=seed,
+                                           length_spread=length_spread):
+            f.write('>{}\n'.format(name))
+            if line_width is None:
+                f.write(seq + '\n')
+            else:
+                for i in range(0, len(seq), line_width):
+                    f.write(seq[i:i+line_width] + '\n')
+
+
+def write_fastq(path, num_records, length, seed=42, length_spread=0):
+    with open(path, 'w') as f:
+        for name, seq, qual in random_records(num_records, length, seed=seed, quality=True,
+                                              length_spread=length_spread):
+            f.write('@{}\n{}\n+\n{}\n'.format(name, seq, qual))
+
+
+def random_table(num_rows, num_columns, seed=42):
+    '''Return a table (list of lists of str) with a header row'''
+    rng = random.Random(seed)
+    header = ['column{}'.format(i) for i in range(num_columns)]
+    return [header] + [
+        [''.join(rng.choices('abcdefghij \\.', k=rng.randint(5, 40)))
+         for _ in range(num_columns)]
+        for _ in range(num_rows)]
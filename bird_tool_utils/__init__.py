@@ -1,16 +1,58 @@
 import os
 import contextlib
-from pathlib import Path
-import tempfile
+import importlib
 import itertools
 
 from .argparsing import *
 
+# Attributes defined in submodules, mapped to their module name. These are
+# imported on first access (see __getattr__) rather than here, so that
+# importing bird_tool_utils, and so starting up any bird tool, stays quick.
+_LAZY_ATTRIBUTES = {
+    'SeqReader': 'sequence',
+    'DEFAULT_BLOCK_SIZE': 'sequence',
+    'detect_compression': 'compression',
+    'open_compressed': 'compression',
+    'open_compressed_writer': 'compression',
+    'SeqBatch': 'batch',
+    'FastaIndex': 'faidx',
+    'ShardedSeqReader': 'sharded',
+    'SeqWriter': 'writer',
+    'chunked': 'parallel',
+    'chunked_map': 'parallel',
+    'shared_executor': 'parallel',
+    'stage': 'timing',
+    'SeqStats': 'stats',
+    'SeqRecord': 'record',
+    'subsample_reads': 'subsample',
+    'count_records': 'count',
+    'track_progress': 'progress',
+    'ReadNameSet': 'extract',
+    'extract_reads': 'extract',
+    'sort_records': 'external_sort',
+    'sort_file': 'external_sort',
+    'workspace': 'scratch',
+    'wait_for_cleanup': 'scratch',
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
 
 @contextlib.contextmanager
 def in_working_directory(path):
     """Changes working directory and returns to previous on exit."""
-    prev_cwd = Path.cwd()
+    prev_cwd = os.getcwd()
     os.chdir(path)
     try:
         yield
@@ -21,82 +63,86 @@ def in_working_directory(path):
 @contextlib.contextmanager
 def in_tempdir():
     '''Create a new temporary directory and chdir there as a context i.e. chdir
-    back when finished'''
+    back when finished. See also workspace, which does not change the working
+    directory.'''
+    import tempfile
 
     with tempfile.TemporaryDirectory() as tmpdirname:
         with in_working_directory(tmpdirname):
             yield
 
 
+def _escape_roff(text):
+    '''Escape text so that it is rendered literally inside a tbl text block'''
+    text = text.replace('\\', '\\e')
+    # Lines starting with a control character (or 'T}', which would end the
+    # text block) are protected with a zero-width character
+    return '\n'.join(
+        '\\&' + line if line.startswith(('.', "'", 'T}')) else line
+        for line in text.split('\n'))
+
+
+def iter_table_roff(rows, num_columns=None, escape=True):
+    '''Generate a ROFF format table from an iterable of rows (each an
+    iterable of cells), yielding the output in chunks, one per row. rows may
+    be a generator, which is consumed only once. The first row is formatted
+    as a header. num_columns defaults to the number of cells in the first
+    row. When escape is True, ROFF control characters in cells are escaped
+    so that they are printed literally.'''
+    rows = iter(rows)
+    if num_columns is None:
+        first = next(rows, None)
+        if first is not None:
+            first = list(first)
+            num_columns = len(first)
+            rows = itertools.chain([first], rows)
+        else:
+            num_columns = 0
+    yield "\n.TS\ntab(@);\n" + 'l ' * num_columns + '.\n'
+
+    header = True
+    for row in rows:
+        if escape:
+            cells = [_escape_roff(str(cell)) for cell in row]
+        else:
+            cells = [str(cell) for cell in row]
+        chunk = '@'.join(['T{\n' + cell + '\nT}' for cell in cells]) + '\n'
+        if header:
+            header = False
+            chunk += '_\n'
+        yield chunk
+    yield '.TE\n'
+
+
+def write_table_roff(rows, sink, num_columns=None, escape=True):
+    '''Write a ROFF format table to sink, a file-like object opened in text
+    mode, without building the whole table in memory. See
+    iter_table_roff.'''
+    for chunk in iter_table_roff(rows, num_columns=num_columns, escape=escape):
+        sink.write(chunk)
+
+
 def table_roff(table):
-    roff = "\n.TS\ntab(@);\n"
-    for row in table:
-        for col in row:
-            roff += 'l '
-        break
-    roff += '.\n'
-
-    first_row = True
-    for row in table:
-        first_column = True
-        for cell in row:
-            if first_column:
-                first_column = False
-            else:
-                roff += '@'
-            roff += 'T{\n'
-            roff += cell
-            roff += '\nT}'
-        roff += '\n'
-        if first_row:
-            first_row = False
-            roff += "_\n"
-    roff += '.TE\n'
-    return roff
-
-
-class SeqReader:
-    # Stolen from https://github.com/lh3/readfq/blob/master/readfq.py
-    def readfq(self, fp): # this is a generator function
-        '''Generator function for reading FASTQ files'''
-        last = None # this is a buffer keeping the last unprocessed line
-        while True: # mimic closure; is it a bad idea?
-            if not last: # the first record or a record following a fastq
-                for l in fp: # search for the start of the next record
-                    if l[0] in '>@': # fasta/q header line
-                        last = l[:-1] # save this line
-                        break
-            if not last: break
-            name, seqs, last = last[1:].partition(" ")[0], [], None
-            for l in fp: # read the sequence
-                if l[0] in '@+>':
-                    last = l[:-1]
-                    break
-                seqs.append(l[:-1])
-            if not last or last[0] != '+': # this is a fasta record
-                yield name, ''.join(seqs), None # yield a fasta record
-                if not last: break
-            else: # this is a fastq record
-                seq, leng, seqs = ''.join(seqs), 0, []
-                for l in fp: # read the quality
-                    seqs.append(l[:-1])
-                    leng += len(l) - 1
-                    if leng >= len(seq): # have read enough quality
-                        last = None
-                        yield name, seq, ''.join(seqs); # yield a fastq record
-                        break
-                if last: # reach EOF before reading enough quality
-                    yield name, seq, None # yield a fasta record instead
-                    break
-
-    def readfa(self, fp):
-        '''Generator function for reading FASTA files'''
-        for (name, seq, _) in self.readfq(fp):
-            yield name, seq
+    '''Return a ROFF format table as a string. Cells are not escaped, so they
+    may contain ROFF formatting. See also iter_table_roff and
+    write_table_roff.'''
+    return ''.join(iter_table_roff(table, escape=False))
+
 
 def iterable_chunks(iterable, n):
     '''Given an iterable, return it in chunks of size n. In the last chunk, the
-    remaining space is replaced by None entries.
+    remaining space is replaced by None entries. See also chunked, which does
+    not pad the last chunk.
     '''
     args = [iter(iterable)] * n
     return itertools.zip_longest(*args, fillvalue=None)
+
+
+# Public names exported by 'from bird_tool_utils import *'. Of the lazily
+# imported attributes only SeqReader is included, as it always has been, so
+# that a star import does not import every submodule.
+__all__ = [
+    'str2bool', 'parse_memory_size', 'BirdHelpFormatter', 'BirdArgparser', 'Example',
+    'in_working_directory', 'in_tempdir', 'iter_table_roff', 'write_table_roff',
+    'table_roff', 'iterable_chunks', 'SeqReader',
+]
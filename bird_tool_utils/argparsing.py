@@ -1,13 +1,11 @@
 import os
 import argparse
 import sys
-import logging
-import tempfile
-import subprocess
-import textwrap
-from typing import OrderedDict
+from collections import OrderedDict
 
-from build_manpages.manpage import Manpage
+# logging, subprocess, tempfile, textwrap and build_manpages are imported only
+# where needed, so that importing this module (and so starting any bird tool)
+# is quick.
 
 
 def str2bool(v):
@@ -24,6 +22,39 @@ def str2bool(v):
         raise argparse.ArgumentTypeError('Boolean value expected.')
 
 
+def parse_memory_size(v):
+    '''Parse a memory size such as '512M', '4G' or '2GiB' (binary units, with
+    no suffix meaning bytes) into a number of bytes, for use as an argparse
+    type'''
+    units = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+    text = str(v).strip().upper()
+    for suffix in ('IB', 'B'):
+        if text.endswith(suffix) and text[:-len(suffix)][-1:] in 'KMGT':
+            text = text[:-len(suffix)]
+            break
+    if text.endswith('B'):
+        text = text[:-1]
+    unit = text[-1:] if text[-1:] in 'KMGT' else ''
+    try:
+        size = float(text[:len(text)-len(unit)])
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            'Memory size expected e.g. 4G, not {}'.format(v))
+    if size <= 0:
+        raise argparse.ArgumentTypeError('Memory size must be positive')
+    return int(size * units[unit])
+
+
+class _StoreGiven(argparse._StoreAction):
+    '''Store action which also records the value under '_bird_' + dest, so
+    that parse_the_args can tell that the option added by BirdArgparser was
+    given, rather than an option of the same name defined by the program'''
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        super().__call__(parser, namespace, values, option_string)
+        setattr(namespace, '_bird_' + self.dest, values)
+
+
 class BirdHelpFormatter(argparse.HelpFormatter):
     '''Custom help formatter for prettier argparse messages'''
 
@@ -74,6 +105,11 @@ class BirdArgparser:
         * examples: Dict of subcommand name to list of ExampleUsage objects
           [default: {}]
         * raw_format: Use raw ROFF output for --full-help [default False]
+        * manpage_directory: directory of man pages pregenerated with
+          render_manpages, e.g. shipped as package data. Used in preference
+          to rendering pages at runtime when up to date [default None]
+        * manpage_cache: cache rendered man pages on disk, see
+          manpage_cache.cache_directory [default True]
         '''
         # Required
         self.program = kwargs.pop('program')
@@ -85,17 +121,25 @@ class BirdArgparser:
         self.authors = kwargs.pop('authors', [])
         self.examples = kwargs.pop('examples', {})
         self.raw_format = kwargs.pop('raw_format', False)
+        self.manpage_directory = kwargs.pop('manpage_directory', None)
+        self.manpage_cache = kwargs.pop('manpage_cache', True)
 
         if len(kwargs) > 0:
             raise Exception("Unexpected arguments detected: %s" % kwargs)
 
         self.parser = argparse.ArgumentParser(add_help=False)
-        self._child_parser = argparse.ArgumentParser(parents=[self.parser])
+        # prog is set so that usage, and so man pages and their cache keys,
+        # do not depend on the path the program was run from
+        self._child_parser = argparse.ArgumentParser(
+            prog=self.program_invocation, parents=[self.parser])
+        self._subparsers = None
         self._subparser_name_to_parser = {}
         self._subparser_name_to_description = {}
+        self._lazy_subparser_populators = {}
         self._groups_of_subparsers = OrderedDict()
         self._subparsers_allow_no_args = set()
         self._excluded_subparsers = set()
+        self._common_arguments_added = False
 
     def new_subparser(self, parser_name, parser_description, parser_group=None,
                       allow_no_args=False):
@@ -114,15 +158,34 @@ class BirdArgparser:
         * allow_no_args: allow subcommand execution with no further
           arguments, rather than printing help [default: False]
         '''
-        if len(self._subparser_name_to_parser) == 0:
-            self._subparsers = self._child_parser.add_subparsers(
-                title="Sub-commands", dest='subparser_name')
-        subparsers = self._subparsers
-        subpar = subparsers.add_parser(parser_name,
-                                       description=parser_description,
-                                       help=parser_description,
-                                       parents=[self.parser])
-        self._subparser_name_to_parser[parser_name] = subpar
+        self._register_subparser(parser_name, parser_description, parser_group,
+                                 allow_no_args)
+        return self._build_subparser(parser_name)
+
+    def register_subparser(self, parser_name, parser_description, populate,
+                           parser_group=None, allow_no_args=False):
+        '''Register a subcommand without creating its subparser. Instead,
+        populate(subparser) is called to add its arguments only when the
+        subcommand is actually invoked, so that programs with many
+        subcommands do not spend startup time building parsers which are
+        never used. The name and description are still listed in the
+        top-level help.
+
+        Required:
+        * parser_name: name of subcommand
+        * parser_description: description of subcommand
+        * populate: callable taking the new subparser and adding arguments
+          to it
+
+        Optional:
+        * parser_group and allow_no_args: as for new_subparser
+        '''
+        self._register_subparser(parser_name, parser_description, parser_group,
+                                 allow_no_args)
+        self._lazy_subparser_populators[parser_name] = populate
+
+    def _register_subparser(self, parser_name, parser_description, parser_group,
+                            allow_no_args):
         self._subparser_name_to_description[parser_name] = parser_description
         if parser_group is not None:
             if parser_group == 'exclude':
@@ -133,23 +196,81 @@ class BirdArgparser:
                 self._groups_of_subparsers[parser_group].append(parser_name)
         if allow_no_args:
             self._subparsers_allow_no_args.add(parser_name)
+
+    def _build_subparser(self, parser_name):
+        if self._subparsers is None:
+            self._subparsers = self._child_parser.add_subparsers(
+                title="Sub-commands", dest='subparser_name')
+        parser_description = self._subparser_name_to_description[parser_name]
+        subpar = self._subparsers.add_parser(parser_name,
+                                             description=parser_description,
+                                             help=parser_description,
+                                             parents=[self.parser])
+        self._subparser_name_to_parser[parser_name] = subpar
         return subpar
 
+    def _get_subparser(self, parser_name):
+        '''Return the subparser for a subcommand, building it first if it
+        was registered with register_subparser'''
+        if parser_name not in self._subparser_name_to_parser:
+            subpar = self._build_subparser(parser_name)
+            # If parse_the_args has already added the common arguments to
+            # self.parser, they are inherited from it here.
+            self._lazy_subparser_populators[parser_name](subpar)
+        return self._subparser_name_to_parser[parser_name]
+
     def _add_boring_common_arguments(self, parser=None):
         if parser is None:
             parser = self.parser
         boring_group = parser.add_argument_group(title='Other general options')
+        # Programs which already define these keep their own versions
+        if '--threads' not in parser._option_string_actions:
+            boring_group.add_argument('--threads', type=int, action=_StoreGiven, help='number of CPU threads to use [default: all available]')
+        if '--memory-limit' not in parser._option_string_actions:
+            boring_group.add_argument('--memory-limit', type=parse_memory_size, action=_StoreGiven, help='approximate memory limit e.g. 4G, for steps which can spill to disk')
+        # Options acted on by parse_the_args have private dests, so that
+        # those of programs which define the same options are ignored
+        if '--profile' not in parser._option_string_actions:
+            boring_group.add_argument('--profile', dest='_bird_profile', metavar='FILE', help='profile the run with cProfile, writing pstats output to FILE')
+        if '--timing' not in parser._option_string_actions:
+            boring_group.add_argument('--timing', dest='_bird_timing', help='log the wall clock and CPU time taken by each stage at exit', action="store_true")
+        if '--resource-usage' not in parser._option_string_actions:
+            boring_group.add_argument('--resource-usage', dest='_bird_resource_usage', help='log peak memory, CPU time and block I/O of this process and its children at exit', action="store_true")
+        if '--resource-usage-json' not in parser._option_string_actions:
+            boring_group.add_argument('--resource-usage-json', dest='_bird_resource_usage_json', metavar='FILE', help='write the resource usage report to FILE as JSON at exit')
+        if '--trace-allocations' not in parser._option_string_actions:
+            boring_group.add_argument('--trace-allocations', dest='_bird_trace_allocations', help='include the top Python memory allocation sites in the resource usage report (slow)', action="store_true")
         boring_group.add_argument('--debug', help='output debug information', action="store_true")
         boring_group.add_argument('--version', help='output version information and quit',  action='version', version=self.version)
         boring_group.add_argument('--quiet', help='only output errors', action="store_true")
         boring_group.add_argument('--full-help','--full_help', help='print longer help message', action="store_true")
         boring_group.add_argument('--full-help-roff','--full_help_roff', help='print longer help message in ROFF (manpage) format', action="store_true")
 
-    def parse_the_args(self):
+    def _add_common_arguments(self):
+        '''Add the boring arguments to self.parser and all subparsers built
+        so far, unless this has already been done'''
+        if self._common_arguments_added:
+            return
         self._add_boring_common_arguments()
         # Add boring arguments to each subparser
         for (_, subpar) in self._subparser_name_to_parser.items():
             self._add_boring_common_arguments(subpar)
+        self._common_arguments_added = True
+
+    def parse_the_args(self):
+        # Only build the subparser of the invoked subcommand, unless the
+        # subcommand is not recognised, in which case build them all so that
+        # argparse can list them in its error message.
+        if len(sys.argv) > 1:
+            if sys.argv[1] in self._lazy_subparser_populators:
+                self._get_subparser(sys.argv[1])
+            elif sys.argv[1] not in self._subparser_name_to_description and \
+                    sys.argv[1] not in ('-h', '--help') and \
+                    '--version' not in sys.argv:
+                for name in self._lazy_subparser_populators:
+                    self._get_subparser(name)
+
+        self._add_common_arguments()
 
         if '--version' in sys.argv:
             args = self.parser.parse_args()
@@ -165,6 +286,7 @@ class BirdArgparser:
             printed_parsers = set()
 
             def _print_with_wrap(name, description):
+                import textwrap
                 prefix = f'  {name:<{max_name_length+2}}  -> '
                 line = prefix + description
                 if len(line) <= 120:
@@ -197,7 +319,7 @@ class BirdArgparser:
         else:
             # Determine whether help was specified before argument parsing.
             print_help = True
-            if sys.argv[1] in self._subparser_name_to_parser:
+            if sys.argv[1] in self._subparser_name_to_description:
                 if '-h' in sys.argv or '--help' in sys.argv or \
                    (len(sys.argv) == 2 and sys.argv[1] not in self._subparsers_allow_no_args):
                     self._print_short_help(sys.argv[1])
@@ -209,14 +331,21 @@ class BirdArgparser:
                 elif '--%s' % BirdArgparser.FULL_HELP_ROFF_FLAG in sys.argv or \
                     '--%s' % BirdArgparser.FULL_HELP_ROFF_FLAG.replace('-', '_') in sys.argv:
 
-                    subcommand = sys.argv[1]
-                    subparser = self._subparser_name_to_parser[subcommand]
-                    print(str(self._manpage(subparser, subcommand)))
+                    print(self._manpage_roff(sys.argv[1]))
                     sys.exit(0)
 
             # No need for an 'else' here since the above stanzas run sys.exit()
             args = self._child_parser.parse_args()
 
+        # Only when given on the command line, so that e.g. an exported
+        # OMP_NUM_THREADS is kept, and never for a program's own --threads
+        threads = getattr(args, '_bird_threads', None)
+        memory_limit = getattr(args, '_bird_memory_limit', None)
+        if threads is not None or memory_limit is not None:
+            from .runtime import configure
+            configure(threads=threads, memory_limit=memory_limit)
+
+        import logging
         if args.debug:
             loglevel = logging.DEBUG
         elif args.quiet:
@@ -227,10 +356,28 @@ class BirdArgparser:
             level=loglevel, format='%(asctime)s %(levelname)s: %(message)s',
             datefmt='%Y/%m/%d %I:%M:%S %p')
 
+        if getattr(args, '_bird_timing', False):
+            from .timing import enable_timing
+            enable_timing()
+        profile = getattr(args, '_bird_profile', None)
+        if profile is not None:
+            from .timing import start_profiling
+            start_profiling(profile)
+        resource_usage = getattr(args, '_bird_resource_usage', False)
+        resource_usage_json = getattr(args, '_bird_resource_usage_json', None)
+        trace_allocations = getattr(args, '_bird_trace_allocations', False)
+        if resource_usage or resource_usage_json is not None or trace_allocations:
+            from .resources import start_resource_usage_report
+            start_resource_usage_report(
+                log=resource_usage or trace_allocations,
+                json_path=resource_usage_json,
+                trace_allocations=trace_allocations)
+
         return args
 
     def _print_short_help(self, subcommand):
         if subcommand in self.examples:
+            import textwrap
             width = os.get_terminal_size().columns
             if width > 100:
                 width = 100
@@ -254,15 +401,90 @@ class BirdArgparser:
             self._print_full_help(subcommand)
 
     def _print_full_help(self, subcommand):
-        subparser = self._subparser_name_to_parser[subcommand]
+        roff, path = self._cached_manpage(subcommand)
+        if path is not None:
+            self._run_man(subcommand, path)
+            return
+        import tempfile
         with tempfile.NamedTemporaryFile(
-            prefix='{}-manpage-'.format(subcommand)) as f:
+            prefix='{}-manpage-'.format(subcommand), suffix='.roff') as f:
 
-            f.write(str(self._manpage(subparser, subcommand)).encode())
+            f.write(roff.encode())
             f.flush()
-            subprocess.run('man {}'.format(f.name), shell=True)
+            self._run_man(subcommand, f.name)
+
+    def _run_man(self, subcommand, path):
+        import subprocess
+        try:
+            subprocess.run(['man', path])
+        except FileNotFoundError:
+            # No man command available, so fall back to argparse's help
+            self._get_subparser(subcommand).print_help()
+
+    def _manpage_fingerprint(self, subcommand):
+        from .manpage_cache import parser_fingerprint
+        examples = [(e.description, e.invocation)
+                    for e in self.examples.get(subcommand, [])]
+        return parser_fingerprint(
+            self._get_subparser(subcommand), self.program,
+            self.program_invocation, self.version, subcommand, examples,
+            self.authors, self.raw_format)
+
+    def _cached_manpage(self, subcommand):
+        '''Return (roff, path) for the man page of subcommand, reading it from
+        manpage_directory or the cache if it has already been rendered for
+        this exact parser definition, and otherwise rendering it and caching
+        it. path is None if the page could not be cached.'''
+        from . import manpage_cache
+        filename = manpage_cache.manpage_filename(
+            self.program_invocation, self.version, subcommand,
+            self._manpage_fingerprint(subcommand))
+        directories = [self.manpage_directory]
+        if self.manpage_cache:
+            directories.append(manpage_cache.cache_directory())
+        path = manpage_cache.find_cached_manpage(filename, directories)
+        if path is not None:
+            try:
+                with open(path) as f:
+                    return f.read(), path
+            except OSError:
+                pass
+
+        roff = str(self._manpage(self._get_subparser(subcommand), subcommand))
+        path = None
+        if self.manpage_cache:
+            try:
+                path = manpage_cache.store_manpage(
+                    roff, filename, manpage_cache.cache_directory())
+            except OSError:
+                pass
+        return roff, path
+
+    def _manpage_roff(self, subcommand):
+        return self._cached_manpage(subcommand)[0]
+
+    def render_manpages(self, directory):
+        '''Render the man page of every subcommand into directory, for use as
+        the manpage_directory of a later BirdArgparser with the same
+        definition, e.g. at package build time. Returns the list of paths
+        written.'''
+        from . import manpage_cache
+        for name in self._lazy_subparser_populators:
+            self._get_subparser(name)
+        self._add_common_arguments()
+        paths = []
+        for subcommand in self._subparser_name_to_description:
+            subparser = self._get_subparser(subcommand)
+            filename = manpage_cache.manpage_filename(
+                self.program_invocation, self.version, subcommand,
+                self._manpage_fingerprint(subcommand))
+            paths.append(manpage_cache.store_manpage(
+                str(self._manpage(subparser, subcommand)), filename, directory))
+        return paths
 
     def _manpage(self, parser, subcommand):
+        from build_manpages.manpage import Manpage
+
         # Gather examples if possible
         if subcommand in self.examples:
             examples = self.examples[subcommand]
@@ -0,0 +1,122 @@
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError(
+            "NumPy is required for sequence batches, install it e.g. with "
+            "'pip install bird_tool_utils[numpy]'")
+    return numpy
+
+
+class SeqBatch:
+    '''A batch of sequence records stored column-wise, in the manner of an
+    Arrow record batch, so that whole batches can be processed with
+    vectorised NumPy operations rather than record by record.
+
+    Attributes:
+    * names: list of record names (bytes)
+    * seqs: bytes of all sequences concatenated
+    * quals: bytes of all quality strings concatenated, or None for FASTA
+    * offsets: NumPy int64 array of the start of each record in seqs/quals
+    * lengths: NumPy int64 array of the length of each sequence
+    '''
+
+    def __init__(self, names, seqs, quals, offsets, lengths):
+        self.names = names
+        self.seqs = seqs
+        self.quals = quals
+        self.offsets = offsets
+        self.lengths = lengths
+
+    @classmethod
+    def from_records(cls, records):
+        '''Build a batch from a list of (name, seq, qual) bytes tuples.'''
+        qual_list = [r[2] for r in records]
+        if any(q is None for q in qual_list):
+            if not all(q is None for q in qual_list):
+                raise Exception("Cannot batch a mixture of FASTA and FASTQ records")
+            qual_list = None
+        return cls.from_columns([r[0] for r in records], [r[1] for r in records], qual_list)
+
+    @classmethod
+    def from_columns(cls, names, seq_list, qual_list):
+        '''Build a batch from lists of names, sequences and quality strings
+        (bytes), with qual_list None for FASTA.'''
+        np = _numpy()
+        seq_lengths = list(map(len, seq_list))
+        lengths = np.array(seq_lengths, dtype=np.int64)
+        offsets = np.zeros(len(seq_lengths), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        if qual_list is None:
+            quals = None
+        else:
+            if list(map(len, qual_list)) != seq_lengths:
+                raise Exception("Quality and sequence lengths differ")
+            quals = b''.join(qual_list)
+        return cls(names, b''.join(seq_list), quals, offsets, lengths)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        '''Iterate over (name, seq, qual) bytes tuples'''
+        for name, start, end in zip(self.names, self.offsets.tolist(),
+                                    (self.offsets + self.lengths).tolist()):
+            yield name, self.seqs[start:end], \
+                self.quals[start:end] if self.quals is not None else None
+
+    def seq_array(self):
+        '''Return the concatenated sequences as a NumPy uint8 array (without
+        copying)'''
+        np = _numpy()
+        return np.frombuffer(self.seqs, dtype=np.uint8)
+
+    def qual_array(self, offset=33):
+        '''Return the concatenated quality scores as a NumPy uint8 array of
+        Phred scores, or None for FASTA batches'''
+        if self.quals is None:
+            return None
+        np = _numpy()
+        return np.frombuffer(self.quals, dtype=np.uint8) - np.uint8(offset)
+
+    def per_record_sum(self, values):
+        '''Sum an array aligned with seqs (e.g. from seq_array) over each
+        record, returning an array with one entry per record.'''
+        np = _numpy()
+        # reduceat cannot handle empty records, so sum via cumulative sums
+        cumulative = np.zeros(len(values) + 1, dtype=np.int64)
+        np.cumsum(values, out=cumulative[1:])
+        return cumulative[self.offsets + self.lengths] - cumulative[self.offsets]
+
+    def gc_counts(self):
+        '''Return the number of G/C bases (either case) in each record'''
+        np = _numpy()
+        is_gc = np.zeros(256, dtype=np.uint8)
+        for c in b'GCgc':
+            is_gc[c] = 1
+        return self.per_record_sum(is_gc[self.seq_array()])
+
+    def select(self, selection):
+        '''Return a new batch containing only the records given by a boolean
+        mask or an array of indices, e.g. batch.select(batch.lengths >= 100)'''
+        np = _numpy()
+        indices = np.arange(len(self))[selection]
+        starts = self.offsets[indices]
+        lengths = self.lengths[indices]
+        offsets = np.zeros(len(indices), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        # Copy runs of records which are adjacent in this batch in one go
+        ends = starts + lengths
+        breaks = np.flatnonzero(starts[1:] != ends[:-1]) + 1
+        if len(indices):
+            run_starts = starts[np.concatenate(([0], breaks))].tolist()
+            run_ends = ends[np.concatenate((breaks - 1, [len(ends) - 1]))].tolist()
+        else:
+            run_starts = run_ends = []
+        seqs = self.seqs
+        seqs = b''.join([seqs[s:e] for s, e in zip(run_starts, run_ends)])
+        quals = self.quals
+        if quals is not None:
+            quals = b''.join([quals[s:e] for s, e in zip(run_starts, run_ends)])
+        names = self.names
+        return SeqBatch([names[i] for i in indices.tolist()], seqs, quals, offsets, lengths)
@@ -0,0 +1,401 @@
+import io
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+
+
+# Size of the chunks handed from the background decompression thread to the
+# reader
+_CHUNK_SIZE = 1024 * 1024
+# Maximum number of decompressed chunks waiting to be read
+_MAX_QUEUED_CHUNKS = 8
+
+_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+
+def detect_compression(path):
+    '''Return the compression format of the file at path from its magic
+    bytes: one of 'gzip', 'bgzf', 'bz2', 'xz', 'zstd', or None if the file
+    does not appear to be compressed.'''
+    with open(path, 'rb') as f:
+        start = f.read(16)
+    for magic, compression in _MAGIC:
+        if start.startswith(magic):
+            # BGZF is gzip with a 'BC' extra subfield in each member header
+            if compression == 'gzip' and len(start) >= 14 and start[3] & 4 and \
+                    start[12:14] == b'BC':
+                return 'bgzf'
+            return compression
+    return None
+
+
+def _external_command(compression, threads):
+    '''Return the command line of an external decompressor for the format,
+    reading from stdin, or None if no suitable tool is installed.'''
+    threads = str(max(1, threads))
+    candidates = {
+        'bgzf': [
+            ['bgzip', '-dc', '-@', threads],
+            ['pigz', '-dc', '-p', threads]],
+        'gzip': [
+            ['pigz', '-dc', '-p', threads]],
+        'bz2': [
+            ['lbzip2', '-dc', '-n', threads],
+            ['pbzip2', '-dc', '-p' + threads]],
+        'xz': [
+            ['xz', '-dc', '-T', threads]],
+        'zstd': [
+            ['zstd', '-dcq', '-T' + threads]],
+    }[compression]
+    for command in candidates:
+        if shutil.which(command[0]) is not None:
+            return command
+    return None
+
+
+def _open_in_process(compression, source):
+    '''Return a decompressing stream reading from the binary file source'''
+    if compression in ('gzip', 'bgzf'):
+        import gzip
+        return gzip.GzipFile(fileobj=source, mode='rb')
+    elif compression == 'bz2':
+        import bz2
+        return bz2.BZ2File(source, 'rb')
+    elif compression == 'xz':
+        import lzma
+        return lzma.LZMAFile(source, 'rb')
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "Reading zstd compressed file {} requires either the zstd "
+                "program or the zstandard python module".format(source.name))
+        return zstandard.ZstdDecompressor().stream_reader(source, closefd=False)
+    else:
+        raise Exception("Unexpected compression format {}".format(compression))
+
+
+def _error_output(stderr):
+    '''Return what a subprocess wrote to the temporary file stderr. stderr
+    is a file rather than a pipe, as a pipe which is only read once the
+    process has finished would block a process writing much to it.'''
+    stderr.seek(0)
+    return stderr.read().decode(errors='replace').strip()
+
+
+class _ProcessReader(io.RawIOBase):
+    '''Raw binary stream reading the stdout of a decompression subprocess,
+    which reads the compressed file source on its stdin. Sharing the open
+    file means that compressed_position can find how far it has got.'''
+
+    def __init__(self, command, source):
+        self._command = command
+        self._source = source
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            command, stdin=source, stdout=subprocess.PIPE, stderr=self._stderr)
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = self._process.stdout.readinto(b)
+        if n == 0:
+            self._finish()
+        return n
+
+    def _finish(self):
+        if self._process.wait() != 0:
+            raise Exception("Command '{}' failed with exit status {}: {}".format(
+                ' '.join(self._command), self._process.returncode,
+                _error_output(self._stderr)))
+
+    def close(self):
+        if not self.closed:
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            self._process.stdout.close()
+            self._stderr.close()
+            self._source.close()
+        super().close()
+
+
+class _ThreadedReader(io.RawIOBase):
+    '''Raw binary stream which reads from another (decompressing) stream on a
+    background thread, so that decompression overlaps with the consumer.
+    source is the underlying compressed file, closed along with fp.'''
+
+    def __init__(self, fp, source=None):
+        self._fp = fp
+        self._source = source
+        self._queue = queue.Queue(maxsize=_MAX_QUEUED_CHUNKS)
+        self._stop = threading.Event()
+        self._chunk = b''
+        self._offset = 0
+        self._done = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._fp.read(_CHUNK_SIZE)
+                self._put(chunk)
+                if not chunk:
+                    break
+        except Exception as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while self._offset >= len(self._chunk):
+            if self._done:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, Exception):
+                self._done = True
+                raise item
+            if not item:
+                self._done = True
+                return 0
+            self._chunk = item
+            self._offset = 0
+        n = min(len(b), len(self._chunk) - self._offset)
+        b[:n] = self._chunk[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._fp.close()
+            if self._source is not None:
+                self._source.close()
+        super().close()
+
+
+def open_compressed(path, threads=1, text=False, use_external_tools=True):
+    '''Open a possibly compressed file for reading, detecting gzip, BGZF,
+    bzip2, xz or zstd compression from its magic bytes.
+
+    Compressed files are decompressed by an external program (pigz, bgzip,
+    lbzip2/pbzip2, xz or zstd) running in a separate process where one is
+    installed, and otherwise by the python codecs running on a background
+    thread. Either way decompression overlaps with parsing.
+
+    Returns a binary file-like object, or a text one if text is True.
+    '''
+    compression = detect_compression(path)
+    if compression is None:
+        stream = open(path, 'rb')
+    else:
+        command = None
+        if use_external_tools:
+            command = _external_command(compression, threads)
+        source = open(path, 'rb')
+        try:
+            if command is not None:
+                raw = _ProcessReader(command, source)
+            else:
+                raw = _ThreadedReader(_open_in_process(compression, source), source)
+        except BaseException:
+            source.close()
+            raise
+        stream = io.BufferedReader(raw, buffer_size=_CHUNK_SIZE)
+    if text:
+        return io.TextIOWrapper(stream)
+    return stream
+
+
+def compressed_position(f):
+    '''Return how many bytes of the underlying file of f have been read, or
+    None if this cannot be found. For streams from open_compressed this is
+    the position in the compressed file, even when an external program is
+    decompressing it, and so can be compared with the file's size to
+    estimate progress. Read-ahead means it may be a little beyond what has
+    been consumed.'''
+    # Unwrap text and buffered streams
+    f = getattr(f, 'buffer', f)
+    f = getattr(f, 'raw', f)
+    f = getattr(f, '_source', None) or f
+    try:
+        return os.lseek(f.fileno(), 0, os.SEEK_CUR)
+    except (AttributeError, OSError, ValueError):
+        pass
+    try:
+        return f.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bgz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zst': 'zstd',
+}
+
+
+def compression_from_extension(path):
+    '''Guess the compression to use when writing to path from its extension,
+    returning None for uncompressed output.'''
+    for extension, compression in _EXTENSIONS.items():
+        if path.endswith(extension):
+            return compression
+    return None
+
+
+def _external_compress_command(compression, threads, level):
+    threads = str(max(1, threads))
+    level = [] if level is None else ['-{}'.format(level)]
+    candidates = {
+        'gzip': [['pigz', '-c', '-p', threads] + level],
+        'bz2': [['lbzip2', '-c', '-n', threads] + level,
+                ['pbzip2', '-c', '-p' + threads] + level],
+        'xz': [['xz', '-c', '-T', threads] + level],
+        'zstd': [['zstd', '-cq', '-T' + threads] + level],
+    }[compression]
+    for command in candidates:
+        if shutil.which(command[0]) is not None:
+            return command
+    return None
+
+
+def _open_in_process_writer(compression, path, level):
+    if compression == 'gzip':
+        import gzip
+        return gzip.open(path, 'wb', compresslevel=6 if level is None else level)
+    elif compression == 'bz2':
+        import bz2
+        return bz2.open(path, 'wb', compresslevel=9 if level is None else level)
+    elif compression == 'xz':
+        import lzma
+        return lzma.open(path, 'wb', preset=level)
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "Writing zstd compressed file {} requires either the zstd "
+                "program or the zstandard python module".format(path))
+        return zstandard.ZstdCompressor(level=3 if level is None else level).stream_writer(
+            open(path, 'wb'), closefd=True)
+    else:
+        raise Exception("Unexpected compression format {}".format(compression))
+
+
+class _ProcessWriter(io.RawIOBase):
+    '''Raw binary stream writing to the stdin of a compression subprocess,
+    which writes to a file.'''
+
+    def __init__(self, command, path):
+        self._command = command
+        self._stderr = tempfile.TemporaryFile()
+        with open(path, 'wb') as output:
+            self._process = subprocess.Popen(
+                command, stdin=subprocess.PIPE, stdout=output, stderr=self._stderr)
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._process.stdin.write(b)
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self._process.stdin.close()
+            try:
+                if self._process.wait() != 0:
+                    raise Exception("Command '{}' failed with exit status {}: {}".format(
+                        ' '.join(self._command), self._process.returncode,
+                        _error_output(self._stderr)))
+            finally:
+                self._stderr.close()
+
+
+class _ThreadedWriter(io.RawIOBase):
+    '''Raw binary stream which passes data to another (compressing) stream on
+    a background thread, so that compression overlaps with the producer.'''
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._queue = queue.Queue(maxsize=_MAX_QUEUED_CHUNKS)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is None:
+                try:
+                    self._fp.write(item)
+                except Exception as e:
+                    self._error = e
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        if self._error is not None:
+            raise self._error
+        self._queue.put(bytes(b))
+        return len(b)
+
+    def close(self):
+        if not self.closed:
+            super().close()
+            self._queue.put(None)
+            self._thread.join()
+            self._fp.close()
+            if self._error is not None:
+                raise self._error
+
+
+def open_compressed_writer(path, compression='auto', threads=1, level=None,
+                           use_external_tools=True):
+    '''Open path for writing in binary mode, compressing the output with
+    gzip, bzip2, xz or zstd. With compression='auto' the format is chosen
+    from the file extension, and None means no compression.
+
+    Compression is carried out by an external program (pigz, lbzip2/pbzip2,
+    xz or zstd) where one is installed, and otherwise by the python codecs on
+    a background thread.'''
+    if compression == 'auto':
+        compression = compression_from_extension(path)
+    if compression is None:
+        return open(path, 'wb')
+    command = None
+    if use_external_tools:
+        command = _external_compress_command(compression, threads, level)
+    if command is not None:
+        raw = _ProcessWriter(command, path)
+    else:
+        raw = _ThreadedWriter(_open_in_process_writer(compression, path, level))
+    return io.BufferedWriter(raw, buffer_size=_CHUNK_SIZE)
@@ -0,0 +1,215 @@
+import itertools
+import json
+import os
+
+from .compression import open_compressed
+from .sequence import DEFAULT_BLOCK_SIZE, _iter_fastx_blocks
+
+# Sidecar cache files are named path + COUNT_CACHE_SUFFIX
+COUNT_CACHE_SUFFIX = '.seqcount'
+
+
+class _Irregular(Exception):
+    '''Raised when FASTQ input is not in the regular 4-line layout, so that
+    counting falls back to the full parser'''
+    pass
+
+
+def _count_fasta(f, block_size):
+    records = 0
+    bases = 0
+    carry = b''
+    seen_header = False
+    while True:
+        # Read at least as much as is carried over, so that records longer
+        # than block_size are not re-scanned many times over
+        chunk = f.read(max(block_size, len(carry)))
+        buf = carry + chunk
+        if not seen_header:
+            # Lines before the first header are ignored, as by readfq
+            if not buf.startswith(b'>'):
+                start = buf.find(b'\n>') + 1
+                if start == 0:
+                    if not chunk:
+                        return records, bases
+                    # Keep the last line in case it is a header
+                    carry = buf[buf.rfind(b'\n') + 1:]
+                    continue
+                buf = buf[start:]
+            seen_header = True
+        if chunk:
+            # Only count whole records, ending before the last header
+            cut = buf.rfind(b'\n>') + 1
+            region = buf[:cut]
+            carry = buf[cut:]
+        else:
+            region = buf if buf.endswith(b'\n') else buf + b'\n'
+        if b'\r' in region:
+            # CRLF line endings, read as LF as in text mode. region always
+            # ends with a newline, so none are split.
+            region = region.replace(b'\r\n', b'\n')
+        if region:
+            # Lines starting with '@' or '+' make readfq treat records as
+            # FASTQ, so leave such unusual input to the parser. Checking for
+            # the single characters first is quicker as they are usually
+            # absent.
+            for c in (b'@', b'+'):
+                if c in region and b'\n' + c in region:
+                    raise _Irregular()
+            # region is whole records, so splitting it at newlines followed
+            # by '>' leaves a header at the start of each piece, ending at
+            # the piece's first newline. All but the first have lost their
+            # '>' to the split.
+            pieces = region.split(b'\n>')
+            records += len(pieces)
+            header_ends = list(map(bytes.find, pieces, itertools.repeat(b'\n')))
+            if -1 in header_ends:
+                # Records with no sequence lines, whose piece is all header
+                header_ends = [len(piece) if e == -1 else e
+                               for piece, e in zip(pieces, header_ends)]
+            header_bytes = sum(header_ends) + len(pieces) - 1
+            bases += len(region) - region.count(b'\n') - header_bytes
+        if not chunk:
+            return records, bases
+
+
+def _count_regular_fastq(f, block_size):
+    records = 0
+    bases = 0
+    carry = b''
+    while True:
+        chunk = f.read(block_size)
+        buf = carry + chunk
+        if not chunk:
+            if not buf:
+                return records, bases
+            if not buf.endswith(b'\n'):
+                # No newline at the end of the file
+                buf += b'\n'
+        end = buf.rfind(b'\n') + 1
+        block = buf[:end]
+        if b'\r' in block:
+            # CRLF line endings, read as LF as in text mode
+            block = block.replace(b'\r\n', b'\n')
+        lines = block.split(b'\n')
+        lines.pop()
+        count = len(lines) // 4 * 4
+        if count:
+            headers = lines[0:count:4]
+            seqs = lines[1:count:4]
+            joined_headers = b'\n'.join(headers)
+            # Validating whole blocks at once as _iter_fastx_blocks does, but
+            # comparing total rather than per-record quality lengths.
+            # Counting lines rather than '@' markers means that quality
+            # lines starting with '@' do not matter.
+            block_bases = sum(map(len, seqs))
+            if not (joined_headers.startswith(b'@') and
+                    joined_headers.count(b'\n@') == len(headers) - 1 and
+                    b''.join(lines[2:count:4]) == b'+' * len(seqs) and
+                    sum(map(len, lines[3:count:4])) == block_bases):
+                raise _Irregular()
+            joined_seqs = b'\n' + b'\n'.join(seqs)
+            for c in (b'@', b'+', b'>'):
+                if c in joined_seqs and b'\n' + c in joined_seqs:
+                    raise _Irregular()
+            records += len(seqs)
+            bases += block_bases
+        if not chunk:
+            if count != len(lines):
+                # Truncated final record
+                raise _Irregular()
+            return records, bases
+        carry = b''.join(line + b'\n' for line in lines[count:]) + buf[end:]
+
+
+def _count_by_parsing(f, block_size):
+    records = 0
+    bases = 0
+    for block in _iter_fastx_blocks(f, block_size):
+        records += len(block[1])
+        bases += sum(map(len, block[1]))
+    return records, bases
+
+
+def _count(path, threads, block_size):
+    with open_compressed(path, threads=threads) as f:
+        first = f.read(1)
+        # Skip any leading blank lines
+        while first in (b'\n', b'\r'):
+            first = f.read(1)
+        if not first:
+            return 0, 0
+        f = _Prepended(first, f)
+        try:
+            if first == b'>':
+                return _count_fasta(f, block_size)
+            elif first == b'@':
+                return _count_regular_fastq(f, block_size)
+        except _Irregular:
+            pass
+    with open_compressed(path, threads=threads) as f:
+        return _count_by_parsing(f, block_size)
+
+
+class _Prepended:
+    '''File-like object returning some bytes already read from f before the
+    rest of f'''
+
+    def __init__(self, prefix, f):
+        self._prefix = prefix
+        self._f = f
+
+    def read(self, size=-1):
+        if self._prefix:
+            prefix = self._prefix
+            self._prefix = b''
+            return prefix + self._f.read(max(size - len(prefix), 1) if size > 0 else size)
+        return self._f.read(size)
+
+
+def _cache_key(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def count_records(path, threads=1, cache=False, cache_path=None,
+                  block_size=DEFAULT_BLOCK_SIZE):
+    '''Count the records and total bases in a possibly compressed FASTA or
+    FASTQ file, returning (num_records, num_bases), with the same result as
+    counting the output of SeqReader.readfq.
+
+    Large blocks are scanned with bytes.count and friends rather than
+    building a string for every record: FASTA headers are counted as
+    newlines followed by '>', and regular 4-line FASTQ by counting lines,
+    so that '@' characters in quality lines do not matter. Anything else
+    (e.g. multi-line FASTQ) is counted with the block parser.
+
+    If cache is True, the counts are saved to a sidecar file (cache_path,
+    default path + '.seqcount') along with the size and modification time of
+    path, and reused on later calls while these are unchanged.
+    '''
+    if cache:
+        if cache_path is None:
+            cache_path = path + COUNT_CACHE_SUFFIX
+        key = _cache_key(path)
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('size') == key['size'] and cached.get('mtime_ns') == key['mtime_ns']:
+                return cached['records'], cached['bases']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    records, bases = _count(path, threads, block_size)
+
+    if cache:
+        key['records'] = records
+        key['bases'] = bases
+        try:
+            tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+            with open(tmp_path, 'w') as f:
+                json.dump(key, f)
+            os.replace(tmp_path, cache_path)
+        except OSError:
+            pass
+    return records, bases
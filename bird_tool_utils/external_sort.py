@@ -0,0 +1,222 @@
+import heapq
+import itertools
+import operator
+import os
+import pickle
+
+from .parallel import chunked, shared_executor
+from .runtime import configured_memory_limit
+from .scratch import workspace
+
+# Memory budget used when none is given and --memory-limit was not set
+DEFAULT_MEMORY_BUDGET = 512 * 1024 * 1024
+
+SORT_KEYS = ('name', 'length', 'sequence')
+
+# Approximate memory used by a record tuple and its bytes objects, besides
+# the bytes themselves
+_RECORD_OVERHEAD = 200
+# Runs are written and read back in pickled batches of about this many bytes,
+# so merging k runs needs about k times this much memory
+_RUN_BATCH_BYTES = 1024 * 1024
+
+
+def _record_size(record):
+    qual = record[2]
+    return len(record[0]) + len(record[1]) + (len(qual) if qual is not None else 0) + \
+        _RECORD_OVERHEAD
+
+
+def _length(record):
+    return len(record[1])
+
+
+_BASE_KEYS = {
+    'name': operator.itemgetter(0),
+    'length': _length,
+    'sequence': operator.itemgetter(1),
+}
+
+
+def _key_function(key, indexed, reverse):
+    '''Return the sort key function. Indexed records carry their input
+    position as a 4th element, used to break ties so that records with equal
+    keys stay in input order, even after an earlier sort.'''
+    if key is None:
+        return operator.itemgetter(3)
+    base = _BASE_KEYS[key]
+    if not indexed:
+        return base
+    if reverse:
+        return lambda record: (base(record), -record[3])
+    return lambda record: (base(record), record[3])
+
+
+def _unique_sequences(records):
+    '''Generator dropping records whose sequence is the same as that of the
+    record before, i.e. duplicates, given records sorted by sequence'''
+    previous = None
+    for record in records:
+        if record[1] != previous:
+            previous = record[1]
+            yield record
+
+
+def _write_run(records, path):
+    with open(path, 'wb') as f:
+        for batch in chunked(records, max_bytes=_RUN_BATCH_BYTES, size=_record_size):
+            pickle.dump(batch, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _read_run(path):
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                batch = pickle.load(f)
+            except EOFError:
+                return
+            yield from batch
+
+
+def _sort_run(records, key, indexed, reverse, dedupe):
+    records.sort(key=_key_function(key, indexed, reverse), reverse=reverse)
+    if dedupe:
+        return _unique_sequences(records)
+    return records
+
+
+def _sort_and_write_run(records, key, indexed, reverse, dedupe, path):
+    # Run in a worker process when sorting runs in parallel
+    return _write_run(_sort_run(records, key, indexed, reverse, dedupe), path)
+
+
+def _merge(iterables, key, indexed, reverse, dedupe):
+    merged = heapq.merge(*iterables, key=_key_function(key, indexed, reverse), reverse=reverse)
+    if dedupe:
+        return _unique_sequences(merged)
+    return merged
+
+
+def _external_sort(records, key, indexed, reverse, dedupe, memory_budget, threads,
+                   scratch_dir):
+    '''Generator function sorting record tuples within memory_budget bytes,
+    spilling sorted runs to disk as needed'''
+    # Runs being sorted in worker processes, the run being filled, and the
+    # next run read ahead to check whether there is more than one, may all
+    # be in memory at once
+    in_flight = threads if threads > 1 else 0
+    runs = chunked(records, max_bytes=max(1, memory_budget // (in_flight + 2)),
+                   size=_record_size)
+    run = next(runs, None)
+    if run is None:
+        return
+    following = next(runs, None)
+    if following is None:
+        # Everything fits in memory
+        yield from _sort_run(run, key, indexed, reverse, dedupe)
+        return
+
+    run_args = (key, indexed, reverse, dedupe)
+    with workspace(prefix='bird_tool_utils-sort-', scratch_dir=scratch_dir) as directory:
+        numbers = itertools.count()
+
+        def run_path():
+            return os.path.join(directory, 'run{}'.format(next(numbers)))
+
+        paths = []
+        pending = []
+        executor = shared_executor('process') if in_flight else None
+        while run is not None:
+            if executor is None:
+                paths.append(_sort_and_write_run(run, *run_args, run_path()))
+            else:
+                if len(pending) >= in_flight:
+                    paths.append(pending.pop(0).result())
+                pending.append(executor.submit(_sort_and_write_run, run, *run_args, run_path()))
+            run = following
+            following = next(runs, None) if following is not None else None
+        paths.extend(future.result() for future in pending)
+        del pending
+
+        # Merge runs in groups if there are too many to merge at once within
+        # the memory budget. Groups are of consecutive runs, so that records
+        # with equal keys stay in input order.
+        max_fan_in = max(2, memory_budget // _RUN_BATCH_BYTES)
+        while len(paths) > max_fan_in:
+            merged = []
+            for i in range(0, len(paths), max_fan_in):
+                group = paths[i:i + max_fan_in]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                merged.append(_write_run(
+                    _merge([_read_run(p) for p in group], *run_args), run_path()))
+                for p in group:
+                    os.remove(p)
+            paths = merged
+        yield from _merge([_read_run(p) for p in paths], *run_args)
+
+
+def sort_records(records, key='name', reverse=False, dedupe=False, memory_budget=None,
+                 threads=1, scratch_dir=None):
+    '''Generator function sorting (name, seq, qual) or (name, seq) records
+    (e.g. from SeqReader.readfq with bytes_mode=True) by key, one of 'name',
+    'length' or 'sequence', yielding (name, seq, qual) tuples. Records with
+    equal keys are yielded in input order. If dedupe is True, only the first
+    of each group of records with exactly the same sequence is kept, and key
+    may be None to keep the survivors in input order.
+
+    Records are collected into runs which fit within memory_budget bytes
+    (default: half of --memory-limit if set, see
+    BirdArgparser.parse_the_args, otherwise DEFAULT_MEMORY_BUDGET). If the
+    input does not fit in one run, each run is sorted and written to a
+    workspace in scratch_dir (see workspace), and the runs are then merged
+    with a k-way heap merge. With threads > 1, runs are sorted and written
+    in worker processes (see shared_executor) while the next run is read.
+    Deduplicating by anything other than key='sequence' needs a second
+    sorting pass.'''
+    if key is not None and key not in _BASE_KEYS:
+        raise Exception("Unknown sort key {}, expected one of {}".format(
+            key, ', '.join(SORT_KEYS)))
+    if key is None and not dedupe:
+        raise Exception("A sort key is required unless deduplicating")
+    if memory_budget is None:
+        limit = configured_memory_limit()
+        memory_budget = limit // 2 if limit else DEFAULT_MEMORY_BUDGET
+    records = ((r[0], r[1], r[2] if len(r) > 2 else None) for r in records)
+
+    if not dedupe or key == 'sequence':
+        yield from _external_sort(
+            records, key, False, reverse, dedupe, memory_budget, threads, scratch_dir)
+        return
+
+    # Remove duplicates by sorting on sequence, keeping the input position of
+    # each record so that the survivors can then be sorted stably by key, or
+    # put back into input order.
+    indexed = ((r[0], r[1], r[2], i) for i, r in enumerate(records))
+    unique = _external_sort(
+        indexed, 'sequence', True, False, True, memory_budget, threads, scratch_dir)
+    for record in _external_sort(
+            unique, key, True, reverse if key is not None else False, False,
+            memory_budget, threads, scratch_dir):
+        yield record[:3]
+
+
+def sort_file(input_path, output_path, key='name', reverse=False, dedupe=False,
+              memory_budget=None, threads=1, scratch_dir=None, line_width=None):
+    '''Sort and/or deduplicate a possibly compressed FASTA/FASTQ file with
+    sort_records, writing the result to output_path with SeqWriter
+    (compressed according to its extension). Returns the number of records
+    written.'''
+    from .sequence import SeqReader
+    from .writer import SeqWriter
+    count = 0
+    records = SeqReader().readfq_path(input_path, bytes_mode=True, threads=threads)
+    with SeqWriter(output_path, line_width=line_width, threads=threads) as writer:
+        for name, seq, qual in sort_records(
+                records, key=key, reverse=reverse, dedupe=dedupe,
+                memory_budget=memory_budget, threads=threads, scratch_dir=scratch_dir):
+            writer.write(name, seq, qual)
+            count += 1
+    return count
@@ -0,0 +1,204 @@
+import itertools
+from array import array
+from bisect import bisect_left
+
+from .compression import open_compressed
+from .sequence import DEFAULT_BLOCK_SIZE, _iter_fastx_blocks, _block_names, _check_mates
+from .subsample import _aligned_blocks, _interleaved_blocks, _record
+
+_MASK64 = (1 << 64) - 1
+
+
+def _optional_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _strip_mate_suffix(name):
+    if name[-2:] in (b'/1', b'/2'):
+        return name[:-2]
+    return name
+
+
+class ReadNameSet:
+    '''A compact set of read names, for testing millions of reads against
+    millions of names. Names are stored only as a sorted array of their
+    64-bit hashes (8 bytes per name, rather than the ~100 of a set of str),
+    and looked up by binary search, vectorised with NumPy when it is
+    installed. Distinct names may share a hash, but with 64 bits this is
+    vanishingly rare.
+
+    With bloom_bits_per_name, a Bloom filter of that many bits per name is
+    checked first, which is quicker than the binary search when most reads
+    are not in the set. Hashes are those of python's hash(), so a
+    ReadNameSet is only meaningful within one process.
+
+    Names are str or bytes. Unless strip_mate_suffix is False, a trailing /1
+    or /2 is ignored, both here and when testing reads.'''
+
+    def __init__(self, names, bloom_bits_per_name=None, strip_mate_suffix=True):
+        self.strip_mate_suffix = strip_mate_suffix
+        self._np = np = _optional_numpy()
+        hashes = array('q', map(self._hash, names))
+        if np is not None:
+            self._hashes = np.unique(np.frombuffer(hashes, dtype=np.int64))
+        else:
+            self._hashes = array('q', sorted(set(hashes)))
+        del hashes
+        self._bloom = None
+        if bloom_bits_per_name:
+            # The number of hash functions minimising false positives
+            self._bloom_hashes = max(1, round(bloom_bits_per_name * 0.69))
+            self._bloom_bits = max(64, int(bloom_bits_per_name * len(self._hashes)))
+            if np is not None:
+                flags = np.zeros(self._bloom_bits, dtype=bool)
+                for positions in self._bloom_positions_many(self._hashes):
+                    flags[positions] = True
+                self._bloom = np.packbits(flags, bitorder='little')
+            else:
+                self._bloom = bytearray((self._bloom_bits + 7) // 8)
+                for h in self._hashes:
+                    for bit in self._bloom_positions(h):
+                        self._bloom[bit >> 3] |= 1 << (bit & 7)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        '''Read names from a possibly compressed file with one per line.
+        Only the first word of each line is used, and any leading '@' or '>'
+        is removed, so a FASTA/FASTQ header list also works.'''
+        def names():
+            with open_compressed(path) as f:
+                for line in f:
+                    words = line.split(None, 1)
+                    if words:
+                        name = words[0]
+                        yield name[1:] if name[:1] in (b'@', b'>') else name
+        return cls(names(), **kwargs)
+
+    def _hash(self, name):
+        if isinstance(name, str):
+            name = name.encode()
+        if self.strip_mate_suffix:
+            name = _strip_mate_suffix(name)
+        return hash(name)
+
+    def _hash_many(self, names):
+        '''Return an iterator of the hashes of a list of names, as _hash but
+        with the per-name work only done where needed'''
+        try:
+            joined = b'\n'.join(names) + b'\n'
+        except TypeError:
+            # Some are str
+            return map(self._hash, names)
+        if self.strip_mate_suffix and (b'/1\n' in joined or b'/2\n' in joined):
+            return map(hash, map(_strip_mate_suffix, names))
+        return map(hash, names)
+
+    def _bloom_positions(self, h):
+        # Double hashing from the two halves of the 64-bit hash
+        h &= _MASK64
+        h1 = h & 0xffffffff
+        h2 = (h >> 32) | 1
+        return [(h1 + i * h2) % self._bloom_bits for i in range(self._bloom_hashes)]
+
+    def _bloom_positions_many(self, hashes):
+        # As _bloom_positions, for a NumPy array of hashes, with i * h2
+        # reduced modulo the number of bits first so that it cannot overflow
+        np = self._np
+        unsigned = hashes.view(np.uint64)
+        m = np.uint64(self._bloom_bits)
+        h1 = unsigned & np.uint64(0xffffffff)
+        h2 = ((unsigned >> np.uint64(32)) | np.uint64(1)) % m
+        for i in range(self._bloom_hashes):
+            yield (h1 + (np.uint64(i) * h2) % m) % m
+
+    def _in_bloom(self, h):
+        bloom = self._bloom
+        for bit in self._bloom_positions(h):
+            if not bloom[bit >> 3] & (1 << (bit & 7)):
+                return False
+        return True
+
+    def _in_bloom_many(self, hashes):
+        np = self._np
+        passed = np.ones(len(hashes), dtype=bool)
+        for positions in self._bloom_positions_many(hashes):
+            passed &= (self._bloom[positions >> np.uint64(3)] >>
+                       (positions & np.uint64(7)).astype(np.uint8)) & 1 == 1
+        return passed
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, name):
+        return self.contains_many([name])[0]
+
+    def contains_many(self, names):
+        '''Return a list of booleans, whether each of names is in the set'''
+        hashes = self._hashes
+        if len(hashes) == 0:
+            return [False] * len(names)
+        np = self._np
+        if np is not None:
+            query = np.fromiter(self._hash_many(names), dtype=np.int64, count=len(names))
+            if self._bloom is None:
+                candidates = query
+            else:
+                passed = self._in_bloom_many(query)
+                candidates = query[passed]
+            positions = np.minimum(np.searchsorted(hashes, candidates), len(hashes) - 1)
+            found = hashes[positions] == candidates
+            if self._bloom is not None:
+                passed[passed] = found
+                found = passed
+            return found.tolist()
+        result = []
+        n = len(hashes)
+        for h in self._hash_many(names):
+            if self._bloom is not None and not self._in_bloom(h):
+                result.append(False)
+                continue
+            i = bisect_left(hashes, h)
+            result.append(i < n and hashes[i] == h)
+        return result
+
+
+def extract_reads(names, forward, reverse=None, interleaved=False, exclude=False,
+                  check_names=True, name_prefix_length=None,
+                  block_size=DEFAULT_BLOCK_SIZE):
+    '''Generator function yielding the records of FASTA/FASTQ binary
+    file-like objects whose names are in names (a ReadNameSet, or an
+    iterable of str or bytes names to build one from), or with exclude=True
+    those whose names are not. Records are (name, seq, qual) bytes tuples,
+    or pairs of them for paired input (a reverse file, or
+    interleaved=True), in which case pairs are chosen by the name of the
+    forward read.
+
+    Input is parsed in blocks as by SeqReader.readfq_bytes, and the names of
+    a whole block are looked up at once from the headers alone, so record
+    tuples are only built for the reads which are kept. Unless check_names
+    is False, the names of kept pairs are checked to match, as for
+    SeqReader.read_pairs.'''
+    if not isinstance(names, ReadNameSet):
+        names = ReadNameSet(names)
+    blocks = _iter_fastx_blocks(forward, block_size)
+    if reverse is not None:
+        groups = _aligned_blocks(blocks, _iter_fastx_blocks(reverse, block_size))
+    elif interleaved:
+        groups = _interleaved_blocks(blocks)
+    else:
+        groups = ((block,) for block in blocks)
+    paired = reverse is not None or interleaved
+
+    for mates in groups:
+        found = names.contains_many(_block_names(mates[0]))
+        if exclude:
+            found = [not f for f in found]
+        for i in itertools.compress(range(len(found)), found):
+            record = _record(mates, i)
+            if paired and check_names:
+                _check_mates([record[0]], [record[1]], name_prefix_length)
+            yield record
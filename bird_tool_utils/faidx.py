@@ -0,0 +1,219 @@
+import mmap
+import os
+from collections import OrderedDict
+
+from .compression import detect_compression
+
+
+class FastaIndexEntry:
+    '''One line of a samtools-compatible .fai index'''
+
+    def __init__(self, name, length, offset, line_bases, line_width):
+        self.name = name
+        self.length = length
+        self.offset = offset
+        self.line_bases = line_bases
+        self.line_width = line_width
+
+    def to_fai_line(self):
+        return '{}\t{}\t{}\t{}\t{}\n'.format(
+            self.name, self.length, self.offset, self.line_bases, self.line_width)
+
+    def file_offset(self, position):
+        '''Return the offset in the FASTA file of the 0-based position in
+        this sequence'''
+        return self.offset + (position // self.line_bases) * self.line_width + \
+            position % self.line_bases
+
+
+class FastaIndex:
+    '''A faidx-style index of an uncompressed FASTA file, allowing whole
+    records or subregions to be fetched by name without re-reading the file.
+
+    Use FastaIndex.open(path) to load path + '.fai' if it exists and is up to
+    date, or otherwise build it in a single pass over the file and try to
+    save it. Regions are fetched with fetch(name, start, end), reading with
+    seek/read or, with use_mmap=True, by slicing a memory map of the file.
+    '''
+
+    def __init__(self, fasta_path, entries, use_mmap=False):
+        self.fasta_path = fasta_path
+        self.entries = OrderedDict((e.name, e) for e in entries)
+        self._use_mmap = use_mmap
+        self._file = None
+        self._mmap = None
+
+    @classmethod
+    def open(cls, fasta_path, fai_path=None, use_mmap=False):
+        if fai_path is None:
+            fai_path = fasta_path + '.fai'
+        if os.path.exists(fai_path) and \
+                os.path.getmtime(fai_path) >= os.path.getmtime(fasta_path):
+            return cls.load(fasta_path, fai_path, use_mmap=use_mmap)
+        index = cls.build(fasta_path, use_mmap=use_mmap)
+        try:
+            index.write(fai_path)
+        except OSError:
+            pass
+        return index
+
+    @classmethod
+    def load(cls, fasta_path, fai_path=None, use_mmap=False):
+        '''Load an existing .fai index'''
+        if fai_path is None:
+            fai_path = fasta_path + '.fai'
+        entries = []
+        with open(fai_path) as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 5:
+                    raise Exception("Unexpected line in FASTA index {}: {}".format(
+                        fai_path, line))
+                entries.append(FastaIndexEntry(
+                    fields[0], *[int(field) for field in fields[1:5]]))
+        return cls(fasta_path, entries, use_mmap=use_mmap)
+
+    @classmethod
+    def build(cls, fasta_path, use_mmap=False):
+        '''Build an index by reading through the FASTA file once'''
+        if detect_compression(fasta_path) is not None:
+            raise Exception(
+                "Indexing is only supported for uncompressed FASTA files, not {}".format(
+                    fasta_path))
+        entries = []
+        entry = None
+        # Set once a line shorter than line_bases is seen, after which only
+        # the next header is acceptable
+        short_line_seen = False
+        offset = 0
+        with open(fasta_path, 'rb') as f:
+            for line in f:
+                line_width = len(line)
+                if line.startswith(b'>'):
+                    name = line[1:].split(None, 1)
+                    if len(name) == 0:
+                        raise Exception("Empty FASTA header found at offset {} of {}".format(
+                            offset, fasta_path))
+                    entry = FastaIndexEntry(
+                        name[0].decode(), 0, offset + line_width, 0, 0)
+                    entries.append(entry)
+                    short_line_seen = False
+                elif entry is None:
+                    if line.strip():
+                        raise Exception("{} does not start with a FASTA header".format(
+                            fasta_path))
+                else:
+                    bases = len(line.rstrip(b'\r\n'))
+                    if bases == 0:
+                        short_line_seen = True
+                    elif short_line_seen or (entry.line_bases > 0 and (
+                            bases > entry.line_bases or
+                            (line_width != entry.line_width and
+                             bases == entry.line_bases and line.endswith(b'\n')))):
+                        raise Exception(
+                            "Different line lengths found in sequence {} of {}, "
+                            "which cannot be indexed".format(entry.name, fasta_path))
+                    elif entry.line_bases == 0:
+                        entry.line_bases = bases
+                        entry.line_width = line_width
+                    elif bases < entry.line_bases:
+                        short_line_seen = True
+                    entry.length += bases
+                offset += line_width
+        return cls(fasta_path, entries, use_mmap=use_mmap)
+
+    def write(self, fai_path=None):
+        if fai_path is None:
+            fai_path = self.fasta_path + '.fai'
+        with open(fai_path, 'w') as f:
+            for entry in self.entries.values():
+                f.write(entry.to_fai_line())
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def names(self):
+        return list(self.entries.keys())
+
+    def length(self, name):
+        return self.entries[name].length
+
+    def fetch(self, name, start=0, end=None):
+        '''Return the sequence of the named record from 0-based position start
+        up to but not including end (default: the end of the sequence), as
+        bytes.'''
+        return self._fetch(name, start, end, False)
+
+    def fetch_view(self, name, start=0, end=None):
+        '''As fetch, but return a read-only memoryview. With use_mmap=True, a
+        region within a single line of the file is a view of the memory map
+        itself, without copying, which is only valid until close(). Other
+        regions are copied, and have their line breaks removed.'''
+        return self._fetch(name, start, end, True)
+
+    def _fetch(self, name, start, end, view):
+        entry = self.entries[name]
+        if end is None or end > entry.length:
+            end = entry.length
+        if start < 0:
+            start = 0
+        if start >= end:
+            return memoryview(b'') if view else b''
+        first = entry.file_offset(start)
+        last = entry.file_offset(end - 1) + 1
+        if self._use_mmap:
+            if self._mmap is None:
+                self._open()
+            if view and last - first == end - start:
+                # No line breaks to remove
+                return memoryview(self._mmap)[first:last]
+            region = self._mmap[first:last]
+        else:
+            if self._file is None:
+                self._open()
+            self._file.seek(first)
+            region = self._file.read(last - first)
+        if entry.line_bases < entry.line_width:
+            region = region.replace(b'\n', b'')
+            if entry.line_width - entry.line_bases == 2:
+                region = region.replace(b'\r', b'')
+        return memoryview(region) if view else region
+
+    def fetch_region(self, region):
+        '''Fetch a samtools-style region string i.e. 'name', 'name:start' or
+        'name:start-end' where positions are 1-based and inclusive.'''
+        if region in self.entries:
+            return self.fetch(region)
+        name, _, coordinates = region.rpartition(':')
+        if name not in self.entries:
+            raise KeyError(region)
+        start, _, end = coordinates.replace(',', '').partition('-')
+        return self.fetch(
+            name, int(start) - 1, int(end) if end else None)
+
+    def _open(self):
+        self._file = open(self.fasta_path, 'rb')
+        if self._use_mmap:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # memoryviews from fetch_view are still in use, so leave the map
+                # to be closed once they are released
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,112 @@
+import hashlib
+import os
+
+# Bump when the way pages are rendered changes, to invalidate old caches
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_directory():
+    '''Directory where rendered man pages are cached. Defaults to
+    bird_tool_utils/manpages inside $XDG_CACHE_HOME (or ~/.cache), and can be
+    overridden with the BIRD_TOOL_UTILS_CACHE_DIR environment variable.'''
+    base = os.environ.get('BIRD_TOOL_UTILS_CACHE_DIR')
+    if base is None:
+        base = os.path.join(
+            os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+            'bird_tool_utils')
+    return os.path.join(base, 'manpages')
+
+
+# Distributions providing build_manpages, which renders the pages
+RENDERER_DISTRIBUTIONS = ('argparse-manpage-birdtools', 'argparse-manpage')
+
+
+def renderer_version():
+    '''Version of the installed distribution of RENDERER_DISTRIBUTIONS
+    (the first found), which renders the pages, or None if there is none'''
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:
+        # Python 3.7
+        version = None
+    if version is not None:
+        for distribution in RENDERER_DISTRIBUTIONS:
+            try:
+                return '{} {}'.format(distribution, version(distribution))
+            except PackageNotFoundError:
+                pass
+    try:
+        import build_manpages
+    except ImportError:
+        return None
+    return getattr(build_manpages, '__version__', None)
+
+
+def _stable(value):
+    '''Return a representation of value which is the same in every process,
+    unlike the repr of functions and most other objects, which includes
+    their memory address'''
+    if value is None or isinstance(value, (str, bytes, bool, int, float)):
+        return repr(value)
+    if isinstance(value, (list, tuple)):
+        return '[{}]'.format(', '.join(_stable(v) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return '{{{}}}'.format(', '.join(sorted(_stable(v) for v in value)))
+    if isinstance(value, dict):
+        return '{{{}}}'.format(', '.join(sorted(
+            '{}: {}'.format(_stable(k), _stable(v)) for k, v in value.items())))
+    if hasattr(value, '__qualname__'):
+        # Functions and classes
+        return '{}.{}'.format(getattr(value, '__module__', None), value.__qualname__)
+    return type(value).__qualname__
+
+
+def parser_fingerprint(parser, *extra):
+    '''Return a hash of the definition of an argparse parser (its arguments,
+    groups and descriptions) together with any extra values, the cache
+    format version and the version of the renderer'''
+    h = hashlib.sha256()
+
+    def add(*values):
+        for value in values:
+            h.update(_stable(value).encode())
+            h.update(b'\0')
+
+    add(CACHE_FORMAT_VERSION, renderer_version(), parser.prog, parser.description,
+        parser.epilog)
+    for group in parser._action_groups:
+        add('group', group.title, group.description)
+        for action in group._group_actions:
+            add(action.option_strings, action.dest, action.nargs, action.const,
+                action.default, action.choices, action.required, action.help,
+                action.metavar, action.type, type(action).__name__)
+    add(*extra)
+    return h.hexdigest()
+
+
+def manpage_filename(program_invocation, version, subcommand, fingerprint):
+    return '{}-{}-{}-{}.roff'.format(
+        program_invocation, version, subcommand, fingerprint[:16])
+
+
+def find_cached_manpage(filename, directories):
+    '''Return the path of filename in the first of directories (ignoring
+    None entries) which contains it, or None'''
+    for directory in directories:
+        if directory is not None:
+            path = os.path.join(directory, filename)
+            if os.path.exists(path):
+                return path
+    return None
+
+
+def store_manpage(roff, filename, directory):
+    '''Write roff to filename in directory, atomically so that concurrent
+    processes never see a partial page. Returns the path written.'''
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, filename)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(roff)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,164 @@
+import atexit
+import collections
+import itertools
+import os
+import sys
+import threading
+
+from .runtime import configured_threads
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def shared_executor(kind='thread'):
+    '''Return a process-wide concurrent.futures executor of the given kind
+    ('thread' or 'process'), creating it on first use with one worker per
+    configured thread (or CPU if configure has not been called). It is shut
+    down at exit, so callers should not shut it down themselves.'''
+    with _executors_lock:
+        if kind not in _executors:
+            _executors[kind] = _make_executor(kind, _default_workers())
+        return _executors[kind]
+
+
+def shutdown_executors():
+    with _executors_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=True)
+
+
+atexit.register(shutdown_executors)
+
+
+def _default_workers():
+    return configured_threads() or os.cpu_count() or 1
+
+
+def _approximate_size(item):
+    '''Approximate size in bytes of an item, counting the characters of str
+    and bytes objects, including those nested in tuples and lists (such as
+    (name, seq, qual) records).'''
+    if isinstance(item, (bytes, str, bytearray, memoryview)):
+        return len(item)
+    if isinstance(item, (tuple, list)):
+        return sum(_approximate_size(i) for i in item if i is not None)
+    return sys.getsizeof(item)
+
+
+def chunked(iterable, n=None, max_bytes=None, size=_approximate_size):
+    '''Split an iterable into lists of at most n items and/or whose sizes
+    (as given by size(item)) sum to at most about max_bytes, without padding
+    the last chunk. A chunk always holds at least one item, even if that item
+    alone is larger than max_bytes.
+    '''
+    if n is None and max_bytes is None:
+        raise Exception("At least one of n and max_bytes must be specified")
+    if n is not None and n < 1:
+        raise Exception("Chunk size must be at least 1, not {}".format(n))
+    if max_bytes is None:
+        # Quicker than checking the length of the chunk after every item
+        iterator = iter(iterable)
+        while True:
+            chunk = list(itertools.islice(iterator, n))
+            if not chunk:
+                return
+            yield chunk
+    chunk = []
+    chunk_bytes = 0
+    for item in iterable:
+        if max_bytes is not None:
+            item_bytes = size(item)
+            if chunk and chunk_bytes + item_bytes > max_bytes:
+                yield chunk
+                chunk = []
+                chunk_bytes = 0
+            chunk_bytes += item_bytes
+        chunk.append(item)
+        if n is not None and len(chunk) >= n:
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+    if chunk:
+        yield chunk
+
+
+def _map_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def _make_executor(executor, workers):
+    import concurrent.futures
+    if executor == 'thread':
+        return concurrent.futures.ThreadPoolExecutor(workers)
+    elif executor == 'process':
+        return concurrent.futures.ProcessPoolExecutor(workers)
+    else:
+        raise Exception("Unknown executor type {}, expected 'thread' or 'process'".format(
+            executor))
+
+
+def chunked_map(func, iterable, chunk_size=1000, max_chunk_bytes=None,
+                executor='thread', workers=None, max_in_flight=None,
+                ordered=True):
+    '''Generator yielding func(item) for each item of iterable, computed in
+    chunks (see chunked) on a pool of threads or processes.
+
+    At most max_in_flight chunks (default: twice the number of workers) are
+    submitted at any one time, so iterable is only read as fast as results
+    are consumed and large inputs are never held in memory all at once. If
+    ordered is False, the results of each chunk are yielded as soon as it is
+    finished rather than in input order.
+
+    executor is 'thread', 'process' or an existing
+    concurrent.futures.Executor (such as shared_executor()), which is not
+    shut down afterwards. With 'process', func must be picklable i.e.
+    defined at the top level of a module. workers defaults to the number of
+    threads given to configure, or otherwise the number of CPUs.
+    '''
+    import concurrent.futures
+    if workers is None:
+        workers = _default_workers()
+    if max_in_flight is None:
+        max_in_flight = 2 * workers
+    if max_in_flight < 1:
+        raise Exception("max_in_flight must be at least 1, not {}".format(max_in_flight))
+
+    if isinstance(executor, concurrent.futures.Executor):
+        pool = executor
+        shutdown = False
+    else:
+        pool = _make_executor(executor, workers)
+        shutdown = True
+
+    in_flight = collections.deque() if ordered else set()
+    try:
+        for chunk in chunked(iterable, n=chunk_size, max_bytes=max_chunk_bytes):
+            if len(in_flight) >= max_in_flight:
+                if ordered:
+                    yield from in_flight.popleft().result()
+                else:
+                    done, _ = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.remove(future)
+                        yield from future.result()
+            future = pool.submit(_map_chunk, func, chunk)
+            if ordered:
+                in_flight.append(future)
+            else:
+                in_flight.add(future)
+        if ordered:
+            while in_flight:
+                yield from in_flight.popleft().result()
+        else:
+            for future in concurrent.futures.as_completed(in_flight):
+                yield from future.result()
+            in_flight = set()
+    finally:
+        for future in in_flight:
+            future.cancel()
+        if shutdown:
+            pool.shutdown(wait=True)
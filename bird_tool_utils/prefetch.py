@@ -0,0 +1,136 @@
+import queue
+import threading
+
+from .parallel import chunked
+
+
+class _Finished:
+    pass
+
+
+def prefetch(iterable, max_queued=4):
+    '''Generator yielding the items of iterable, which are pulled from it on
+    a background thread staying at most max_queued items ahead of the
+    consumer. Exceptions raised by iterable are re-raised in the consumer.
+    Items should be reasonably large (e.g. batches of records), since each
+    passes through a queue.'''
+    items = queue.Queue(maxsize=max_queued)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+            put(_Finished)
+        except BaseException as e:
+            put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _Finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+def prefetch_batches(iterable, batch_size=1000, max_queued_batches=4):
+    '''Generator yielding lists of up to batch_size items from iterable. The
+    items are pulled from iterable on a background thread, which stays at
+    most max_queued_batches ahead of the consumer. Exceptions raised by
+    iterable are re-raised in the consumer.'''
+    yield from prefetch(chunked(iterable, n=batch_size), max_queued_batches)
+
+
+class _StreamFile:
+    '''Blocking binary file-like object reading from an asyncio StreamReader,
+    for use on a thread other than that running the event loop.'''
+
+    def __init__(self, stream, loop):
+        self._stream = stream
+        self._loop = loop
+        self._pending = None
+        self._cancelled = False
+
+    def read(self, size=-1):
+        import asyncio
+        import concurrent.futures
+        if self._cancelled:
+            raise concurrent.futures.CancelledError()
+        # Returns as soon as any data is available, rather than waiting for
+        # size bytes, so that records arriving slowly are not held up
+        self._pending = asyncio.run_coroutine_threadsafe(
+            self._stream.read(-1 if size is None else size), self._loop)
+        return self._pending.result()
+
+    def cancel(self):
+        self._cancelled = True
+        pending = self._pending
+        if pending is not None:
+            pending.cancel()
+
+
+async def async_prefetch(function, stream, max_queued=4):
+    '''Async generator yielding the items of function(fp), where fp is a
+    binary file-like object reading from the asyncio StreamReader stream
+    (e.g. the stdout of an asyncio subprocess, or a socket from
+    asyncio.open_connection). function is run on a background thread, so
+    that parsing does not block the event loop, staying at most max_queued
+    items ahead of the consumer.'''
+    import asyncio
+    import concurrent.futures
+    loop = asyncio.get_running_loop()
+    items = asyncio.Queue(maxsize=max_queued)
+    fp = _StreamFile(stream, loop)
+    stop = threading.Event()
+
+    def put(item):
+        # Blocks this thread until there is space in the queue
+        asyncio.run_coroutine_threadsafe(items.put(item), loop).result()
+
+    def produce():
+        try:
+            for item in function(fp):
+                if stop.is_set():
+                    return
+                put(item)
+            put(_Finished)
+        except (asyncio.CancelledError, concurrent.futures.CancelledError):
+            # Stopped by the consumer
+            pass
+        except BaseException as e:
+            if not stop.is_set():
+                put(e)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = await items.get()
+            if item is _Finished:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        fp.cancel()
+        # Unblock the producer if it is waiting for space in the queue
+        while not items.empty():
+            items.get_nowait()
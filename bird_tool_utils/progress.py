@@ -0,0 +1,123 @@
+import itertools
+import logging
+import operator
+import os
+import time
+
+from .compression import compressed_position
+
+# The clock is only looked at once per this many records
+DEFAULT_CHECK_EVERY = 1000
+# Minimum number of seconds between progress reports
+DEFAULT_INTERVAL = 30.0
+# Records are passed through in batches of at most check_every records, made
+# smaller if needed to keep batches of long reads to about this many bases
+_MAX_BATCH_BASES = 10 * 1000 * 1000
+
+_get_seq = operator.itemgetter(1)
+
+
+def _format_count(count):
+    for unit in ('', 'k', 'M', 'G'):
+        if count < 1000:
+            return '{:.1f}{}'.format(count, unit) if unit else '{}'.format(int(count))
+        count /= 1000
+    return '{:.1f}T'.format(count)
+
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return '{}:{:02d}:{:02d}'.format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def _file_size(fp):
+    f = getattr(fp, 'buffer', fp)
+    f = getattr(f, 'raw', f)
+    f = getattr(f, '_source', None) or f
+    try:
+        return os.fstat(f.fileno()).st_size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+class ProgressReport:
+    '''Throughput of a pass over some records: counts so far, and the bytes
+    read of the input file (compressed bytes, for compressed input)'''
+
+    def __init__(self, label, fp=None, total_bytes=None):
+        self.label = label
+        self.fp = fp
+        self.total_bytes = total_bytes
+        if total_bytes is None and fp is not None:
+            self.total_bytes = _file_size(fp)
+        self.records = 0
+        self.bases = 0
+        self.start_time = time.perf_counter()
+
+    def bytes_read(self):
+        if self.fp is None:
+            return None
+        return compressed_position(self.fp)
+
+    def message(self, finished=False):
+        elapsed = max(time.perf_counter() - self.start_time, 1e-9)
+        parts = ['{} records ({}/s)'.format(
+            _format_count(self.records), _format_count(self.records / elapsed))]
+        parts.append('{}bp ({}bp/s)'.format(
+            _format_count(self.bases), _format_count(self.bases / elapsed)))
+        bytes_read = self.bytes_read()
+        if bytes_read is not None:
+            parts.append('{:.1f} MB read ({:.1f} MB/s)'.format(
+                bytes_read / 1e6, bytes_read / 1e6 / elapsed))
+            if not finished and self.total_bytes and 0 < bytes_read < self.total_bytes:
+                remaining = elapsed * (self.total_bytes - bytes_read) / bytes_read
+                parts.append('{:.0f}% done, ETA {}'.format(
+                    100 * bytes_read / self.total_bytes, _format_duration(remaining)))
+        return '{}: {} {}'.format(
+            self.label, 'finished after {},'.format(_format_duration(elapsed)) if finished else 'processed',
+            ', '.join(parts))
+
+
+def track_progress(records, fp=None, label='Reading', total_bytes=None,
+                   check_every=DEFAULT_CHECK_EVERY, interval=DEFAULT_INTERVAL,
+                   length=None):
+    '''Return an iterator over the records of an iterable of (name, seq,
+    ...) tuples, unchanged, which logs records/s, bases/s and, if fp (the
+    file being read) is given, MB/s read and an ETA from the position in the
+    file compared with its size (total_bytes, by default the size of the file
+    of fp). For compressed files from open_compressed, the position in the
+    compressed file is used.
+
+    Records are passed through check_every at a time, so that the clock is
+    only looked at and base counts only summed once per check_every records,
+    and a report is logged at level INFO when at least interval seconds have
+    passed since the last one, and at the end. Pass length, a function taking
+    a record and returning its number of bases, for records which are not
+    (name, seq, ...) tuples, e.g. pairs.'''
+    # Chaining the batches keeps the per-record cost in C
+    return itertools.chain.from_iterable(_tracked_batches(
+        records, ProgressReport(label, fp, total_bytes), check_every, interval, length))
+
+
+def _tracked_batches(records, report, check_every, interval, length):
+    next_report = report.start_time + interval
+    iterator = iter(records)
+    batch_size = check_every
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            break
+        report.records += len(batch)
+        if length is None:
+            bases = sum(map(len, map(_get_seq, batch)))
+        else:
+            bases = sum(map(length, batch))
+        report.bases += bases
+        if bases > _MAX_BATCH_BASES:
+            batch_size = max(1, batch_size * _MAX_BATCH_BASES // bases)
+        now = time.perf_counter()
+        if now >= next_report:
+            logging.info(report.message())
+            next_report = now + interval
+        yield batch
+    logging.info(report.message(finished=True))
@@ -0,0 +1,96 @@
+import functools
+
+_COMPLEMENT_FROM = 'ACGTURYKMBDHVNacgturykmbdhvn'
+_COMPLEMENT_TO = 'TGCAAYRMKVHDBNtgcaayrmkvhdbn'
+_BYTES_COMPLEMENT = bytes.maketrans(_COMPLEMENT_FROM.encode(), _COMPLEMENT_TO.encode())
+_STR_COMPLEMENT = str.maketrans(_COMPLEMENT_FROM, _COMPLEMENT_TO)
+
+# Translation tables from quality characters to Phred scores, by offset
+_phred_tables = {}
+
+
+def _phred_table(offset):
+    table = _phred_tables.get(offset)
+    if table is None:
+        table = bytes((i - offset) % 256 for i in range(256))
+        _phred_tables[offset] = table
+    return table
+
+
+class SeqRecord(tuple):
+    '''A (name, seq, qual) tuple, as yielded by SeqReader.readfq, with extra
+    properties which are only computed when asked for. Being a tuple it has
+    no per-record attribute storage, and can be used anywhere a record tuple
+    can be, e.g. name, seq, qual = record.
+
+    seq and qual are kept as they were parsed (bytes or str), and quality
+    decoding and reverse complementing are done with translation tables.
+    '''
+
+    __slots__ = ()
+
+    def __new__(cls, name, seq, qual=None):
+        return tuple.__new__(cls, (name, seq, qual))
+
+    def __getnewargs__(self):
+        # So that records can be pickled e.g. sent to a process pool
+        return tuple(self)
+
+    @classmethod
+    def from_tuples(cls, records):
+        '''Convert an iterable of (name, seq, qual) tuples to SeqRecords'''
+        return map(functools.partial(tuple.__new__, cls), records)
+
+    @property
+    def name(self):
+        return self[0]
+
+    @property
+    def seq(self):
+        return self[1]
+
+    @property
+    def qual(self):
+        return self[2]
+
+    @property
+    def length(self):
+        return len(self[1])
+
+    def __repr__(self):
+        return 'SeqRecord(name={!r}, seq={!r}, qual={!r})'.format(*self)
+
+    def phred_bytes(self, offset=33):
+        '''Return the Phred quality scores as bytes, one byte per base, or
+        None for FASTA records'''
+        qual = self[2]
+        if qual is None:
+            return None
+        if isinstance(qual, str):
+            qual = qual.encode()
+        return qual.translate(_phred_table(offset))
+
+    def phred(self, offset=33):
+        '''Return the Phred quality scores as a NumPy uint8 array, or None
+        for FASTA records. Requires NumPy.'''
+        from .batch import _numpy
+        np = _numpy()
+        phred = self.phred_bytes(offset)
+        if phred is None:
+            return None
+        return np.frombuffer(phred, dtype=np.uint8)
+
+    def reverse_complement(self):
+        '''Return the reverse complement of the sequence, as the same type as
+        seq. IUPAC ambiguity codes are complemented and case is preserved.'''
+        seq = self[1]
+        if isinstance(seq, str):
+            return seq.translate(_STR_COMPLEMENT)[::-1]
+        return seq.translate(_BYTES_COMPLEMENT)[::-1]
+
+    def reverse_complemented(self):
+        '''Return a new SeqRecord of the reverse complement, with the quality
+        string reversed to match'''
+        qual = self[2]
+        return SeqRecord(self[0], self.reverse_complement(),
+                         qual[::-1] if qual is not None else None)
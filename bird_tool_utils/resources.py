@@ -0,0 +1,111 @@
+import atexit
+import sys
+import time
+
+# Number of allocation sites reported when tracing allocations
+TOP_ALLOCATIONS = 10
+
+_start_time = None
+
+
+def _usage(who):
+    import resource
+    usage = resource.getrusage(who)
+    # ru_maxrss is in kilobytes on Linux, but bytes on macOS
+    max_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return {
+        'user_cpu_seconds': usage.ru_utime,
+        'system_cpu_seconds': usage.ru_stime,
+        'max_rss_bytes': max_rss,
+        'block_input_operations': usage.ru_inblock,
+        'block_output_operations': usage.ru_oublock,
+    }
+
+
+def resource_usage_report():
+    '''Return a dict describing the resources used so far by this process
+    and its (waited for) children: CPU time, peak RSS and block I/O as
+    reported by getrusage, the wall time since start_resource_usage_report
+    was called and, if allocations are being traced, the top allocation
+    sites.'''
+    report = {}
+    if _start_time is not None:
+        report['wall_seconds'] = time.perf_counter() - _start_time
+    try:
+        import resource
+        report['self'] = _usage(resource.RUSAGE_SELF)
+        report['children'] = _usage(resource.RUSAGE_CHILDREN)
+    except ImportError:
+        # getrusage is unavailable on Windows
+        pass
+
+    import tracemalloc
+    if tracemalloc.is_tracing():
+        _, peak = tracemalloc.get_traced_memory()
+        report['traced_peak_bytes'] = peak
+        statistics = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__)]).statistics('lineno')
+        report['top_allocations'] = [{
+            'location': '{}:{}'.format(s.traceback[0].filename, s.traceback[0].lineno),
+            'size_bytes': s.size,
+            'count': s.count,
+        } for s in statistics[:TOP_ALLOCATIONS]]
+    return report
+
+
+def _format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if size < 1024:
+            return '{:.1f} {}'.format(size, unit)
+        size /= 1024
+    return '{:.1f} TiB'.format(size)
+
+
+def log_resource_usage_report(report=None):
+    import logging
+    if report is None:
+        report = resource_usage_report()
+    if 'wall_seconds' in report:
+        logging.info("Resource usage: wall time {:.2f}s".format(report['wall_seconds']))
+    for who in ('self', 'children'):
+        if who in report:
+            usage = report[who]
+            logging.info(
+                "Resource usage ({}): user CPU {:.2f}s, system CPU {:.2f}s, "
+                "peak RSS {}, block input/output operations {}/{}".format(
+                    who, usage['user_cpu_seconds'], usage['system_cpu_seconds'],
+                    _format_bytes(usage['max_rss_bytes']),
+                    usage['block_input_operations'], usage['block_output_operations']))
+    if 'top_allocations' in report:
+        logging.info("Peak traced Python memory {}, top allocation sites:".format(
+            _format_bytes(report['traced_peak_bytes'])))
+        for allocation in report['top_allocations']:
+            logging.info("  {} in {} blocks at {}".format(
+                _format_bytes(allocation['size_bytes']), allocation['count'],
+                allocation['location']))
+
+
+def _report_at_exit(log, json_path):
+    report = resource_usage_report()
+    if log:
+        log_resource_usage_report(report)
+    if json_path is not None:
+        import json
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+
+def start_resource_usage_report(log=True, json_path=None, trace_allocations=False):
+    '''Arrange for a resource usage report to be logged and/or written as
+    JSON to json_path when the process exits. If trace_allocations is True,
+    tracemalloc is started so that the largest allocation sites can be
+    included, at the cost of slowing the program down. Called by
+    BirdArgparser.parse_the_args when --resource-usage,
+    --resource-usage-json or --trace-allocations is specified.'''
+    global _start_time
+    _start_time = time.perf_counter()
+    if trace_allocations:
+        import tracemalloc
+        tracemalloc.start()
+    atexit.register(_report_at_exit, log, json_path)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Environment variables read by common multithreaded libraries and tools,
+# which are set by configure so that subprocesses honour --threads
+THREAD_ENVIRONMENT_VARIABLES = (
+    'OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+    'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS')
+
+_threads = None
+_memory_limit = None
+
+
+def configure(threads=None, memory_limit=None):
+    '''Set the number of threads and memory limit (in bytes) to be used by
+    this process, as parsed from --threads and --memory-limit by
+    BirdArgparser.parse_the_args. When threads is given, it is also exported
+    through THREAD_ENVIRONMENT_VARIABLES for subprocesses, otherwise they are
+    left as they are.'''
+    global _threads, _memory_limit
+    if threads is not None:
+        if threads < 1:
+            raise Exception("Number of threads must be at least 1, not {}".format(threads))
+        if threads != _threads:
+            # Executors already made have the old number of workers. The
+            # parallel module is not imported just to check.
+            parallel = sys.modules.get(__name__.rpartition('.')[0] + '.parallel')
+            if parallel is not None:
+                parallel.shutdown_executors()
+        _threads = threads
+        for variable in THREAD_ENVIRONMENT_VARIABLES:
+            os.environ[variable] = str(threads)
+    _memory_limit = memory_limit
+
+
+def configured_threads():
+    '''Number of threads set by configure, or None if it has not been set'''
+    return _threads
+
+
+def configured_memory_limit():
+    '''Memory limit in bytes set by configure, or None if there is none'''
+    return _memory_limit
@@ -0,0 +1,75 @@
+import contextlib
+import os
+import shutil
+import tempfile
+import threading
+
+# Environment variable naming a fast scratch location (e.g. tmpfs or a node
+# local SSD) for workspaces
+SCRATCH_DIR_ENV = 'BIRD_TOOL_UTILS_SCRATCH_DIR'
+
+_cleanup_threads = []
+_cleanup_threads_lock = threading.Lock()
+
+
+def scratch_directory(scratch_dir=None):
+    '''Return the directory in which workspaces are created: scratch_dir if
+    given, otherwise $BIRD_TOOL_UTILS_SCRATCH_DIR, otherwise the system
+    temporary directory (which honours $TMPDIR).'''
+    if scratch_dir is not None:
+        return scratch_dir
+    return os.environ.get(SCRATCH_DIR_ENV) or tempfile.gettempdir()
+
+
+def _remove_in_background(path):
+    # Renaming is quick, and frees the name immediately, so that only the
+    # slow recursive delete happens on the background thread.
+    doomed = tempfile.mkdtemp(
+        prefix='.{}.deleting-'.format(os.path.basename(path)),
+        dir=os.path.dirname(path))
+    os.rename(path, os.path.join(doomed, 'workspace'))
+    thread = threading.Thread(
+        target=shutil.rmtree, args=(doomed,), kwargs={'ignore_errors': True},
+        name='workspace-cleanup')
+    with _cleanup_threads_lock:
+        _cleanup_threads[:] = [t for t in _cleanup_threads if t.is_alive()]
+        _cleanup_threads.append(thread)
+    thread.start()
+
+
+def wait_for_cleanup():
+    '''Block until all workspaces being removed in the background are gone'''
+    with _cleanup_threads_lock:
+        threads = list(_cleanup_threads)
+    for thread in threads:
+        thread.join()
+
+
+@contextlib.contextmanager
+def workspace(prefix='bird_tool_utils-', scratch_dir=None, cleanup=True):
+    '''Context manager creating a new temporary directory and yielding its
+    path. Unlike in_tempdir, the working directory is not changed, so it is
+    safe to use from multiple threads at once.
+
+    The directory is created inside scratch_directory(scratch_dir). On exit
+    it is removed according to cleanup:
+    * True: remove it before returning [default]
+    * 'background': rename it out of the way, and remove it on a background
+      thread, so that deleting many files does not hold up the caller. Use
+      wait_for_cleanup to wait for this to finish.
+    * False: leave it in place
+    '''
+    if cleanup not in (True, False, 'background'):
+        raise Exception("Unexpected cleanup mode {}, expected True, False or 'background'".format(
+            cleanup))
+    path = tempfile.mkdtemp(prefix=prefix, dir=scratch_directory(scratch_dir))
+    try:
+        yield path
+    finally:
+        if cleanup == 'background':
+            try:
+                _remove_in_background(path)
+            except OSError:
+                shutil.rmtree(path, ignore_errors=True)
+        elif cleanup:
+            shutil.rmtree(path, ignore_errors=True)
@@ -0,0 +1,595 @@
+import itertools
+import operator
+
+from .batch import SeqBatch
+from .parallel import chunked
+from .prefetch import prefetch, prefetch_batches, async_prefetch
+
+# Small enough for a block to stay in cache while it is split up
+DEFAULT_BLOCK_SIZE = 128 * 1024
+
+_first_byte = operator.itemgetter(slice(0, 1))
+# FASTQ with sequences of at least this many bases is parsed record by record
+# rather than by splitting lines, see _regular_fastq_records
+_LONG_READ_LENGTH = 1000
+
+
+class _NeedMoreData(Exception):
+    '''Raised by the block scanner when a record runs off the end of the
+    current buffer and more input is needed before it can be parsed.'''
+    pass
+
+
+def _line_end(buf, start, eof):
+    end = buf.find(b'\n', start)
+    if end == -1:
+        if not eof:
+            raise _NeedMoreData()
+        end = len(buf)
+    return end
+
+
+def _scan_fastx_record(buf, pos, eof):
+    '''Locate the next FASTA/FASTQ record in buf at or after pos, following the
+    same rules as SeqReader.readfq, but without building any strings.
+
+    Returns None when there are no further records, otherwise a tuple of
+    (record_start, name_start, name_end, seq_start, seq_end, seq_multiline,
+    qual_start, qual_end, qual_multiline, next_pos). qual_start is -1 for
+    FASTA records (and for FASTQ records truncated before their quality).
+    Spans flagged as multiline contain newlines which must be removed.
+
+    Raises _NeedMoreData if the buffer ends before the record does and eof is
+    False.
+    '''
+    n = len(buf)
+    # Search for the start of the next record
+    while True:
+        if pos >= n:
+            if eof:
+                return None
+            raise _NeedMoreData()
+        if buf[pos] in b'>@':
+            break
+        pos = _line_end(buf, pos, eof) + 1
+
+    header_end = _line_end(buf, pos, eof)
+    name_end = buf.find(b' ', pos + 1, header_end)
+    if name_end == -1:
+        name_end = header_end
+    seq_start = header_end + 1
+    if seq_start >= n:
+        if not eof:
+            raise _NeedMoreData()
+        return (pos, pos + 1, name_end, n, n, False, -1, -1, False, n)
+
+    if buf[pos] == 64: # '@'
+        # Fast path for the common 4-line FASTQ layout
+        seq_end = buf.find(b'\n', seq_start)
+        if seq_end != -1 and seq_end + 1 < n and buf[seq_end + 1] == 43 and \
+                buf[seq_start] not in b'@+>':
+            plus_end = buf.find(b'\n', seq_end + 1)
+            if plus_end != -1:
+                qual_end = buf.find(b'\n', plus_end + 1)
+                if qual_end == -1 and eof and plus_end + 1 < n:
+                    qual_end = n
+                if qual_end != -1 and \
+                        qual_end - plus_end >= seq_end - header_end:
+                    return (pos, pos + 1, name_end, seq_start, seq_end, False,
+                            plus_end + 1, qual_end, False, qual_end + 1)
+    else:
+        # FASTA: the sequence runs until the next line starting with '>',
+        # unless a line starting with '+' or '@' intervenes.
+        next_header = buf.find(b'\n>', header_end)
+        if next_header == -1:
+            if not eof:
+                raise _NeedMoreData()
+            seq_end = n
+        else:
+            seq_end = next_header
+        if seq_end <= seq_start:
+            return (pos, pos + 1, name_end, seq_start, seq_start, False,
+                    -1, -1, False, seq_end + 1)
+        if buf[seq_start] not in b'+@' and \
+                buf.find(b'\n+', seq_start, seq_end) == -1 and \
+                buf.find(b'\n@', seq_start, seq_end) == -1:
+            return (pos, pos + 1, name_end, seq_start, seq_end, True,
+                    -1, -1, False, seq_end + 1)
+
+    # General case, going line by line as readfq does
+    p = seq_start
+    while True:
+        if p >= n:
+            if not eof:
+                raise _NeedMoreData()
+            return (pos, pos + 1, name_end, seq_start, n, True,
+                    -1, -1, False, n)
+        if buf[p] in b'@+>':
+            break
+        p = _line_end(buf, p, eof) + 1
+    seq_end = p - 1 if p > seq_start else seq_start
+    if buf[p] != 43: # not '+', so this is a FASTA record
+        return (pos, pos + 1, name_end, seq_start, seq_end, True,
+                -1, -1, False, p)
+
+    seq_length = seq_end - seq_start - buf.count(b'\n', seq_start, seq_end)
+    qual_start = _line_end(buf, p, eof) + 1
+    p = qual_start
+    qual_length = 0
+    while True:
+        if p >= n:
+            if not eof:
+                raise _NeedMoreData()
+            # EOF before reading enough quality, yield a FASTA record
+            # instead and stop, as readfq does.
+            return (pos, pos + 1, name_end, seq_start, seq_end, True,
+                    -1, -1, False, n)
+        e = _line_end(buf, p, eof)
+        qual_length += e - p
+        p = e + 1
+        if qual_length >= seq_length:
+            return (pos, pos + 1, name_end, seq_start, seq_end, True,
+                    qual_start, e, True, p)
+
+
+def _materialise(buf, span):
+    _, name_start, name_end, seq_start, seq_end, seq_multiline, \
+        qual_start, qual_end, qual_multiline, _ = span
+    seq = buf[seq_start:seq_end]
+    if seq_multiline:
+        seq = seq.replace(b'\n', b'')
+    if qual_start == -1:
+        qual = None
+    else:
+        qual = buf[qual_start:qual_end]
+        if qual_multiline:
+            qual = qual.replace(b'\n', b'')
+    return buf[name_start:name_end], seq, qual
+
+
+def _regular_fastq_records(buf, pos, eof):
+    '''Split regular 4-line FASTQ records from buf starting at pos, one
+    record at a time with bytes.find. For long reads this is quicker than
+    splitting lines, as quality lines, whose length is known, need not be
+    searched for their end. Returns (headers, seqs, quals, pos, irregular)
+    where pos is the end of the records taken and irregular is True if they
+    ended at a record which is not regular, rather than an incomplete one.'''
+    headers = []
+    seqs = []
+    quals = []
+    find = buf.find
+    n = len(buf)
+    irregular = False
+    while pos < n:
+        if buf[pos] != 64: # '@'
+            irregular = True
+            break
+        header_end = find(b'\n', pos)
+        if header_end == -1:
+            break
+        seq_end = find(b'\n', header_end + 1)
+        if seq_end == -1:
+            break
+        qual_start = seq_end + 3
+        qual_end = qual_start + seq_end - header_end - 1
+        if qual_end > n or (qual_end == n and not eof):
+            break
+        if buf[seq_end + 1:qual_start] != b'+\n' or \
+                (qual_end < n and buf[qual_end] != 10) or \
+                find(b'\n', qual_start, qual_end) != -1 or \
+                (seq_end > header_end + 1 and buf[header_end + 1] in b'@+>'):
+            irregular = True
+            break
+        headers.append(buf[pos:header_end])
+        seqs.append(buf[header_end + 1:seq_end])
+        quals.append(buf[qual_start:qual_end])
+        pos = qual_end + 1
+    return headers, seqs, quals, pos, irregular
+
+
+def _iter_fastx_blocks(fp, block_size=DEFAULT_BLOCK_SIZE):
+    '''Generator yielding the records of the binary file-like object fp in
+    blocks, each a tuple of (headers, seqs, quals, name_start) where headers,
+    seqs and quals are lists of bytes, quals is None if the records of the
+    block are FASTA, and the name of each record is
+    header[name_start:].partition(b' ')[0] (see _block_names), so that it
+    need only be extracted for records which are wanted. Whole blocks of regular
+    4-line FASTQ or FASTA are split with C-level bytes methods, falling back
+    to _scan_fastx_record for anything irregular (multi-line FASTQ, mixed
+    input, truncation), which yields blocks of a single record. CRLF line
+    endings are treated as LF.'''
+    buf = b''
+    pos = 0
+    eof = False
+    carry = b''
+    # Cleared when irregular input is seen, until the next block is read
+    fast = True
+    # Set when what is left in buf is known to be incomplete
+    need_data = True
+    while True:
+        if need_data:
+            # Read at least as much as is already buffered, so records longer
+            # than block_size are not re-scanned many times over.
+            chunk = fp.read(max(block_size, len(buf) - pos))
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if not chunk:
+                eof = True
+                # A carriage return at the very end still ends a line
+                chunk = b'\n' if carry else b''
+                carry = b''
+            elif carry or b'\r' in chunk:
+                # CRLF line endings are read as LF, as in text mode. A
+                # trailing CR is held back as its LF may start the next chunk.
+                chunk = carry + chunk
+                carry = b''
+                if chunk[-1] == 13: # '\r'
+                    carry = b'\r'
+                    chunk = chunk[:-1]
+                chunk = chunk.replace(b'\r\n', b'\n')
+            buf = buf[pos:] + chunk
+            pos = 0
+            fast = True
+            need_data = False
+        n = len(buf)
+        if fast and pos < n:
+            first = buf[pos]
+            if first == 64: # '@'
+                header_end = buf.find(b'\n', pos)
+                if header_end != -1 and \
+                        buf.find(b'\n', header_end + 1, header_end + _LONG_READ_LENGTH) == -1:
+                    # Long reads, or an incomplete record
+                    headers, seqs, quals, pos, irregular = _regular_fastq_records(buf, pos, eof)
+                    fast = not irregular
+                    if headers:
+                        yield headers, seqs, quals, 1
+                        need_data = fast and not eof
+                        continue
+                    if fast and not eof:
+                        need_data = True
+                        continue
+            if first == 64 and fast:
+                # Splitting all of buf when pos is 0 saves copying it
+                lines = (buf if pos == 0 else buf[pos:]).split(b'\n')
+                # Number of bytes taken by the lines, counting the newline
+                # after each
+                taken = n - pos + 1
+                if not eof or not lines[-1]:
+                    # The last line is empty, or incomplete as its newline
+                    # has not been read yet
+                    taken -= len(lines.pop()) + 1
+                if lines:
+                    count = len(lines) // 4 * 4
+                    headers = lines[0:count:4]
+                    seqs = lines[1:count:4]
+                    quals = lines[3:count:4]
+                    # Check all complete records at once, since this is
+                    # much quicker than checking them one by one
+                    pluses = lines[2:count:4]
+                    joined_headers = b'\n'.join(headers)
+                    # Only the first byte of each sequence matters, and
+                    # joining those rather than whole sequences keeps this
+                    # quick for long reads
+                    seq_starts = b''.join(map(_first_byte, seqs))
+                    if joined_headers.startswith(b'@') and \
+                            joined_headers.count(b'\n@') == len(headers) - 1 and \
+                            b''.join(pluses) == b'+' * len(pluses) and \
+                            b'@' not in seq_starts and b'+' not in seq_starts and \
+                            b'>' not in seq_starts and \
+                            list(map(len, quals)) == list(map(len, seqs)):
+                        i = count
+                    else:
+                        # Find the first irregular record
+                        i = 0
+                        while i < count:
+                            seq = lines[i+1]
+                            if not lines[i].startswith(b'@') or \
+                                    not lines[i+2].startswith(b'+') or \
+                                    len(lines[i+3]) < len(seq) or \
+                                    (seq and seq[0] in b'@+>'):
+                                break
+                            i += 4
+                        fast = False
+                        headers = lines[0:i:4]
+                        seqs = lines[1:i:4]
+                        quals = lines[3:i:4]
+                    if i > 0:
+                        yield headers, seqs, quals, 1
+                        # Only the few lines after the last record taken
+                        # need to be measured
+                        pos += taken - sum(map(len, lines[i:])) - (len(lines) - i)
+                        # Unless a record was irregular, the rest is less
+                        # than a whole 4-line record, so read more first
+                        need_data = fast and not eof
+                        continue
+            elif first == 62: # '>'
+                cut = n if eof else buf.rfind(b'\n>', pos)
+                if cut > pos:
+                    # Only parse up to the first line starting with '+' or
+                    # '@', if any. Checking for the single characters first
+                    # is much quicker as they are usually absent.
+                    for c in (b'+', b'@'):
+                        if cut <= pos:
+                            # The first record is irregular
+                            break
+                        if buf.find(c, pos, cut) != -1:
+                            irregular = buf.find(b'\n' + c, pos, cut)
+                            if irregular != -1:
+                                fast = False
+                                cut = buf.rfind(b'\n>', pos, irregular)
+                    if cut > pos:
+                        records = [record.partition(b'\n') for record in
+                                   buf[pos+1:cut].split(b'\n>')]
+                        yield [r[0] for r in records], \
+                            [r[2].replace(b'\n', b'') for r in records], None, 0
+                        pos = cut + 1
+                        # Unless irregular input was found, the rest is the
+                        # last, possibly incomplete, record
+                        need_data = fast and not eof
+                        continue
+
+        # Irregular input, parse a single record the slow way
+        try:
+            span = _scan_fastx_record(buf, pos, eof)
+        except _NeedMoreData:
+            need_data = True
+            continue
+        if span is None:
+            return
+        name, seq, qual = _materialise(buf, span)
+        yield [name], [seq], None if qual is None else [qual], 0
+        pos = span[9]
+
+
+def _block_names(block):
+    headers = block[0]
+    joined = b'\n'.join(headers)
+    if b' ' not in joined:
+        # Headers without descriptions are all name, so can be split apart
+        # in one go. Headers never contain newlines, and with name_start
+        # set they all start with '@'.
+        if not headers:
+            return []
+        if block[3]:
+            return joined[1:].split(b'\n@')
+        return joined.split(b'\n')
+    if block[3]:
+        return [h[1:].partition(b' ')[0] for h in headers]
+    return [h.partition(b' ')[0] for h in headers]
+
+
+def _block_records(block):
+    '''Return an iterator of (name, seq, qual) tuples of the records of a
+    block from _iter_fastx_blocks'''
+    quals = block[2]
+    return zip(_block_names(block), block[1],
+               itertools.repeat(None) if quals is None else quals)
+
+
+def _iter_fastx_records(fp, block_size=DEFAULT_BLOCK_SIZE):
+    '''Generator yielding (name, seq, qual) bytes tuples from the binary
+    file-like object fp, see _iter_fastx_blocks.'''
+    for block in _iter_fastx_blocks(fp, block_size):
+        yield from _block_records(block)
+
+
+def _iter_fastx_record_lists(fp, block_size=DEFAULT_BLOCK_SIZE):
+    '''Generator yielding a list of (name, seq, qual) bytes tuples for each
+    block of fp'''
+    for block in _iter_fastx_blocks(fp, block_size):
+        yield list(_block_records(block))
+
+
+def _mate_key(name):
+    '''Return the part of a read name shared by both mates of a pair i.e.
+    without any /1 or /2 suffix'''
+    if isinstance(name, bytes):
+        if name.endswith((b'/1', b'/2')):
+            return name[:-2]
+    elif name.endswith(('/1', '/2')):
+        return name[:-2]
+    return name
+
+
+def _check_mates(forward, reverse, name_prefix_length):
+    for f, r in zip(forward, reverse):
+        if _mate_key(f[0])[:name_prefix_length] != _mate_key(r[0])[:name_prefix_length]:
+            raise Exception(
+                "Forward and reverse reads are out of sync: found {} paired "
+                "with {}".format(f[0], r[0]))
+
+
+class SeqReader:
+    # Stolen from https://github.com/lh3/readfq/blob/master/readfq.py
+    def readfq(self, fp, bytes_mode=False, block_size=DEFAULT_BLOCK_SIZE): # this is a generator function
+        '''Generator function for reading FASTQ files
+
+        If bytes_mode is True, fp should be opened in binary mode, and records
+        are parsed in large blocks by readfq_bytes, yielding bytes rather than
+        str.'''
+        if bytes_mode:
+            yield from _iter_fastx_records(fp, block_size)
+            return
+        last = None # this is a buffer keeping the last unprocessed line
+        while True: # mimic closure; is it a bad idea?
+            if not last: # the first record or a record following a fastq
+                for l in fp: # search for the start of the next record
+                    if l[0] in '>@': # fasta/q header line
+                        last = l[:-1] # save this line
+                        break
+            if not last: break
+            name, seqs, last = last[1:].partition(" ")[0], [], None
+            for l in fp: # read the sequence
+                if l[0] in '@+>':
+                    last = l[:-1]
+                    break
+                seqs.append(l[:-1])
+            if not last or last[0] != '+': # this is a fasta record
+                yield name, ''.join(seqs), None # yield a fasta record
+                if not last: break
+            else: # this is a fastq record
+                seq, leng, seqs = ''.join(seqs), 0, []
+                for l in fp: # read the quality
+                    seqs.append(l[:-1])
+                    leng += len(l) - 1
+                    if leng >= len(seq): # have read enough quality
+                        last = None
+                        yield name, seq, ''.join(seqs); # yield a fastq record
+                        break
+                if last: # reach EOF before reading enough quality
+                    yield name, seq, None # yield a fasta record instead
+                    break
+
+    def readfq_bytes(self, fp, block_size=DEFAULT_BLOCK_SIZE):
+        '''Generator function for reading FASTA/FASTQ files opened in binary
+        mode. Input is read block_size bytes at a time and whole blocks of
+        records are split with bytes methods, so no str objects are made.
+        This is typically 1.2-2 times as fast as readfq, the most for
+        short-read FASTQ and wrapped FASTA. Yields
+        (name, seq, qual) where each is bytes, and qual is None for FASTA
+        records.'''
+        return _iter_fastx_records(fp, block_size)
+
+    def readfq_records(self, fp, block_size=DEFAULT_BLOCK_SIZE):
+        '''As readfq_bytes, but yielding SeqRecord objects, which are still
+        (name, seq, qual) tuples but also decode qualities and reverse
+        complement on demand.'''
+        from .record import SeqRecord
+        return SeqRecord.from_tuples(_iter_fastx_records(fp, block_size))
+
+    def readfq_prefetch(self, fp, bytes_mode=False, block_size=DEFAULT_BLOCK_SIZE,
+                        max_queued_batches=4):
+        '''As readfq, but reading and parsing on a background thread, which
+        stays at most max_queued_batches blocks (or batches of 1000 records
+        when not in bytes_mode) ahead of the consumer. This overlaps disk or
+        pipe reads with the consumer's work. Returns an iterator of (name,
+        seq, qual) tuples.'''
+        if bytes_mode:
+            batches = _iter_fastx_record_lists(fp, block_size)
+        else:
+            batches = chunked(self.readfq(fp), n=1000)
+        return itertools.chain.from_iterable(prefetch(batches, max_queued_batches))
+
+    async def readfq_async(self, stream, block_size=DEFAULT_BLOCK_SIZE, max_queued_batches=4):
+        '''Async generator yielding (name, seq, qual) bytes tuples from an
+        asyncio StreamReader, e.g. the stdout of a process started with
+        asyncio.create_subprocess_exec or a socket from
+        asyncio.open_connection:
+
+            async for name, seq, qual in SeqReader().readfq_async(process.stdout):
+                ...
+
+        Parsing is done in blocks as by readfq_bytes on a background thread,
+        so that it does not block the event loop.'''
+        async for batch in async_prefetch(
+                lambda fp: _iter_fastx_record_lists(fp, block_size),
+                stream, max_queued_batches):
+            for record in batch:
+                yield record
+
+    def readfa(self, fp, bytes_mode=False, block_size=DEFAULT_BLOCK_SIZE):
+        '''Generator function for reading FASTA files'''
+        for (name, seq, _) in self.readfq(fp, bytes_mode=bytes_mode, block_size=block_size):
+            yield name, seq
+
+    def read_batches(self, fp, batch_size=10000, block_size=DEFAULT_BLOCK_SIZE):
+        '''Generator function yielding SeqBatch objects of up to batch_size
+        records each from a FASTA/FASTQ file opened in binary mode. Requires
+        NumPy.'''
+        # Batches are built straight from the columns of parsed blocks
+        names, seqs, quals = [], [], []
+        fasta = None
+        for block in _iter_fastx_blocks(fp, block_size):
+            block_names = _block_names(block)
+            block_fasta = block[2] is None
+            start = 0
+            while start < len(block_names):
+                if names and block_fasta != fasta:
+                    raise Exception("Cannot batch a mixture of FASTA and FASTQ records")
+                fasta = block_fasta
+                end = start + batch_size - len(names)
+                names.extend(block_names[start:end])
+                seqs.extend(block[1][start:end])
+                if not fasta:
+                    quals.extend(block[2][start:end])
+                start = end
+                if len(names) >= batch_size:
+                    yield SeqBatch.from_columns(names, seqs, None if fasta else quals)
+                    names, seqs, quals = [], [], []
+        if names:
+            yield SeqBatch.from_columns(names, seqs, None if fasta else quals)
+
+    def read_pairs(self, forward, reverse=None, bytes_mode=False,
+                   check_names=True, name_prefix_length=None, prefetch=False,
+                   batch_size=10000, block_size=DEFAULT_BLOCK_SIZE):
+        '''Generator function yielding pairs of (name, seq, qual) records
+        from paired-end input, either as two files (forward and reverse) or
+        interleaved in a single file (reverse=None).
+
+        Records are read batch_size at a time from each file, and with
+        prefetch=True each file is read on its own background thread. Unless
+        check_names is False, mate names (ignoring any /1 and /2 suffix, and
+        only the first name_prefix_length characters if specified) are
+        checked and an Exception raised if the files are out of sync, or if
+        one file has more records than the other.'''
+        if reverse is None:
+            records = self.readfq(forward, bytes_mode=bytes_mode, block_size=block_size)
+            if prefetch:
+                batches = prefetch_batches(records, batch_size=batch_size * 2)
+            else:
+                batches = chunked(records, n=batch_size * 2)
+            for batch in batches:
+                if len(batch) % 2 != 0:
+                    raise Exception(
+                        "Interleaved input has an odd number of records, "
+                        "last was {}".format(batch[-1][0]))
+                forward_batch = batch[0::2]
+                reverse_batch = batch[1::2]
+                if check_names:
+                    _check_mates(forward_batch, reverse_batch, name_prefix_length)
+                yield from zip(forward_batch, reverse_batch)
+        else:
+            forward_records = self.readfq(forward, bytes_mode=bytes_mode, block_size=block_size)
+            reverse_records = self.readfq(reverse, bytes_mode=bytes_mode, block_size=block_size)
+            if prefetch:
+                forward_batches = prefetch_batches(forward_records, batch_size=batch_size)
+                reverse_batches = prefetch_batches(reverse_records, batch_size=batch_size)
+            else:
+                forward_batches = chunked(forward_records, n=batch_size)
+                reverse_batches = chunked(reverse_records, n=batch_size)
+            for forward_batch, reverse_batch in itertools.zip_longest(
+                    forward_batches, reverse_batches, fillvalue=[]):
+                if len(forward_batch) != len(reverse_batch):
+                    raise Exception(
+                        "Forward and reverse files contain different numbers "
+                        "of records")
+                if check_names:
+                    _check_mates(forward_batch, reverse_batch, name_prefix_length)
+                yield from zip(forward_batch, reverse_batch)
+
+    def readfq_path(self, path, bytes_mode=False, threads=1, block_size=DEFAULT_BLOCK_SIZE,
+                    progress=False):
+        '''Generator function for reading a FASTA/FASTQ file given its path.
+        gzip, BGZF, bzip2, xz and zstd compressed files are detected and
+        decompressed in parallel with parsing, see open_compressed.
+
+        If progress is True, throughput and an ETA are logged periodically,
+        see track_progress.'''
+        # Imported here as it is slow to import, and not needed for reading
+        # already open files
+        from .compression import open_compressed
+        with open_compressed(path, threads=threads, text=not bytes_mode) as f:
+            records = self.readfq(f, bytes_mode=bytes_mode, block_size=block_size)
+            if progress:
+                from .progress import track_progress
+                records = track_progress(records, fp=f, label='Reading {}'.format(path))
+            yield from records
+
+    def readfa_path(self, path, bytes_mode=False, threads=1, block_size=DEFAULT_BLOCK_SIZE,
+                    progress=False):
+        '''Generator function for reading a possibly compressed FASTA file
+        given its path'''
+        for (name, seq, _) in self.readfq_path(
+                path, bytes_mode=bytes_mode, threads=threads, block_size=block_size,
+                progress=progress):
+            yield name, seq
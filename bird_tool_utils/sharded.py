@@ -0,0 +1,284 @@
+import multiprocessing
+import os
+import struct
+import zlib
+
+from .compression import detect_compression
+from .sequence import DEFAULT_BLOCK_SIZE, _iter_fastx_records
+
+
+# Every BGZF block starts with these bytes (gzip magic, deflate, FEXTRA set),
+# followed by the 'BC' subfield 8 bytes later
+_BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+_BGZF_SUBFIELD = b'BC\x02\x00'
+
+
+class _PlainSource:
+    '''Shardable view of an uncompressed file. Virtual offsets are (offset, 0)
+    tuples.'''
+
+    def __init__(self, path, block_size):
+        self.path = path
+        self.block_size = block_size
+        self.end = (os.path.getsize(path), 0)
+
+    def candidates(self, num_shards):
+        size = self.end[0]
+        return [(size * i // num_shards, 0) for i in range(1, num_shards)]
+
+    def chunks(self, start, end):
+        '''Yield (virtual_offset, data) for the data between start and end'''
+        position = start[0]
+        with open(self.path, 'rb') as f:
+            f.seek(position)
+            while position < end[0]:
+                data = f.read(min(self.block_size, end[0] - position))
+                if not data:
+                    return
+                yield (position, 0), data
+                position += len(data)
+
+    @staticmethod
+    def advance(offset, k):
+        return (offset[0] + k, 0)
+
+
+class _BgzfSource:
+    '''Shardable view of a BGZF compressed file. Virtual offsets are
+    (compressed block offset, offset within the decompressed block) tuples.'''
+
+    def __init__(self, path, block_size):
+        self.path = path
+        self.end = (os.path.getsize(path), 0)
+
+    @staticmethod
+    def _read_block(f, offset):
+        '''Return (decompressed data, offset of next block)'''
+        f.seek(offset)
+        header = f.read(12)
+        if len(header) < 12 or not header.startswith(_BGZF_MAGIC):
+            raise Exception("Invalid BGZF block found at offset {}".format(offset))
+        extra_length = struct.unpack('<H', header[10:12])[0]
+        extra = f.read(extra_length)
+        block_size = None
+        i = 0
+        while i + 4 <= len(extra):
+            subfield_length = struct.unpack('<H', extra[i+2:i+4])[0]
+            if extra[i:i+2] == b'BC' and subfield_length == 2:
+                block_size = struct.unpack('<H', extra[i+4:i+6])[0] + 1
+            i += 4 + subfield_length
+        if block_size is None:
+            raise Exception("BGZF block at offset {} has no BSIZE field".format(offset))
+        f.seek(offset)
+        return zlib.decompress(f.read(block_size), 31), offset + block_size
+
+    def _next_block_start(self, f, offset):
+        '''Return the offset of the first BGZF block starting at or after
+        offset, checking that it is followed by another valid block'''
+        while offset < self.end[0]:
+            f.seek(offset)
+            window = f.read(65536 + 18)
+            i = window.find(_BGZF_MAGIC)
+            while i != -1:
+                if window[i+12:i+16] == _BGZF_SUBFIELD:
+                    candidate = offset + i
+                    try:
+                        _, next_offset = self._read_block(f, candidate)
+                        if next_offset == self.end[0]:
+                            return candidate
+                        f.seek(next_offset)
+                        if f.read(4) == _BGZF_MAGIC:
+                            return candidate
+                    except Exception:
+                        pass
+                i = window.find(_BGZF_MAGIC, i + 1)
+            offset += 65536
+        return self.end[0]
+
+    def candidates(self, num_shards):
+        size = self.end[0]
+        with open(self.path, 'rb') as f:
+            return [(self._next_block_start(f, size * i // num_shards), 0)
+                    for i in range(1, num_shards)]
+
+    def chunks(self, start, end):
+        offset, within = start
+        with open(self.path, 'rb') as f:
+            while offset < self.end[0] and offset <= end[0]:
+                data, next_offset = self._read_block(f, offset)
+                if offset == end[0]:
+                    data = data[:end[1]]
+                if len(data) > within:
+                    yield (offset, within), data[within:]
+                offset = next_offset
+                within = 0
+
+    @staticmethod
+    def advance(offset, k):
+        return (offset[0], offset[1] + k)
+
+
+class _ChunkReader:
+    '''Minimal binary file-like object over an iterator of chunks'''
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+
+    def read(self, size=-1):
+        for _, data in self._chunks:
+            return data
+        return b''
+
+
+def _find_record_start(source, candidate, fastq):
+    '''Return the virtual offset of the first record which starts after the
+    first newline at or after candidate, or the end of the source if there
+    is none.'''
+    buf = b''
+    # Number of bytes discarded from the start of buf
+    dropped = 0
+    chunk_starts = [] # (index relative to the candidate, virtual offset)
+    p = None
+    found = False
+    for chunk_offset, data in source.chunks(candidate, source.end):
+        chunk_starts.append((dropped + len(buf), chunk_offset))
+        buf += data
+        if p is None:
+            newline = buf.find(b'\n')
+            if newline == -1:
+                dropped += len(buf)
+                buf = b''
+                continue
+            p = newline + 1
+        p, found = _search_record_start(buf, p, fastq, False)
+        if found:
+            break
+        # Discard data before the line being examined
+        dropped += p
+        buf = buf[p:]
+        p = 0
+    if not found:
+        if p is None:
+            return source.end
+        p, found = _search_record_start(buf, p, fastq, True)
+        if not found:
+            return source.end
+    position = dropped + p
+    for index, chunk_offset in reversed(chunk_starts):
+        if index <= position:
+            return source.advance(chunk_offset, position - index)
+
+
+def _search_record_start(buf, p, fastq, eof):
+    '''Search buf for a record start from line start p. Returns (p, True)
+    if one is found, and otherwise (p, False) where p is the line start to
+    resume searching from once more data is available.
+
+    For FASTQ, a line starting with '@' is only accepted as a header when the
+    third line starts with '+', the fourth line is as long as the second, and
+    the fifth line (if any) starts with '@'. A quality line starting with '@'
+    is followed by a header and then a sequence line, which never starts with
+    '+', so it is never mistaken for a header.
+    '''
+    n = len(buf)
+    if not fastq:
+        if p < n and buf[p] == 62: # '>'
+            return p, True
+        i = buf.find(b'\n>', p)
+        if i == -1:
+            # Resume from the last line, which may be incomplete
+            return max(p, buf.rfind(b'\n') + 1), False
+        return i + 1, True
+    while p < n:
+        if buf[p] == 64: # '@'
+            e1 = buf.find(b'\n', p)
+            e2 = buf.find(b'\n', e1 + 1) if e1 != -1 else -1
+            e3 = buf.find(b'\n', e2 + 1) if e2 != -1 else -1
+            e4 = buf.find(b'\n', e3 + 1) if e3 != -1 else -1
+            if e4 == -1 or e4 + 1 >= n:
+                if not eof:
+                    return p, False
+                if e3 == -1:
+                    return n, False
+                if e4 == -1:
+                    e4 = n
+            if buf[e2 + 1] == 43 and e4 - e3 == e2 - e1 and \
+                    (e4 + 1 >= n or buf[e4 + 1] == 64):
+                return p, True
+        e = buf.find(b'\n', p)
+        if e == -1:
+            return (n if eof else p), False
+        p = e + 1
+    return p, False
+
+
+def _process_shard(task):
+    source, start, end, func, block_size = task
+    records = _iter_fastx_records(_ChunkReader(source.chunks(start, end)), block_size)
+    return func(records)
+
+
+class ShardedSeqReader:
+    '''Parse a large uncompressed or BGZF compressed FASTA or (4-line) FASTQ
+    file in parallel, by splitting it into byte-range shards which are each
+    resynchronised to the next record boundary and parsed in a separate
+    process.
+
+    Use map(func) to apply func to an iterator of the (name, seq, qual) bytes
+    records of each shard in a worker process, yielding the results. func
+    must be picklable i.e. defined at the top level of a module.
+    '''
+
+    def __init__(self, path, shards=None, block_size=DEFAULT_BLOCK_SIZE):
+        compression = detect_compression(path)
+        if compression is None:
+            self._source = _PlainSource(path, block_size)
+        elif compression == 'bgzf':
+            self._source = _BgzfSource(path, block_size)
+        else:
+            raise Exception(
+                "Sharded reading requires an uncompressed or BGZF compressed "
+                "file, but {} is {} compressed".format(path, compression))
+        self.path = path
+        self._num_shards = shards
+        self._block_size = block_size
+
+    def shard_boundaries(self, num_shards):
+        '''Return a list of (start, end) virtual offsets, one per non-empty
+        shard'''
+        first = None
+        for _, data in self._source.chunks((0, 0), self._source.end):
+            first = data[:1]
+            break
+        if not first:
+            return []
+        fastq = first == b'@'
+        starts = [(0, 0)]
+        for candidate in self._source.candidates(num_shards):
+            start = _find_record_start(self._source, candidate, fastq)
+            if start > starts[-1]:
+                starts.append(start)
+        ends = starts[1:] + [self._source.end]
+        return [(s, e) for s, e in zip(starts, ends) if s < e]
+
+    def map(self, func, processes=None, ordered=True):
+        '''Generator yielding func(records) for each shard, computed across
+        a pool of processes (default: one per CPU). If ordered is False,
+        results are yielded as soon as they are available rather than in file
+        order.'''
+        if processes is None:
+            processes = os.cpu_count() or 1
+        num_shards = self._num_shards or processes * 4
+        tasks = [(self._source, start, end, func, self._block_size)
+                 for (start, end) in self.shard_boundaries(num_shards)]
+        if processes == 1:
+            for task in tasks:
+                yield _process_shard(task)
+            return
+        with multiprocessing.Pool(processes) as pool:
+            if ordered:
+                results = pool.imap(_process_shard, tasks)
+            else:
+                results = pool.imap_unordered(_process_shard, tasks)
+            for result in results:
+                yield result
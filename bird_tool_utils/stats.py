@@ -0,0 +1,248 @@
+from collections import Counter
+
+from .parallel import chunked
+from .sequence import DEFAULT_BLOCK_SIZE, _iter_fastx_blocks
+
+# Sequences and qualities are buffered up to this many bytes and then
+# counted in one go, which is much faster than counting record by record.
+_PENDING_BYTES = 1024 * 1024
+
+# Once more than this many distinct lengths have been seen, lengths are
+# rounded to within about 0.4%, so that memory use stays fixed.
+DEFAULT_MAX_DISTINCT_LENGTHS = 100000
+
+# Significant bits kept when rounding lengths
+_LENGTH_PRECISION_BITS = 8
+
+# add_records takes records this many at a time
+_RECORDS_PER_CHUNK = 10000
+
+# Translates G and C (either case) to 1 and everything else to 0
+_GC_TABLE = bytes(1 if chr(c) in 'GCgc' else 0 for c in range(256))
+
+
+def _round_length(length):
+    shift = length.bit_length() - _LENGTH_PRECISION_BITS
+    if shift <= 0:
+        return length
+    # The middle of the range of lengths sharing the top bits
+    return ((length >> shift) << shift) + (1 << (shift - 1))
+
+
+def _to_bytes(s):
+    if isinstance(s, str):
+        return s.encode()
+    return s
+
+
+def _optional_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _numpy_byte_sum(numpy, data):
+    return int(numpy.frombuffer(data, dtype=numpy.uint8).sum(dtype=numpy.uint64))
+
+
+class SeqStats:
+    '''Summary statistics of FASTA/FASTQ records accumulated in a single
+    streaming pass: record count, total bases, min/max/mean length, N50/N90,
+    GC content, a length histogram and mean quality.
+
+    Add records with add, add_records or add_batch (for SeqBatch objects
+    from SeqReader.read_batches), or use SeqStats.from_path. Memory use does
+    not grow with the size of the input: lengths are counted exactly until
+    max_distinct_lengths different lengths are seen, after which they are
+    rounded, making N50/N90 and the histogram approximate.
+    '''
+
+    def __init__(self, quality_offset=33, max_distinct_lengths=DEFAULT_MAX_DISTINCT_LENGTHS):
+        self.quality_offset = quality_offset
+        self.max_distinct_lengths = max_distinct_lengths
+        self.num_records = 0
+        self.total_bases = 0
+        self.gc_bases = 0
+        self.quality_bases = 0
+        self.quality_sum = 0
+        self.min_length = None
+        self.max_length = None
+        self.lengths_approximate = False
+        self._length_counts = Counter()
+        self._pending_seqs = []
+        self._pending_quals = []
+        self._pending_bytes = 0
+
+    @classmethod
+    def from_path(cls, path, threads=1, block_size=DEFAULT_BLOCK_SIZE, **kwargs):
+        '''Compute statistics of a possibly compressed FASTA/FASTQ file'''
+        # Imported here as it is slow to import
+        from .compression import open_compressed
+        stats = cls(**kwargs)
+        with open_compressed(path, threads=threads) as f:
+            # Whole parsed blocks are added, so no record tuples are made
+            for _, seqs, quals, _ in _iter_fastx_blocks(f, block_size):
+                stats._add_block(seqs, quals)
+        return stats
+
+    def add(self, name, seq, qual=None):
+        length = len(seq)
+        self.num_records += 1
+        self._add_length(length)
+        self._pending_seqs.append(_to_bytes(seq))
+        self._pending_bytes += length
+        if qual is not None:
+            self._pending_quals.append(_to_bytes(qual))
+            self._pending_bytes += length
+        if self._pending_bytes >= _PENDING_BYTES:
+            self._count_pending()
+
+    def add_records(self, records):
+        '''Add an iterable of (name, seq, qual) or (name, seq) records'''
+        for chunk in chunked(records, n=_RECORDS_PER_CHUNK):
+            self._add_block(
+                [_to_bytes(record[1]) for record in chunk],
+                [_to_bytes(record[2]) for record in chunk
+                 if len(record) > 2 and record[2] is not None])
+
+    def _add_block(self, seqs, quals):
+        '''Add records given as a list of their sequences and a list of their
+        qualities (or None or [] for FASTA), a block at a time so that
+        lengths are counted by Counter in C rather than record by record'''
+        if not seqs:
+            return
+        lengths = list(map(len, seqs))
+        self.num_records += len(lengths)
+        total = sum(lengths)
+        block_min = min(lengths)
+        block_max = max(lengths)
+        if self.min_length is None or block_min < self.min_length:
+            self.min_length = block_min
+        if self.max_length is None or block_max > self.max_length:
+            self.max_length = block_max
+        if self.lengths_approximate:
+            lengths = map(_round_length, lengths)
+        self._length_counts.update(lengths)
+        if len(self._length_counts) > self.max_distinct_lengths:
+            self._collapse_lengths()
+        self._pending_seqs.extend(seqs)
+        self._pending_bytes += total
+        if quals:
+            self._pending_quals.extend(quals)
+            self._pending_bytes += total
+        if self._pending_bytes >= _PENDING_BYTES:
+            self._count_pending()
+
+    def add_batch(self, batch):
+        '''Add all records of a SeqBatch, using its NumPy length array'''
+        self._count_pending()
+        lengths = batch.lengths
+        if len(lengths) == 0:
+            return
+        self.num_records += len(lengths)
+        batch_min = int(lengths.min())
+        batch_max = int(lengths.max())
+        if self.min_length is None or batch_min < self.min_length:
+            self.min_length = batch_min
+        if self.max_length is None or batch_max > self.max_length:
+            self.max_length = batch_max
+        import numpy as np
+        values, counts = np.unique(lengths, return_counts=True)
+        for length, count in zip(values.tolist(), counts.tolist()):
+            if self.lengths_approximate:
+                length = _round_length(length)
+            self._length_counts[length] += count
+        if len(self._length_counts) > self.max_distinct_lengths:
+            self._collapse_lengths()
+        self._count_sequence(batch.seqs)
+        if batch.quals is not None:
+            self._count_quality(batch.quals)
+
+    def _add_length(self, length):
+        if self.min_length is None or length < self.min_length:
+            self.min_length = length
+        if self.max_length is None or length > self.max_length:
+            self.max_length = length
+        if self.lengths_approximate:
+            length = _round_length(length)
+        self._length_counts[length] += 1
+        if len(self._length_counts) > self.max_distinct_lengths:
+            self._collapse_lengths()
+
+    def _collapse_lengths(self):
+        collapsed = Counter()
+        for length, count in self._length_counts.items():
+            collapsed[_round_length(length)] += count
+        self._length_counts = collapsed
+        self.lengths_approximate = True
+
+    def _count_sequence(self, seqs):
+        self.total_bases += len(seqs)
+        numpy = _optional_numpy()
+        if numpy is None:
+            self.gc_bases += seqs.count(b'G') + seqs.count(b'C') + \
+                seqs.count(b'g') + seqs.count(b'c')
+        else:
+            # Several times quicker than the four bytes.count calls
+            self.gc_bases += _numpy_byte_sum(numpy, seqs.translate(_GC_TABLE))
+
+    def _count_quality(self, quals):
+        self.quality_bases += len(quals)
+        numpy = _optional_numpy()
+        # sum() is about 20 times slower than NumPy
+        total = sum(quals) if numpy is None else _numpy_byte_sum(numpy, quals)
+        self.quality_sum += total - self.quality_offset * len(quals)
+
+    def _count_pending(self):
+        if self._pending_seqs:
+            self._count_sequence(b''.join(self._pending_seqs))
+            self._pending_seqs.clear()
+        if self._pending_quals:
+            self._count_quality(b''.join(self._pending_quals))
+            self._pending_quals.clear()
+        self._pending_bytes = 0
+
+    def n_statistic(self, fraction):
+        '''Return the length L such that records at least L long contain
+        fraction (e.g. 0.5 for N50) of all bases, or None if there are no
+        records'''
+        self._count_pending()
+        if self.num_records == 0:
+            return None
+        lengths = sorted(self._length_counts.items(), reverse=True)
+        total = sum(length * count for length, count in lengths)
+        target = total * fraction
+        cumulative = 0
+        for length, count in lengths:
+            cumulative += length * count
+            if cumulative >= target:
+                return length
+        return lengths[-1][0]
+
+    def length_histogram(self):
+        '''Return a list of (lower, upper, count) tuples counting records with
+        lower <= length < upper, in power of two bins'''
+        bins = Counter()
+        for length, count in self._length_counts.items():
+            bins[length.bit_length()] += count
+        return [((1 << bit_length) >> 1, 1 << bit_length, bins[bit_length])
+                for bit_length in sorted(bins)]
+
+    def summary(self):
+        '''Return a dict of all statistics'''
+        self._count_pending()
+        return {
+            'num_records': self.num_records,
+            'total_bases': self.total_bases,
+            'min_length': self.min_length,
+            'max_length': self.max_length,
+            'mean_length': self.total_bases / self.num_records if self.num_records else None,
+            'n50': self.n_statistic(0.5),
+            'n90': self.n_statistic(0.9),
+            'gc_fraction': self.gc_bases / self.total_bases if self.total_bases else None,
+            'mean_quality': self.quality_sum / self.quality_bases if self.quality_bases else None,
+            'lengths_approximate': self.lengths_approximate,
+            'length_histogram': self.length_histogram(),
+        }
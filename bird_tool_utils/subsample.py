@@ -0,0 +1,227 @@
+import itertools
+import math
+import operator
+import random
+
+from .sequence import DEFAULT_BLOCK_SIZE, _iter_fastx_blocks, _check_mates
+
+
+# Blocks are (headers, seqs, quals, name_start) tuples, see _iter_fastx_blocks
+
+def _slice(block, start, stop, step=1):
+    headers, seqs, quals, name_start = block
+    if start == 0 and stop == len(headers) and step == 1:
+        return block
+    return headers[start:stop:step], seqs[start:stop:step], \
+        quals[start:stop:step] if quals is not None else None, name_start
+
+
+def _concat(first, second):
+    quals = None
+    if first[2] is not None or second[2] is not None:
+        quals = (first[2] or [None] * len(first[0])) + (second[2] or [None] * len(second[0]))
+    headers = first[0]
+    if first[3] != second[3]:
+        # Only ever a single carried over record, so cheap to convert. With
+        # name_start set, headers are expected to start with '@'.
+        if second[3]:
+            headers = [b'@' + h for h in headers]
+        else:
+            headers = [h[1:] for h in headers]
+    return headers + second[0], first[1] + second[1], quals, second[3]
+
+
+def _aligned_blocks(forward, reverse):
+    '''Yield (forward block, reverse block) pairs holding the same number of
+    records, from two streams of blocks which are cut in different places'''
+    forward = iter(forward)
+    reverse = iter(reverse)
+    f = r = None
+    fi = ri = 0
+    while True:
+        if f is None or fi == len(f[0]):
+            f = next(forward, None)
+            fi = 0
+        if r is None or ri == len(r[0]):
+            r = next(reverse, None)
+            ri = 0
+        if f is None and r is None:
+            return
+        if f is None or r is None:
+            raise Exception("Forward and reverse files contain different numbers of records")
+        k = min(len(f[0]) - fi, len(r[0]) - ri)
+        yield _slice(f, fi, fi + k), _slice(r, ri, ri + k)
+        fi += k
+        ri += k
+
+
+def _interleaved_blocks(blocks):
+    carry = None
+    for block in blocks:
+        if carry is not None:
+            block = _concat(carry, block)
+        n = len(block[0])
+        even = n // 2 * 2
+        carry = _slice(block, even, n) if even < n else None
+        if even > 0:
+            yield _slice(block, 0, even, 2), _slice(block, 1, even, 2)
+    if carry is not None:
+        raise Exception("Interleaved input has an odd number of records")
+
+
+def _name(block, i):
+    return block[0][i][block[3]:].partition(b' ')[0]
+
+
+def _record(mates, i):
+    records = tuple(
+        (_name(block, i), block[1][i], block[2][i] if block[2] is not None else None)
+        for block in mates)
+    return records if len(records) > 1 else records[0]
+
+
+class _Selector:
+    '''Chooses which of a stream of candidates to keep, given the gap before
+    the next kept one. Tracks the position in the stream across blocks, so
+    that only selected candidates need any per-candidate work.'''
+
+    def __init__(self, gaps):
+        self._gaps = gaps
+        self._next = next(gaps)
+
+    def select(self, candidates):
+        selected = []
+        n = len(candidates)
+        position = self._next
+        while position < n:
+            selected.append(candidates[position])
+            position += 1 + next(self._gaps)
+        self._next = position - n
+        return selected
+
+
+def _fraction_gaps(rng, fraction):
+    '''Yield the number of candidates to pass over before each selected one,
+    when selecting each independently with probability fraction. Drawing the
+    gaps from a geometric distribution needs one random number per selected
+    candidate, rather than one per candidate.'''
+    if fraction >= 1:
+        yield from itertools.repeat(0)
+    log_q = math.log(1 - fraction)
+    while True:
+        yield int(math.log(1.0 - rng.random()) / log_q)
+
+
+class _Reservoir:
+    '''Uniform random sample of a fixed number of candidates, using Li's
+    Algorithm L, which draws random numbers only when the sample changes.'''
+
+    def __init__(self, count, rng):
+        self.count = count
+        self.rng = rng
+        self.sample = [] # (position, record)
+        self._seen = 0
+        self._w = math.exp(math.log(1.0 - rng.random()) / count)
+        self._next = count + self._gap()
+
+    def _gap(self):
+        if self._w >= 1:
+            return 0
+        return int(math.log(1.0 - self.rng.random()) / math.log(1 - self._w))
+
+    def add(self, mates, candidates):
+        n = len(candidates)
+        i = 0
+        while len(self.sample) < self.count and i < n:
+            self.sample.append((self._seen + i, _record(mates, candidates[i])))
+            i += 1
+        while True:
+            i = self._next - self._seen
+            if i >= n:
+                break
+            self.sample[self.rng.randrange(self.count)] = (
+                self._next, _record(mates, candidates[i]))
+            self._w *= math.exp(math.log(1.0 - self.rng.random()) / self.count)
+            self._next += 1 + self._gap()
+        self._seen += n
+
+    def records(self):
+        return [record for _, record in sorted(self.sample, key=lambda s: s[0])]
+
+
+def subsample_reads(forward, reverse=None, interleaved=False, fraction=None,
+                    count=None, min_length=None, max_length=None,
+                    name_filter=None, seed=None, check_names=True,
+                    name_prefix_length=None, block_size=DEFAULT_BLOCK_SIZE):
+    '''Generator function filtering and/or subsampling FASTA/FASTQ records
+    from binary file-like objects, yielding (name, seq, qual) bytes tuples,
+    or pairs of them for paired input (a reverse file, or interleaved=True).
+
+    Records are first filtered by sequence length (min_length, max_length,
+    both mates must pass) and by name (name_filter, a callable taking the
+    forward name as bytes). Of those that pass, each is kept with
+    probability fraction if given, and then if count is given a uniform
+    random sample of count of the rest is taken by reservoir sampling.
+    Output is in file order, and the same seed always selects the same
+    records.
+
+    Input is parsed in blocks as by SeqReader.readfq_bytes, and decisions
+    are made for a whole block at a time from its lengths and the random
+    gaps between selected records. Records which are not kept are still
+    split into headers, sequences and qualities by the block parser, but
+    their names are not extracted (unless name_filter is given) and no
+    record tuples are made for them.
+
+    Unless check_names is False, the names of kept pairs are checked to
+    match, as for SeqReader.read_pairs.
+    '''
+    rng = random.Random(seed)
+    blocks = _iter_fastx_blocks(forward, block_size)
+    if reverse is not None:
+        groups = _aligned_blocks(blocks, _iter_fastx_blocks(reverse, block_size))
+    elif interleaved:
+        groups = _interleaved_blocks(blocks)
+    else:
+        groups = ((block,) for block in blocks)
+    paired = reverse is not None or interleaved
+
+    selector = None
+    if fraction is not None:
+        if fraction <= 0:
+            return
+        selector = _Selector(_fraction_gaps(rng, fraction))
+    reservoir = None
+    if count is not None:
+        if count <= 0:
+            return
+        reservoir = _Reservoir(count, rng)
+
+    low = min_length if min_length is not None else 0
+    high = max_length if max_length is not None else math.inf
+    for mates in groups:
+        candidates = range(len(mates[0][0]))
+        if min_length is not None or max_length is not None:
+            keep = None
+            for block in mates:
+                passed = [low <= length <= high for length in map(len, block[1])]
+                keep = passed if keep is None else list(map(operator.and_, keep, passed))
+            candidates = list(itertools.compress(candidates, keep))
+        if name_filter is not None:
+            candidates = [i for i in candidates if name_filter(_name(mates[0], i))]
+        if selector is not None:
+            candidates = selector.select(candidates)
+
+        if reservoir is not None:
+            reservoir.add(mates, candidates)
+        else:
+            for i in candidates:
+                record = _record(mates, i)
+                if paired and check_names:
+                    _check_mates([record[0]], [record[1]], name_prefix_length)
+                yield record
+
+    if reservoir is not None:
+        for record in reservoir.records():
+            if paired and check_names:
+                _check_mates([record[0]], [record[1]], name_prefix_length)
+            yield record
@@ -0,0 +1,96 @@
+import atexit
+import contextlib
+import threading
+import time
+from collections import OrderedDict
+
+_enabled = False
+# Stage name to [number of times run, wall clock seconds, CPU seconds]
+_stages = OrderedDict()
+_stages_lock = threading.Lock()
+
+
+def enable_timing():
+    '''Start recording stage timings, and log a summary at exit. Called by
+    BirdArgparser.parse_the_args when --timing is specified.'''
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        atexit.register(log_timing_summary)
+
+
+def timing_enabled():
+    return _enabled
+
+
+class stage(contextlib.ContextDecorator):
+    '''Mark a stage of a pipeline whose wall clock and CPU time should be
+    reported by --timing, as a context manager:
+
+        with stage('align'):
+            ...
+
+    or as a decorator (@stage('align')). Nothing is recorded unless timing
+    has been enabled. CPU time is that of the whole process, so includes
+    other threads running at the same time.'''
+
+    def __init__(self, name):
+        self.name = name
+        # Start times are kept per thread, so that a decorated function may
+        # be running in several threads (or recursively) at once
+        self._local = threading.local()
+
+    def __enter__(self):
+        if _enabled:
+            starts = self._local.__dict__.setdefault('starts', [])
+            starts.append((time.perf_counter(), time.process_time()))
+        return self
+
+    def __exit__(self, *exc):
+        starts = getattr(self._local, 'starts', None)
+        if _enabled and starts:
+            wall_start, cpu_start = starts.pop()
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            with _stages_lock:
+                totals = _stages.setdefault(self.name, [0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += wall
+                totals[2] += cpu
+        return False
+
+
+def timing_summary():
+    '''Return a list of (stage name, times run, wall seconds, CPU seconds)
+    in the order the stages were first finished'''
+    with _stages_lock:
+        return [(name, count, wall, cpu) for name, (count, wall, cpu) in _stages.items()]
+
+
+def log_timing_summary():
+    import logging
+    summary = timing_summary()
+    if len(summary) == 0:
+        logging.info("Timing: no stages were recorded")
+        return
+    width = max(len(name) for name, _, _, _ in summary)
+    logging.info("Timing summary (wall / CPU seconds):")
+    for name, count, wall, cpu in summary:
+        logging.info("  {:<{}}  {:>10.3f}  {:>10.3f}  ({} run{})".format(
+            name, width, wall, cpu, count, '' if count == 1 else 's'))
+
+
+def start_profiling(path):
+    '''Profile the rest of the run with cProfile, writing pstats output to
+    path at exit. Called by BirdArgparser.parse_the_args when --profile is
+    specified.'''
+    import cProfile
+    profiler = cProfile.Profile()
+
+    def finish():
+        profiler.disable()
+        profiler.dump_stats(path)
+
+    atexit.register(finish)
+    profiler.enable()
+    return profiler
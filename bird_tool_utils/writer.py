@@ -0,0 +1,103 @@
+from .compression import open_compressed_writer
+
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+
+def _to_bytes(s):
+    if isinstance(s, str):
+        return s.encode()
+    return s
+
+
+class SeqWriter:
+    '''Buffered FASTA/FASTQ writer, the counterpart of SeqReader.
+
+    Records (and SeqBatch objects from SeqReader.read_batches) are formatted
+    into large in-memory buffers which are written out buffer_size bytes at a
+    time. Records with a quality string are written as FASTQ, and others as
+    FASTA, wrapping sequence lines at line_width characters if specified.
+
+    output can be a binary file-like object, or a path. When writing to a
+    path, compression is chosen from the extension (.gz, .bz2, .xz, .zst) by
+    default, and carried out by pigz/xz/zstd etc. or on a background thread,
+    see open_compressed_writer.
+
+    Use as a context manager, or call close() when finished.
+    '''
+
+    def __init__(self, output, line_width=None, buffer_size=DEFAULT_BUFFER_SIZE,
+                 compression='auto', threads=1, level=None):
+        if isinstance(output, str):
+            self._fp = open_compressed_writer(
+                output, compression=compression, threads=threads, level=level)
+            self._close_fp = True
+        else:
+            self._fp = output
+            self._close_fp = False
+        self._line_width = line_width
+        self._buffer_size = buffer_size
+        self._parts = []
+        self._buffered = 0
+
+    def _wrap(self, seq):
+        width = self._line_width
+        if width is None or len(seq) <= width:
+            return seq
+        return b'\n'.join([seq[i:i+width] for i in range(0, len(seq), width)])
+
+    def write(self, name, seq, qual=None):
+        '''Write a single record. name, seq and qual may be str or bytes.'''
+        if qual is None:
+            record = b''.join((b'>', _to_bytes(name), b'\n', self._wrap(_to_bytes(seq)), b'\n'))
+        else:
+            record = b''.join((b'@', _to_bytes(name), b'\n', _to_bytes(seq), b'\n+\n',
+                               _to_bytes(qual), b'\n'))
+        self._parts.append(record)
+        self._buffered += len(record)
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def write_records(self, records):
+        '''Write an iterable of (name, seq, qual) or (name, seq) records'''
+        for record in records:
+            self.write(*record)
+
+    def write_batch(self, batch):
+        '''Write all records in a SeqBatch'''
+        names = batch.names
+        ends = (batch.offsets + batch.lengths).tolist()
+        starts = batch.offsets.tolist()
+        seqs = batch.seqs
+        if batch.quals is None:
+            wrap = self._wrap
+            self._parts.append(b''.join([
+                b'>%b\n%b\n' % (name, wrap(seqs[start:end]))
+                for name, start, end in zip(names, starts, ends)]))
+        else:
+            quals = batch.quals
+            self._parts.append(b''.join([
+                b'@%b\n%b\n+\n%b\n' % (name, seqs[start:end], quals[start:end])
+                for name, start, end in zip(names, starts, ends)]))
+        self._buffered += len(self._parts[-1])
+        if self._buffered >= self._buffer_size:
+            self.flush()
+
+    def flush(self):
+        if len(self._parts) > 0:
+            self._fp.write(b''.join(self._parts))
+            self._parts = []
+            self._buffered = 0
+
+    def close(self):
+        self.flush()
+        if self._close_fp:
+            self._fp.close()
+        else:
+            self._fp.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
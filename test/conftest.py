@@ -1,3 +1,6 @@
+import io
+import os
+import subprocess
 import sys
 import types
 
@@ -16,3 +19,30 @@ build_manpages.manpage = manpage
 
 sys.modules.setdefault("build_manpages", build_manpages)
 sys.modules.setdefault("build_manpages.manpage", manpage)
+
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)), '..')
+
+
+def run_subcommand_script(script, *arguments):
+    '''Run script, which should parse a subcommand 'run' with
+    BirdArgparser, in a fresh interpreter with the given arguments, and
+    return what it wrote to stderr'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT
+    return subprocess.run(
+        [sys.executable, '-c', script, 'run'] + list(arguments),
+        stderr=subprocess.PIPE, env=env, check=True).stderr.decode()
+
+
+def fastq_file(records, suffix='', description='desc'):
+    '''Return a binary file-like object of FASTQ holding records, an
+    iterable of (name, seq, qual) str tuples. suffix (e.g. '/1') is added to
+    each name, and description after it unless description is None.'''
+    if description is None:
+        template = '@{0}{3}\n{1}\n+\n{2}\n'
+    else:
+        template = '@{0}{3} {4}\n{1}\n+\n{2}\n'
+    return io.BytesIO(''.join(
+        template.format(name, seq, qual, suffix, description)
+        for name, seq, qual in records).encode())
@@ -26,6 +26,8 @@ import os.path
 import sys
 import io
 import contextlib
+import tempfile
+import argparse
 
 sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
 
@@ -101,6 +103,226 @@ class Tests(unittest.TestCase):
                 self.fail('build subcommand not found in help output')
         finally:
             sys.argv = saved
-        
+
+    def test_register_subparser_builds_only_invoked(self):
+        saved = sys.argv
+        populated = []
+        def populate_build(subparser):
+            populated.append('build')
+            subparser.add_argument('--input', required=True)
+        def populate_other(subparser):
+            populated.append('other')
+        parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+        parser.register_subparser('build', 'build desc', populate_build)
+        parser.register_subparser('other', 'other desc', populate_other)
+        sys.argv = ['testprog', 'build', '--input', 'a', '--debug']
+        try:
+            args = parser.parse_the_args()
+            self.assertEqual('build', args.subparser_name)
+            self.assertEqual('a', args.input)
+            self.assertTrue(args.debug)
+            self.assertEqual(['build'], populated)
+        finally:
+            sys.argv = saved
+
+    def test_register_subparser_listed_in_help(self):
+        saved = sys.argv
+        parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+        parser.register_subparser('lazy', 'lazy desc', lambda subparser: None)
+        parser.new_subparser('eager', 'eager desc')
+        sys.argv = ['testprog', '-h']
+        try:
+            buf = io.StringIO()
+            with contextlib.redirect_stdout(buf):
+                with self.assertRaises(SystemExit):
+                    parser.parse_the_args()
+            output = buf.getvalue()
+            self.assertIn('lazy desc', output)
+            self.assertIn('eager desc', output)
+        finally:
+            sys.argv = saved
+
+    def _counting_manpage(self):
+        manpage_module = sys.modules['build_manpages.manpage']
+        original = manpage_module.Manpage
+        rendered = []
+        class CountingManpage:
+            def __init__(self, parser, **kwargs):
+                rendered.append(parser.prog)
+            def __str__(self):
+                return '.TH rendered\n'
+        manpage_module.Manpage = CountingManpage
+        self.addCleanup(setattr, manpage_module, 'Manpage', original)
+        return rendered
+
+    def test_full_help_roff_is_cached(self):
+        saved_argv = sys.argv
+        saved_env = os.environ.get('BIRD_TOOL_UTILS_CACHE_DIR')
+        rendered = self._counting_manpage()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ['BIRD_TOOL_UTILS_CACHE_DIR'] = tmp
+            try:
+                sys.argv = ['testprog', 'build', '--full-help-roff']
+                for _ in range(2):
+                    parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+                    parser.new_subparser('build', 'desc').add_argument('--input')
+                    buf = io.StringIO()
+                    with contextlib.redirect_stdout(buf):
+                        with self.assertRaises(SystemExit):
+                            parser.parse_the_args()
+                    self.assertEqual('.TH rendered\n\n', buf.getvalue())
+                self.assertEqual(1, len(rendered))
+                self.assertEqual(1, len(os.listdir(os.path.join(tmp, 'manpages'))))
+
+                # Changing the parser definition invalidates the cached page
+                parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+                parser.new_subparser('build', 'desc').add_argument('--output')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    with self.assertRaises(SystemExit):
+                        parser.parse_the_args()
+                self.assertEqual(2, len(rendered))
+            finally:
+                sys.argv = saved_argv
+                if saved_env is None:
+                    del os.environ['BIRD_TOOL_UTILS_CACHE_DIR']
+                else:
+                    os.environ['BIRD_TOOL_UTILS_CACHE_DIR'] = saved_env
+
+    def test_manpage_fingerprint_stable_across_processes(self):
+        import subprocess
+        code = (
+            'import argparse; from bird_tool_utils.manpage_cache import parser_fingerprint; '
+            'parser = argparse.ArgumentParser(prog="p"); '
+            'parser.add_argument("--mode", choices={"fast", "slow", "auto"}, type=str.lower, default=object()); '
+            'parser.add_argument("--check", type=lambda x: x, default={"b": 1, "a": 2}); '
+            'print(parser_fingerprint(parser, "extra"))')
+        fingerprints = set()
+        for seed in ('1', '2'):
+            env = dict(os.environ)
+            env['PYTHONHASHSEED'] = seed
+            env['PYTHONPATH'] = os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')
+            result = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                                    env=env, check=True)
+            fingerprints.add(result.stdout)
+        self.assertEqual(1, len(fingerprints))
+
+    def test_manpage_fingerprint_includes_renderer_version(self):
+        from unittest import mock
+        import importlib.metadata
+        from bird_tool_utils import manpage_cache
+        parser = argparse.ArgumentParser(prog='p')
+        def installed(versions):
+            def version(distribution):
+                if distribution not in versions:
+                    raise importlib.metadata.PackageNotFoundError(distribution)
+                return versions[distribution]
+            return mock.patch('importlib.metadata.version', version)
+        fingerprints = []
+        for renderer in ('1.7.0', '1.8.0'):
+            with installed({'argparse-manpage-birdtools': renderer}):
+                self.assertEqual('argparse-manpage-birdtools ' + renderer,
+                                 manpage_cache.renderer_version())
+                fingerprints.append(manpage_cache.parser_fingerprint(parser))
+        self.assertNotEqual(fingerprints[0], fingerprints[1])
+
+    def test_render_manpages(self):
+        saved = sys.argv
+        rendered = self._counting_manpage()
+        def make_parser(**kwargs):
+            parser = BirdArgparser(program='TestProgram', program_invocation='testprog',
+                                   manpage_cache=False, **kwargs)
+            parser.new_subparser('build', 'build desc')
+            parser.register_subparser('lazy', 'lazy desc', lambda subparser: None)
+            return parser
+        self.addCleanup(setattr, sys, 'argv', saved)
+        with tempfile.TemporaryDirectory() as tmp:
+            # Pages are rendered at build time, from a different script than
+            # the installed program they are later looked up by
+            sys.argv = ['/build/setup.py', 'build']
+            paths = make_parser().render_manpages(tmp)
+            self.assertEqual(2, len(paths))
+            self.assertEqual(2, len(rendered))
+
+            sys.argv = ['/usr/local/bin/testprog', 'lazy', '--full-help-roff']
+            parser = make_parser(manpage_directory=tmp)
+            with contextlib.redirect_stdout(io.StringIO()):
+                with self.assertRaises(SystemExit):
+                    parser.parse_the_args()
+            self.assertEqual(2, len(rendered))
+
+    def _restore_threads_after_test(self):
+        from bird_tool_utils import parallel, runtime
+        saved_argv = sys.argv
+        saved_env = {v: os.environ.get(v) for v in runtime.THREAD_ENVIRONMENT_VARIABLES}
+        def restore():
+            sys.argv = saved_argv
+            runtime._threads = None
+            runtime._memory_limit = None
+            parallel.shutdown_executors()
+            for variable, value in saved_env.items():
+                if value is None:
+                    os.environ.pop(variable, None)
+                else:
+                    os.environ[variable] = value
+        self.addCleanup(restore)
+
+    def test_threads_and_memory_limit(self):
+        from bird_tool_utils import parallel, runtime
+        self._restore_threads_after_test()
+        parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+        parser.new_subparser('build', 'desc')
+        sys.argv = ['testprog', 'build', '--threads', '3', '--memory-limit', '2G']
+        args = parser.parse_the_args()
+        self.assertEqual(3, args.threads)
+        self.assertEqual(2 * 1024**3, args.memory_limit)
+        self.assertEqual('3', os.environ['OMP_NUM_THREADS'])
+        self.assertEqual(3, runtime.configured_threads())
+        self.assertEqual(2 * 1024**3, runtime.configured_memory_limit())
+        self.assertEqual(3, parallel.shared_executor()._max_workers)
+
+    def test_thread_environment_kept_without_threads(self):
+        from bird_tool_utils import runtime
+        self._restore_threads_after_test()
+        os.environ['OMP_NUM_THREADS'] = '16'
+        parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+        parser.new_subparser('build', 'desc')
+        sys.argv = ['testprog', 'build', '--quiet']
+        args = parser.parse_the_args()
+        self.assertIsNone(args.threads)
+        self.assertEqual('16', os.environ['OMP_NUM_THREADS'])
+        self.assertIsNone(runtime.configured_threads())
+
+    def test_own_integer_threads_argument_not_exported(self):
+        from bird_tool_utils import runtime
+        self._restore_threads_after_test()
+        os.environ['OMP_NUM_THREADS'] = '16'
+        parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+        parser.new_subparser('build', 'desc').add_argument(
+            '--threads', type=int, default=1, help='own threads argument')
+        for argv in (['testprog', 'build', '--quiet'], ['testprog', 'build', '--threads', '4']):
+            sys.argv = argv
+            parser.parse_the_args()
+            self.assertEqual('16', os.environ['OMP_NUM_THREADS'])
+            self.assertIsNone(runtime.configured_threads())
+
+    def test_existing_threads_argument_kept(self):
+        saved = sys.argv
+        self.addCleanup(setattr, sys, 'argv', saved)
+        parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+        parser.new_subparser('build', 'desc').add_argument(
+            '--threads', '-t', default='auto', help='own threads argument')
+        sys.argv = ['testprog', 'build', '-t', '5']
+        args = parser.parse_the_args()
+        self.assertEqual('5', args.threads)
+        self.assertIsNone(args.memory_limit)
+
+    def test_parse_memory_size(self):
+        self.assertEqual(1024, parse_memory_size('1024'))
+        self.assertEqual(512 * 1024**2, parse_memory_size('512M'))
+        self.assertEqual(4 * 1024**3, parse_memory_size('4GB'))
+        self.assertEqual(2 * 1024**3, parse_memory_size('2GiB'))
+        with self.assertRaises(argparse.ArgumentTypeError):
+            parse_memory_size('lots')
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..'),
+            os.path.join(os.path.dirname(os.path.realpath(__file__)),'..','benchmarks')]+sys.path
+
+from bird_tool_utils import SeqReader
+import synthetic
+
+class Tests(unittest.TestCase):
+    def test_synthetic_data_is_deterministic(self):
+        self.assertEqual(list(synthetic.random_records(5, 20, seed=1, quality=True)),
+                         list(synthetic.random_records(5, 20, seed=1, quality=True)))
+        self.assertNotEqual(list(synthetic.random_records(5, 20, seed=1)),
+                            list(synthetic.random_records(5, 20, seed=2)))
+
+    def test_synthetic_files_parse(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fastq = os.path.join(tmp, 'a.fq')
+            synthetic.write_fastq(fastq, 10, 100, length_spread=50)
+            with open(fastq) as f:
+                records = list(SeqReader().readfq(f))
+            self.assertEqual(10, len(records))
+            self.assertEqual([len(r[1]) for r in records], [len(r[2]) for r in records])
+
+            fasta = os.path.join(tmp, 'a.fa')
+            synthetic.write_fasta(fasta, 3, 130, line_width=60)
+            with open(fasta) as f:
+                records = list(SeqReader().readfa(f))
+            self.assertEqual([130, 130, 130], [len(r[1]) for r in records])
+            self.assertEqual('read0', records[0][0])
+
+if __name__ == "__main__":
+    unittest.main()
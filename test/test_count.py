@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+
+import unittest
+import os.path
+import sys
+import gzip
+import io
+import json
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import count_records, SeqReader
+
+class Tests(unittest.TestCase):
+    def _check(self, data, name='seqs', **kwargs):
+        expected = list(SeqReader().readfq(io.BytesIO(data), bytes_mode=True))
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, name)
+            with (gzip.open if name.endswith('.gz') else open)(path, 'wb') as f:
+                f.write(data)
+            for block_size in (1, 7, 1000):
+                self.assertEqual(
+                    (len(expected), sum(len(r[1]) for r in expected)),
+                    count_records(path, block_size=block_size, **kwargs))
+
+    def test_fasta(self):
+        self._check(b'>a desc\nACGT\nAC\n>b\n>c\nGG\n')
+        self._check(b'\n>a\nACGT')
+        self._check(b'')
+
+    def test_fastq_quality_starting_with_at(self):
+        self._check(b'@a\nACGT\n+\n@III\n@b\nAC\n+b\n+@\n')
+
+    def test_multiline_fastq(self):
+        self._check(b'@a\nAC\nGT\n+\nII\nII\n@b\nA\n+\nI\n')
+
+    def test_crlf(self):
+        # Carriage returns are not bases, as for readfq in text mode
+        for data in (b'>a desc\r\nACG\r\nTT\r\n>b\r\nGG\r\n',
+                     b'>a\r\nACGT\r',
+                     b'@a\r\nACGT\r\n+\r\nIIII\r\n@b\r\nAC\r\n+\r\nII\r\n'):
+            with tempfile.TemporaryDirectory() as d:
+                path = os.path.join(d, 'seqs')
+                with open(path, 'wb') as f:
+                    f.write(data)
+                with open(path) as f:
+                    expected = list(SeqReader().readfq(f))
+                for block_size in (1, 7, 1000):
+                    self.assertEqual(
+                        (len(expected), sum(len(r[1]) for r in expected)),
+                        count_records(path, block_size=block_size))
+            self._check(data)
+
+    def test_gzip(self):
+        self._check(b'@a\nACGT\n+\nIIII\n' * 100, name='seqs.fq.gz')
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'seqs.fa')
+            with open(path, 'w') as f:
+                f.write('>a\nACGT\n')
+            self.assertEqual((1, 4), count_records(path, cache=True))
+            with open(path + '.seqcount') as f:
+                cached = json.load(f)
+            self.assertEqual(1, cached['records'])
+
+            # Cached values are used while the file is unchanged
+            cached['records'] = 10
+            with open(path + '.seqcount', 'w') as f:
+                json.dump(cached, f)
+            self.assertEqual((10, 4), count_records(path, cache=True))
+            self.assertEqual((1, 4), count_records(path))
+
+            # and recounted when it changes
+            with open(path, 'w') as f:
+                f.write('>a\nACGT\n>b\nAA\n')
+            self.assertEqual((2, 6), count_records(path, cache=True))
+
+if __name__ == "__main__":
+    unittest.main()
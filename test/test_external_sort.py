@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+
+import unittest
+import os.path
+import sys
+import random
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import sort_records, sort_file, SeqReader
+
+def _records(num_records):
+    rng = random.Random(1)
+    records = []
+    for i in range(num_records):
+        seq = bytes(rng.choice(b'ACGT') for _ in range(rng.randint(1, 5)))
+        records.append((b'r%d' % i, seq, b'I' * len(seq)))
+    return records
+
+def _first_of_each_sequence(records):
+    seen = set()
+    unique = []
+    for record in records:
+        if record[1] not in seen:
+            seen.add(record[1])
+            unique.append(record)
+    return unique
+
+KEYS = {
+    'name': lambda r: r[0],
+    'length': lambda r: len(r[1]),
+    'sequence': lambda r: r[1],
+}
+
+class Tests(unittest.TestCase):
+    def test_sort_in_memory_and_spilled(self):
+        records = _records(300)
+        with tempfile.TemporaryDirectory() as d:
+            # A small memory budget means many runs and more than one
+            # round of merging
+            for memory_budget in (None, 3000):
+                for key in KEYS:
+                    for reverse in (False, True):
+                        self.assertEqual(
+                            sorted(records, key=KEYS[key], reverse=reverse),
+                            list(sort_records(iter(records), key=key, reverse=reverse,
+                                              memory_budget=memory_budget, scratch_dir=d)))
+            self.assertEqual([], os.listdir(d))
+
+    def test_dedupe(self):
+        records = _records(300)
+        unique = _first_of_each_sequence(records)
+        self.assertLess(len(unique), len(records))
+        for key in (None, 'name', 'length', 'sequence'):
+            expected = unique if key is None else sorted(unique, key=KEYS[key])
+            self.assertEqual(expected, list(sort_records(
+                records, key=key, dedupe=True, memory_budget=3000)))
+        with self.assertRaises(Exception):
+            list(sort_records(records, key=None))
+        with self.assertRaises(Exception):
+            list(sort_records(records, key='quality'))
+
+    def test_parallel_runs(self):
+        records = _records(300)
+        self.assertEqual(
+            sorted(records, key=KEYS['length']),
+            list(sort_records(records, key='length', memory_budget=20000, threads=2)))
+
+    def test_sort_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            input_path = os.path.join(d, 'in.fa')
+            output_path = os.path.join(d, 'out.fa.gz')
+            with open(input_path, 'w') as f:
+                f.write('>b desc\nGG\n>a\nAC\nGT\n>c\nAC\nGT\n')
+            self.assertEqual(2, sort_file(input_path, output_path, dedupe=True))
+            self.assertEqual(
+                [('a', 'ACGT'), ('b', 'GG')],
+                list(SeqReader().readfa_path(output_path)))
+
+if __name__ == "__main__":
+    unittest.main()
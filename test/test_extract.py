@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+
+import unittest
+import os.path
+import sys
+import gzip
+import io
+import tempfile
+from unittest import mock
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import ReadNameSet, extract_reads
+import bird_tool_utils.extract
+from conftest import fastq_file
+
+NAMES = ['r{}'.format(i) for i in range(100)]
+RECORDS = [(name, 'ACGT', 'IIII') for name in NAMES]
+WANTED = ['r{}'.format(i) for i in range(0, 100, 7)] + ['missing']
+
+class Tests(unittest.TestCase):
+    def _check_name_set(self):
+        for bloom_bits_per_name in (None, 10):
+            names = ReadNameSet(WANTED, bloom_bits_per_name=bloom_bits_per_name)
+            self.assertEqual(len(WANTED), len(names))
+            self.assertIn('r7', names)
+            self.assertIn(b'r7/1', names)
+            self.assertNotIn('r8', names)
+            self.assertEqual(
+                [name in WANTED for name in NAMES],
+                names.contains_many([name.encode() for name in NAMES]))
+        self.assertEqual([False], ReadNameSet([]).contains_many([b'r1']))
+        self.assertNotIn('r7/1', ReadNameSet(['r7'], strip_mate_suffix=False))
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_name_set_numpy(self):
+        self._check_name_set()
+
+    def test_name_set_without_numpy(self):
+        with mock.patch.object(bird_tool_utils.extract, '_optional_numpy', lambda: None):
+            self._check_name_set()
+
+    def test_from_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'names.txt.gz')
+            with gzip.open(path, 'wt') as f:
+                f.write('@r1 desc\n>r2\nr3\n\n')
+            names = ReadNameSet.from_file(path)
+        self.assertEqual([True, True, True, False],
+                         names.contains_many([b'r1', b'r2', b'r3', b'r4']))
+
+    def test_extract(self):
+        got = list(extract_reads(WANTED, fastq_file(RECORDS), block_size=50))
+        self.assertEqual([(name.encode(), b'ACGT', b'IIII') for name in WANTED[:-1]], got)
+        excluded = list(extract_reads(ReadNameSet(WANTED), fastq_file(RECORDS), exclude=True))
+        self.assertEqual(len(NAMES) - len(WANTED) + 1, len(excluded))
+        self.assertNotIn(b'r7', [r[0] for r in excluded])
+
+    def test_extract_pairs(self):
+        expected = [((name + '/1').encode(), (name + '/2').encode()) for name in WANTED[:-1]]
+        got = list(extract_reads(WANTED, fastq_file(RECORDS, '/1'), fastq_file(RECORDS, '/2'), block_size=30))
+        self.assertEqual(expected, [(f[0], r[0]) for f, r in got])
+
+        interleaved = io.BytesIO(b''.join(
+            b'@%s/%d\nACGT\n+\nIIII\n' % (name.encode(), mate) for name in NAMES for mate in (1, 2)))
+        got = list(extract_reads(WANTED, interleaved, interleaved=True))
+        self.assertEqual(expected, [(f[0], r[0]) for f, r in got])
+
+        with self.assertRaises(Exception):
+            list(extract_reads(WANTED, fastq_file(RECORDS, '/1'), fastq_file(reversed(RECORDS), '/2')))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+import unittest
+import os.path
+import sys
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+import bird_tool_utils
+from bird_tool_utils import *
+from bird_tool_utils import FastaIndex
+
+class Tests(unittest.TestCase):
+    maxDiff = None
+
+    def test_build_and_fetch(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'contigs.fna')
+            with open(path, 'w') as f:
+                f.write(">c1 desc\nACGTA\nCGTAC\nGT\n>c2\nTTTTT\nGG\n>empty\n>c3\nAC\n")
+            index = FastaIndex.open(path)
+            self.assertTrue(os.path.exists(path + '.fai'))
+            with open(path + '.fai') as f:
+                self.assertEqual(
+                    'c1\t12\t9\t5\t6\nc2\t7\t28\t5\t6\n'
+                    'empty\t0\t44\t0\t0\nc3\t2\t48\t2\t3\n', f.read())
+
+            for use_mmap in (False, True):
+                with FastaIndex.open(path, use_mmap=use_mmap) as index:
+                    self.assertEqual(['c1', 'c2', 'empty', 'c3'], index.names())
+                    self.assertEqual(b'ACGTACGTACGT', index.fetch('c1'))
+                    self.assertEqual(b'TACG', index.fetch('c1', 3, 7))
+                    self.assertEqual(b'TTTTTGG', index.fetch('c2'))
+                    self.assertEqual(b'', index.fetch('empty'))
+                    self.assertEqual(b'AC', index.fetch('c3'))
+                    self.assertEqual(b'TTGG', index.fetch_region('c2:4-7'))
+                    self.assertEqual(b'CGTAC', index.fetch_region('c1:2-6'))
+                    self.assertEqual(bytes, type(index.fetch('c1', 1, 4)))
+                    for (start, end) in ((1, 4), (3, 7), (0, 12), (5, 5)):
+                        view = index.fetch_view('c1', start, end)
+                        self.assertEqual(memoryview, type(view))
+                        self.assertEqual(index.fetch('c1', start, end), view.tobytes())
+                        view.release()
+
+    def test_inconsistent_line_lengths(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'contigs.fna')
+            with open(path, 'w') as f:
+                f.write(">c1\nACG\nACGT\n")
+            with self.assertRaises(Exception):
+                FastaIndex.build(path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+import unittest
+import os.path
+import sys
+import subprocess
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')
+
+def _imported_modules(code):
+    '''Return the set of modules imported when running code in a fresh
+    interpreter, according to python -X importtime'''
+    env = dict(os.environ)
+    env['PYTHONPATH'] = REPO_ROOT
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stderr=subprocess.PIPE, env=env, cwd=REPO_ROOT, check=True)
+    modules = set()
+    for line in result.stderr.decode().splitlines():
+        if line.startswith('import time:') and '|' in line:
+            name = line.split('|')[-1].strip()
+            if name != 'imported package':
+                modules.add(name)
+    return modules
+
+class Tests(unittest.TestCase):
+    maxDiff = None
+
+    def test_import_does_not_load_heavy_modules(self):
+        baseline = _imported_modules('pass')
+        imported = _imported_modules('import bird_tool_utils') - baseline
+        self.assertIn('bird_tool_utils', imported)
+        for heavy in ('build_manpages', 'build_manpages.manpage', 'subprocess',
+                      'tempfile', 'textwrap', 'logging', 'pathlib',
+                      'multiprocessing', 'bird_tool_utils.sequence'):
+            self.assertNotIn(heavy, imported)
+
+    def test_star_import(self):
+        baseline = _imported_modules('pass')
+        imported = _imported_modules('from bird_tool_utils import *') - baseline
+        for heavy in ('subprocess', 'concurrent.futures', 'bird_tool_utils.compression',
+                      'bird_tool_utils.faidx', 'bird_tool_utils.external_sort'):
+            self.assertNotIn(heavy, imported)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = REPO_ROOT
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'from bird_tool_utils import *; '
+             'print(sorted(k for k in globals() if not k.startswith("_")))'],
+            stdout=subprocess.PIPE, env=env, cwd=REPO_ROOT, check=True)
+        exported = result.stdout.decode()
+        for name in ('BirdArgparser', 'SeqReader', 'table_roff', 'in_tempdir'):
+            self.assertIn("'{}'".format(name), exported)
+        for name in ('os', 'contextlib', 'importlib', 'itertools', 'argparse', 'sys'):
+            self.assertNotIn("'{}'".format(name), exported)
+
+    def test_lazy_attributes(self):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = REPO_ROOT
+        result = subprocess.run(
+            [sys.executable, '-c',
+             'import sys, bird_tool_utils; '
+             'print("bird_tool_utils.sequence" in sys.modules); '
+             'bird_tool_utils.SeqReader; '
+             'print("bird_tool_utils.sequence" in sys.modules)'],
+            stdout=subprocess.PIPE, env=env, cwd=REPO_ROOT, check=True)
+        self.assertEqual(['False', 'True'], result.stdout.decode().split())
+
+    def test_parse_the_args_does_not_load_executors(self):
+        imported = _imported_modules(
+            'import sys; from bird_tool_utils import BirdArgparser; '
+            'parser = BirdArgparser(program="TestProgram", program_invocation="testprog"); '
+            'parser.new_subparser("build", "desc"); '
+            'sys.argv = ["testprog", "build", "--threads", "2", "--quiet"]; '
+            'parser.parse_the_args()')
+        self.assertIn('bird_tool_utils.runtime', imported)
+        for heavy in ('concurrent.futures', 'bird_tool_utils.parallel'):
+            self.assertNotIn(heavy, imported)
+
+if __name__ == "__main__":
+    unittest.main()
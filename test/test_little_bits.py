@@ -37,6 +37,26 @@ class Tests(unittest.TestCase):
     
     def test_chunker(self):
         self.assertEqual([(1,3),(2,None)], list(bird_tool_utils.iterable_chunks([1,3,2],2)))
+
+    def test_table_roff(self):
+        self.assertEqual(
+            '\n.TS\ntab(@);\nl l .\nT{\na\nT}@T{\n\\fBb\\fR\nT}\n_\nT{\nc\nT}@T{\nd\nT}\n.TE\n',
+            table_roff([['a', '\\fBb\\fR'], ['c', 'd']]))
+
+    def test_table_roff_generator(self):
+        rows = (['name', str(i)] for i in range(2))
+        self.assertEqual(
+            '\n.TS\ntab(@);\nl l .\nT{\nname\nT}@T{\n0\nT}\n_\nT{\nname\nT}@T{\n1\nT}\n.TE\n',
+            table_roff(rows))
+
+    def test_write_table_roff_escapes(self):
+        import io
+        out = io.StringIO()
+        write_table_roff([['.start', 'back\\slash'], ["'quote\nT}"]], out, num_columns=2)
+        self.assertEqual(
+            '\n.TS\ntab(@);\nl l .\nT{\n\\&.start\nT}@T{\nback\\eslash\nT}\n_\n'
+            'T{\n\\&\'quote\n\\&T}\nT}\n.TE\n',
+            out.getvalue())
         
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import concurrent.futures
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import chunked, chunked_map
+
+
+def _square(x):
+    return x * x
+
+
+class Tests(unittest.TestCase):
+    def test_chunked_by_count(self):
+        self.assertEqual([[1, 2], [3, 4], [5]], list(chunked(range(1, 6), 2)))
+        self.assertEqual([], list(chunked([], 2)))
+
+    def test_chunked_by_bytes(self):
+        items = [b'aaaa', b'bb', b'cc', b'dddddddd', b'e']
+        self.assertEqual(
+            [[b'aaaa', b'bb'], [b'cc'], [b'dddddddd'], [b'e']],
+            list(chunked(items, max_bytes=6)))
+        # Records are sized by the total length of their parts
+        records = [(b'r1', b'ACGT', None), (b'r2', b'ACGTACGT', None)]
+        self.assertEqual([[records[0]], [records[1]]], list(chunked(records, max_bytes=10)))
+
+    def test_chunked_by_count_and_bytes(self):
+        self.assertEqual([['a', 'b'], ['c'], ['dddd']],
+                         list(chunked(['a', 'b', 'c', 'dddd'], n=2, max_bytes=3)))
+
+    def test_chunked_requires_limit(self):
+        with self.assertRaises(Exception):
+            list(chunked([1]))
+
+    def test_chunked_map_ordered(self):
+        self.assertEqual([x * x for x in range(100)],
+                         list(chunked_map(_square, range(100), chunk_size=7,
+                                          workers=2, max_in_flight=2)))
+
+    def test_chunked_map_unordered(self):
+        self.assertEqual([x * x for x in range(100)],
+                         sorted(chunked_map(_square, iter(range(100)), chunk_size=3,
+                                            workers=3, ordered=False)))
+
+    def test_chunked_map_processes(self):
+        self.assertEqual([x * x for x in range(20)],
+                         list(chunked_map(_square, range(20), chunk_size=4,
+                                          executor='process', workers=2)))
+
+    def test_chunked_map_backpressure(self):
+        consumed = []
+        def items():
+            for i in range(1000):
+                consumed.append(i)
+                yield i
+        with concurrent.futures.ThreadPoolExecutor(2) as pool:
+            results = chunked_map(_square, items(), chunk_size=10, executor=pool,
+                                  max_in_flight=2)
+            self.assertEqual(0, next(results))
+            # Only the chunks in flight (plus the one being submitted) have
+            # been read from the input
+            self.assertLessEqual(len(consumed), 30)
+            results.close()
+
+if __name__ == "__main__":
+    unittest.main()
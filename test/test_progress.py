@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+
+import unittest
+import os.path
+import sys
+import gzip
+import io
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import track_progress, SeqReader
+
+class Tests(unittest.TestCase):
+    def test_records_pass_through(self):
+        records = [('r{}'.format(i), 'A' * i, None) for i in range(25)]
+        with self.assertLogs(level='INFO') as logs:
+            got = list(track_progress(iter(records), check_every=4, interval=0))
+        self.assertEqual(records, got)
+        # A report for each batch, and a final one
+        self.assertEqual(8, len(logs.output))
+        self.assertIn('finished', logs.output[-1])
+        self.assertIn('25 records', logs.output[-1])
+        self.assertIn('300bp', logs.output[-1])
+
+    def test_custom_length(self):
+        pairs = [(('a', 'AC', None), ('b', 'GGG', None))] * 3
+        with self.assertLogs(level='INFO') as logs:
+            self.assertEqual(pairs, list(track_progress(
+                pairs, length=lambda pair: len(pair[0][1]) + len(pair[1][1]))))
+        self.assertIn('15bp', logs.output[-1])
+
+    def test_compressed_file_position(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'reads.fq.gz')
+            with gzip.open(path, 'wb') as f:
+                for i in range(20000):
+                    f.write(b'@r%d\nACGTACGTAC\n+\nIIIIIIIIII\n' % i)
+            size = os.path.getsize(path)
+            with self.assertLogs(level='INFO') as logs:
+                records = list(SeqReader().readfq_path(path, bytes_mode=True, progress=True))
+            self.assertEqual(20000, len(records))
+            self.assertEqual(1, len(logs.output))
+            self.assertIn('Reading {}: finished'.format(path), logs.output[0])
+            self.assertIn('{:.1f} MB read'.format(size / 1e6), logs.output[0])
+
+    def test_eta(self):
+        fp = io.BytesIO(b'x' * 100)
+        fp.read(25)
+        with self.assertLogs(level='INFO') as logs:
+            list(track_progress(iter([('a', 'A', None)]), fp=fp, total_bytes=100, interval=0))
+        self.assertIn('25% done, ETA', logs.output[0])
+
+if __name__ == "__main__":
+    unittest.main()
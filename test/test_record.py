@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import io
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import SeqRecord, SeqReader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class Tests(unittest.TestCase):
+    def test_tuple_compatible(self):
+        record = SeqRecord(b'r1', b'ACGTN', b'!+5?I')
+        name, seq, qual = record
+        self.assertEqual((b'r1', b'ACGTN', b'!+5?I'), record)
+        self.assertEqual(b'r1', record.name)
+        self.assertEqual(b'ACGTN', record.seq)
+        self.assertEqual(b'!+5?I', record.qual)
+        self.assertEqual(5, record.length)
+        with self.assertRaises(AttributeError):
+            record.extra = 1
+        import pickle
+        self.assertEqual(record, pickle.loads(pickle.dumps(record)))
+        self.assertIsInstance(pickle.loads(pickle.dumps(record)), SeqRecord)
+
+    def test_phred_bytes(self):
+        self.assertEqual(bytes([0, 10, 20, 30, 40]),
+                         SeqRecord('r1', 'ACGTN', '!+5?I').phred_bytes())
+        self.assertEqual(bytes([0, 10]), SeqRecord(b'r1', b'AC', b'@J').phred_bytes(offset=64))
+        self.assertIsNone(SeqRecord(b'r1', b'AC').phred_bytes())
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_phred_array(self):
+        phred = SeqRecord(b'r1', b'ACGTN', b'!+5?I').phred()
+        self.assertEqual(numpy.uint8, phred.dtype)
+        self.assertEqual([0, 10, 20, 30, 40], phred.tolist())
+
+    def test_reverse_complement(self):
+        self.assertEqual(b'NacgTRYT', SeqRecord(b'r', b'ARYAcgtN').reverse_complement())
+        self.assertEqual('GGCA', SeqRecord('r', 'TGCC').reverse_complement())
+        self.assertEqual(SeqRecord(b'r', b'GGCA', b'CBA!'),
+                         SeqRecord(b'r', b'TGCC', b'!ABC').reverse_complemented())
+
+    def test_readfq_records(self):
+        fp = io.BytesIO(b'@r1 comment\nACGT\n+\nIIII\n>r2\nAA\nCC\n')
+        records = list(SeqReader().readfq_records(fp))
+        self.assertEqual([(b'r1', b'ACGT', b'IIII'), (b'r2', b'AACC', None)], records)
+        self.assertTrue(all(isinstance(r, SeqRecord) for r in records))
+        self.assertEqual(bytes([40] * 4), records[0].phred_bytes())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import json
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils.resources import resource_usage_report
+
+from conftest import run_subcommand_script
+
+SCRIPT = '''
+import subprocess, sys
+from bird_tool_utils import BirdArgparser
+parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+parser.new_subparser('run', 'desc', allow_no_args=True)
+args = parser.parse_the_args()
+data = [bytes(1000) for _ in range(1000)]
+subprocess.run([sys.executable, '-c', 'pass'], check=True)
+'''
+
+def _run(*arguments):
+    return run_subcommand_script(SCRIPT, *arguments)
+
+
+class Tests(unittest.TestCase):
+    def test_report(self):
+        report = resource_usage_report()
+        self.assertGreater(report['self']['max_rss_bytes'], 0)
+        self.assertIn('user_cpu_seconds', report['children'])
+
+    def test_resource_usage_flags(self):
+        output = _run('--resource-usage')
+        self.assertIn('Resource usage (self)', output)
+        self.assertIn('Resource usage (children)', output)
+        self.assertNotIn('Resource usage', _run())
+
+    def test_json_and_allocations(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'usage.json')
+            output = _run('--resource-usage-json', path, '--trace-allocations')
+            with open(path) as f:
+                report = json.load(f)
+        self.assertGreater(report['wall_seconds'], 0)
+        self.assertGreater(report['children']['max_rss_bytes'], 0)
+        self.assertGreater(len(report['top_allocations']), 0)
+        self.assertIn('top allocation sites', output)
+
+    def test_own_resource_usage_options_kept(self):
+        # Programs defining their own options of the same names keep them,
+        # and they do not turn on the report
+        script = '''
+from bird_tool_utils import BirdArgparser
+parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+subparser = parser.new_subparser('run', 'desc', allow_no_args=True)
+subparser.add_argument('--resource-usage', help='own option')
+subparser.add_argument('--resource-usage-json', help='own option')
+subparser.add_argument('--trace-allocations', action='store_true', help='own option')
+args = parser.parse_the_args()
+with open(args.resource_usage_json, 'w') as f:
+    f.write(args.resource_usage)
+'''
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'own.txt')
+            output = run_subcommand_script(
+                script, '--resource-usage', 'own', '--resource-usage-json', path,
+                '--trace-allocations')
+            with open(path) as f:
+                self.assertEqual('own', f.read())
+        self.assertNotIn('Resource usage', output)
+
+if __name__ == "__main__":
+    unittest.main()
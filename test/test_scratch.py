@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import tempfile
+import threading
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import workspace, wait_for_cleanup
+
+
+class Tests(unittest.TestCase):
+    def test_workspace_does_not_chdir(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as scratch:
+            with workspace(scratch_dir=scratch) as path:
+                self.assertEqual(cwd, os.getcwd())
+                self.assertEqual(scratch, os.path.dirname(path))
+                with open(os.path.join(path, 'a'), 'w') as f:
+                    f.write('a')
+            self.assertFalse(os.path.exists(path))
+
+    def test_scratch_dir_environment_variable(self):
+        saved = os.environ.get('BIRD_TOOL_UTILS_SCRATCH_DIR')
+        with tempfile.TemporaryDirectory() as scratch:
+            os.environ['BIRD_TOOL_UTILS_SCRATCH_DIR'] = scratch
+            try:
+                with workspace() as path:
+                    self.assertEqual(scratch, os.path.dirname(path))
+            finally:
+                if saved is None:
+                    del os.environ['BIRD_TOOL_UTILS_SCRATCH_DIR']
+                else:
+                    os.environ['BIRD_TOOL_UTILS_SCRATCH_DIR'] = saved
+
+    def test_background_cleanup(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            with workspace(scratch_dir=scratch, cleanup='background') as path:
+                os.makedirs(os.path.join(path, 'sub'))
+                for i in range(100):
+                    with open(os.path.join(path, 'sub', str(i)), 'w') as f:
+                        f.write('x')
+            # The workspace is moved out of the way immediately
+            self.assertFalse(os.path.exists(path))
+            wait_for_cleanup()
+            self.assertEqual([], os.listdir(scratch))
+
+    def test_no_cleanup(self):
+        with tempfile.TemporaryDirectory() as scratch:
+            with workspace(scratch_dir=scratch, cleanup=False) as path:
+                pass
+            self.assertTrue(os.path.isdir(path))
+
+    def test_concurrent_workspaces(self):
+        paths = []
+        def use_workspace():
+            with workspace() as path:
+                paths.append(path)
+        threads = [threading.Thread(target=use_workspace) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4, len(set(paths)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -25,12 +25,24 @@ import unittest
 import os.path
 import sys
 import tempfile
+import io
+import gzip
+import bz2
+import lzma
+import asyncio
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
 
 import bird_tool_utils
 from bird_tool_utils import BirdHelpFormatter
 from bird_tool_utils import *
+from bird_tool_utils import detect_compression, open_compressed
+from bird_tool_utils.compression import _ProcessReader
 
 class Tests(unittest.TestCase):
     maxDiff = None
@@ -44,6 +56,210 @@ class Tests(unittest.TestCase):
                 [('seq','ATGATG'),('5','AAA')],
                 list(SeqReader().readfa(open(f.name)))
                 )
-        
+
+    def test_readfa_bytes_mode(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(">seq 1\nATG\nATG\n>5\nAAA\n".encode())
+            f.flush()
+
+            self.assertEqual(
+                [(b'seq',b'ATGATG'),(b'5',b'AAA')],
+                list(SeqReader().readfa(open(f.name,'rb'), bytes_mode=True))
+                )
+
+    def test_readfq_bytes_mode_matches_readfq(self):
+        # Quality lines starting with '@', multi-line FASTQ and a mix of
+        # FASTA and FASTQ records
+        contents = "@r1 desc\nACGT\n+\n@III\n@r2\nAC\nGT\n+r2\n@I\nII\n" \
+            ">r3\nAAA\nCC\n@r4\nA\n+\n@\n>r5\n"
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(contents.encode())
+            f.flush()
+            expected = [('r1','ACGT','@III'),('r2','ACGT','@III'),
+                ('r3','AAACC',None),('r4','A','@'),('r5','',None)]
+            self.assertEqual(expected, list(SeqReader().readfq(open(f.name))))
+            for block_size in (1, 5, 1024):
+                self.assertEqual(
+                    [tuple(x.encode() if x is not None else None for x in r) for r in expected],
+                    list(SeqReader().readfq(
+                        open(f.name,'rb'), bytes_mode=True, block_size=block_size)))
+
+    def test_readfq_bytes_mode_fasta_lines_starting_with_plus_and_at(self):
+        # FASTA records with sequence lines starting with '+' or '@' are
+        # read by readfq as FASTQ, so the block parser must notice them even
+        # in the first record of a block
+        for contents in (">r0\nC\n+A@\n>r1\n+\n@+@@\n",
+                         ">r0\n+\n+AC\n>r1\n@@GT\n>r2\n>r3\nAG\n"):
+            expected = list(SeqReader().readfq(io.StringIO(contents)))
+            for block_size in (1, 5, 1024):
+                self.assertEqual(
+                    [tuple(x.encode() if x is not None else None for x in r) for r in expected],
+                    list(SeqReader().readfq(
+                        io.BytesIO(contents.encode()), bytes_mode=True, block_size=block_size)))
+
+    def test_readfq_bytes_mode_long_reads(self):
+        # Long reads are parsed record by record, which must stop at
+        # quality lines of the wrong length, multi-line records and short
+        # reads
+        long_seq = 'ACGT' * 500
+        contents = "@r1\n{0}\n+\n{1}\n@r2 desc\n{0}\n+\n{1}I\n@r3\n{0}\n+\n{1}\n" \
+            "@r4\nAC\nGT\n+\nIIII\n@r5\n{0}\n+\n{1}\n@r6\nA\n+\nI\n".format(
+                long_seq, '@' * len(long_seq))
+        expected = list(SeqReader().readfq(io.StringIO(contents)))
+        self.assertEqual(6, len(expected))
+        for block_size in (1, 1000, 4100, 1 << 20):
+            self.assertEqual(
+                [tuple(x.encode() if x is not None else None for x in r) for r in expected],
+                list(SeqReader().readfq(
+                    io.BytesIO(contents.encode()), bytes_mode=True, block_size=block_size)))
+
+    def test_readfq_bytes_mode_crlf(self):
+        contents = ">c1 desc\r\nACG\r\nTT\r\n>c2\r\nGG\r\n" \
+            "@r1\r\nACGT\r\n+\r\nIIII\r\n@r2\r\nAC\r\nGT\r\n+\r\nII\r\nII\r"
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(contents.encode())
+            f.flush()
+            expected = list(SeqReader().readfq(open(f.name)))
+            self.assertEqual(
+                [('c1','ACGTT',None),('c2','GG',None),('r1','ACGT','IIII'),('r2','ACGT','IIII')],
+                expected)
+            for block_size in (1, 2, 7, 1024):
+                self.assertEqual(
+                    [tuple(x.encode() if x is not None else None for x in r) for r in expected],
+                    list(SeqReader().readfq(
+                        open(f.name,'rb'), bytes_mode=True, block_size=block_size)))
+
+    def test_readfq_path_compressed(self):
+        contents = b"@r1\nACGT\n+\nIIII\n@r2\nAA\n+\n@I\n"
+        expected = [('r1','ACGT','IIII'),('r2','AA','@I')]
+        with tempfile.TemporaryDirectory() as d:
+            for (suffix, opener, compression) in (
+                    ('', open, None),
+                    ('.gz', gzip.open, 'gzip'),
+                    ('.bz2', bz2.open, 'bz2'),
+                    ('.xz', lzma.open, 'xz')):
+                path = os.path.join(d, 'reads.fq' + suffix)
+                with opener(path, 'wb') as f:
+                    f.write(contents)
+                self.assertEqual(compression, detect_compression(path))
+                self.assertEqual(expected, list(SeqReader().readfq_path(path)))
+                self.assertEqual(
+                    [(b'r1',b'ACGT'),(b'r2',b'AA')],
+                    list(SeqReader().readfa_path(path, bytes_mode=True, threads=2)))
+                with open_compressed(path, use_external_tools=False) as f:
+                    self.assertEqual(contents, f.read())
+
+    def test_process_reader_stderr(self):
+        # Much more than fits in a pipe is written to stderr before stdout
+        # is written, which must not block the process
+        script = "import sys; sys.stderr.write('x' * 1000000 + 'error'); " \
+            "sys.stdout.buffer.write(sys.stdin.buffer.read()); sys.exit(int(sys.argv[1]))"
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(b'contents')
+            f.flush()
+            reader = _ProcessReader([sys.executable, '-c', script, '0'], open(f.name, 'rb'))
+            self.assertEqual(b'contents', reader.read())
+            reader.close()
+            reader = _ProcessReader([sys.executable, '-c', script, '1'], open(f.name, 'rb'))
+            with self.assertRaisesRegex(Exception, 'exit status 1: x+error'):
+                reader.read()
+            reader.close()
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_read_batches(self):
+        contents = b"@r1\nACGT\n+\nIIII\n@r2\nGG\n+\n#I\n@r3\nA\n+\nI\n"
+        batches = list(SeqReader().read_batches(io.BytesIO(contents), batch_size=2))
+        self.assertEqual([2, 1], [len(b) for b in batches])
+        batch = batches[0]
+        self.assertEqual([b'r1', b'r2'], batch.names)
+        self.assertEqual(b'ACGTGG', batch.seqs)
+        self.assertEqual([0, 4], batch.offsets.tolist())
+        self.assertEqual([4, 2], batch.lengths.tolist())
+        self.assertEqual([40, 40, 40, 40, 2, 40], batch.qual_array().tolist())
+        self.assertEqual([2, 2], batch.gc_counts().tolist())
+        self.assertEqual(
+            [(b'r1', b'ACGT', b'IIII')],
+            list(batch.select(batch.lengths > 2)))
+        self.assertEqual(
+            [(b'r2', b'GG', b'#I'), (b'r1', b'ACGT', b'IIII'), (b'r2', b'GG', b'#I')],
+            list(batch.select(numpy.array([1, 0, 1]))))
+        self.assertEqual([], list(batch.select(batch.lengths > 10)))
+
+        # Batches span blocks, and are split within them
+        records = list(SeqReader().readfq(io.BytesIO(contents * 5), bytes_mode=True))
+        for block_size in (1, 20, 1024):
+            for batch_size in (1, 4, 100):
+                batches = list(SeqReader().read_batches(
+                    io.BytesIO(contents * 5), batch_size=batch_size, block_size=block_size))
+                self.assertEqual(records, [r for b in batches for r in b])
+                self.assertTrue(all(len(b) == batch_size for b in batches[:-1]))
+
+    def test_read_pairs(self):
+        forward = "@r1/1\nAC\n+\nII\n@r2/1\nGG\n+\nII\n"
+        reverse = "@r1/2\nTT\n+\nII\n@r2/2\nCC\n+\nII\n"
+        expected = [
+            (('r1/1','AC','II'), ('r1/2','TT','II')),
+            (('r2/1','GG','II'), ('r2/2','CC','II'))]
+        for prefetch in (False, True):
+            self.assertEqual(expected, list(SeqReader().read_pairs(
+                io.StringIO(forward), io.StringIO(reverse),
+                prefetch=prefetch, batch_size=1)))
+        interleaved = "@r1/1\nAC\n+\nII\n@r1/2\nTT\n+\nII\n" \
+            "@r2/1\nGG\n+\nII\n@r2/2\nCC\n+\nII\n"
+        for prefetch in (False, True):
+            self.assertEqual(expected, list(SeqReader().read_pairs(
+                io.StringIO(interleaved), prefetch=prefetch)))
+
+    def test_read_pairs_out_of_sync(self):
+        forward = b"@r1/1\nAC\n+\nII\n@r2/1\nGG\n+\nII\n"
+        reverse = b"@r1/2\nTT\n+\nII\n@r3/2\nCC\n+\nII\n"
+        with self.assertRaises(Exception):
+            list(SeqReader().read_pairs(
+                io.BytesIO(forward), io.BytesIO(reverse), bytes_mode=True))
+        with self.assertRaises(Exception):
+            list(SeqReader().read_pairs(
+                io.BytesIO(forward), io.BytesIO(reverse[:20]), bytes_mode=True,
+                prefetch=True))
+        # Only the start of the names is compared if requested
+        self.assertEqual(2, len(list(SeqReader().read_pairs(
+            io.BytesIO(forward), io.BytesIO(reverse), bytes_mode=True,
+            name_prefix_length=1))))
+
+    def test_readfq_prefetch(self):
+        contents = b"@r1\nACGT\n+\n@III\n>r2 desc\nAC\nGT\n@r3\nA\n+\nI\n" * 50
+        for block_size in (7, 1024):
+            self.assertEqual(
+                list(SeqReader().readfq(io.BytesIO(contents), bytes_mode=True)),
+                list(SeqReader().readfq_prefetch(
+                    io.BytesIO(contents), bytes_mode=True, block_size=block_size,
+                    max_queued_batches=1)))
+        self.assertEqual(
+            list(SeqReader().readfq(io.StringIO(contents.decode()))),
+            list(SeqReader().readfq_prefetch(io.StringIO(contents.decode()))))
+
+    def test_readfq_async(self):
+        contents = b"@r1\nACGT\n+\n@III\n>r2 desc\nAC\nGT\n@r3\nA\n+\nI\n" * 50
+        expected = list(SeqReader().readfq(io.BytesIO(contents), bytes_mode=True))
+
+        async def from_subprocess(path):
+            process = await asyncio.create_subprocess_exec(
+                'cat', path, stdout=asyncio.subprocess.PIPE)
+            records = [r async for r in SeqReader().readfq_async(process.stdout, block_size=5)]
+            await process.wait()
+            return records
+
+        async def stop_early():
+            stream = asyncio.StreamReader()
+            stream.feed_data(contents)
+            # No EOF is fed, so the parser is left waiting for more data
+            async for record in SeqReader().readfq_async(stream, max_queued_batches=1):
+                return record
+
+        with tempfile.NamedTemporaryFile(suffix='.fq') as f:
+            f.write(contents)
+            f.flush()
+            self.assertEqual(expected, asyncio.run(from_subprocess(f.name)))
+        self.assertEqual(expected[0], asyncio.run(stop_early()))
+
 if __name__ == "__main__":
     unittest.main()
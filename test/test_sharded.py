@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+import unittest
+import os.path
+import sys
+import tempfile
+import struct
+import zlib
+import gzip
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+import bird_tool_utils
+from bird_tool_utils import *
+from bird_tool_utils import ShardedSeqReader, detect_compression
+from conftest import fastq_file
+
+def _write_bgzf(path, data, block_size):
+    '''Write data as BGZF with uncompressed blocks of block_size bytes'''
+    with open(path, 'wb') as f:
+        for i in range(0, len(data) + 1, block_size):
+            chunk = data[i:i+block_size]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            compressed = compressor.compress(chunk) + compressor.flush()
+            f.write(b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00')
+            f.write(struct.pack('<H', len(compressed) + 25))
+            f.write(compressed)
+            f.write(struct.pack('<II', zlib.crc32(chunk), len(chunk)))
+            if len(chunk) == 0:
+                break
+
+def _records_list(records):
+    return list(records)
+
+class Tests(unittest.TestCase):
+    maxDiff = None
+
+    def _fastq(self):
+        # Quality lines starting with '@' make resynchronisation ambiguous
+        return fastq_file(
+            (('r{}'.format(i), 'ACGT'[i % 4] * (1 + i % 7), '@I'[i % 2] * (1 + i % 7))
+             for i in range(300)), description=None).getvalue()
+
+    def _check(self, path, expected):
+        for shards in (1, 3, 40):
+            for processes in (1, 2):
+                got = [record
+                       for shard in ShardedSeqReader(path, shards=shards).map(
+                           _records_list, processes=processes)
+                       for record in shard]
+                self.assertEqual(expected, got)
+        unordered = [record
+                     for shard in ShardedSeqReader(path, shards=5).map(
+                         _records_list, processes=2, ordered=False)
+                     for record in shard]
+        self.assertEqual(sorted(expected), sorted(unordered))
+
+    def test_plain_fastq(self):
+        data = self._fastq()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'reads.fq')
+            with open(path, 'wb') as f:
+                f.write(data)
+            self._check(path, list(SeqReader().readfq_bytes(open(path, 'rb'))))
+
+    def test_bgzf_fastq(self):
+        data = self._fastq()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'reads.fq.gz')
+            _write_bgzf(path, data, 500)
+            self.assertEqual('bgzf', detect_compression(path))
+            self._check(path, list(SeqReader().readfq_bytes(gzip.open(path))))
+
+    def test_plain_fasta(self):
+        data = ''.join('>c{}\n{}\n'.format(i, 'ACGTA\n' * (i % 5)) for i in range(100)).encode()
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'contigs.fa')
+            with open(path, 'wb') as f:
+                f.write(data)
+            self._check(path, list(SeqReader().readfq_bytes(open(path, 'rb'))))
+
+if __name__ == "__main__":
+    unittest.main()
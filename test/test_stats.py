@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import gzip
+import random
+import tempfile
+from unittest import mock
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import SeqStats, SeqReader
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+class Tests(unittest.TestCase):
+    def test_basic_fastq(self):
+        stats = SeqStats()
+        stats.add_records([
+            (b'r1', b'ACGT', b'IIII'),
+            (b'r2', b'GGGGGGGG', b'########'),
+            (b'r3', b'AT', b'!!')])
+        summary = stats.summary()
+        self.assertEqual(3, summary['num_records'])
+        self.assertEqual(14, summary['total_bases'])
+        self.assertEqual(2, summary['min_length'])
+        self.assertEqual(8, summary['max_length'])
+        self.assertAlmostEqual(14 / 3, summary['mean_length'])
+        self.assertEqual(8, summary['n50'])
+        self.assertEqual(2, summary['n90'])
+        self.assertAlmostEqual(10 / 14, summary['gc_fraction'])
+        self.assertAlmostEqual((4 * 40 + 8 * 2) / 14, summary['mean_quality'])
+        self.assertEqual([(2, 4, 1), (4, 8, 1), (8, 16, 1)], summary['length_histogram'])
+        self.assertFalse(summary['lengths_approximate'])
+
+    def test_text_fasta(self):
+        stats = SeqStats()
+        stats.add_records([('r1', 'acgtn'), ('r2', 'CC')])
+        summary = stats.summary()
+        self.assertEqual(7, summary['total_bases'])
+        self.assertAlmostEqual(4 / 7, summary['gc_fraction'])
+        self.assertIsNone(summary['mean_quality'])
+
+    def test_empty(self):
+        summary = SeqStats().summary()
+        self.assertEqual(0, summary['num_records'])
+        self.assertIsNone(summary['n50'])
+        self.assertIsNone(summary['mean_length'])
+
+    def test_collapsed_lengths(self):
+        rng = random.Random(1)
+        lengths = [rng.randint(1, 100000) for _ in range(2000)]
+        exact = SeqStats()
+        approximate = SeqStats(max_distinct_lengths=100)
+        for length in lengths:
+            exact.add('r', b'A' * length)
+            approximate.add('r', b'A' * length)
+        self.assertTrue(approximate.lengths_approximate)
+        self.assertLessEqual(len(approximate._length_counts), 100 * 10)
+        self.assertEqual(exact.summary()['total_bases'], approximate.summary()['total_bases'])
+        self.assertEqual(exact.max_length, approximate.max_length)
+        for statistic in ('n50', 'n90'):
+            self.assertAlmostEqual(1, approximate.summary()[statistic] / exact.summary()[statistic],
+                                   places=2)
+
+    def test_from_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'a.fq.gz')
+            with gzip.open(path, 'wt') as f:
+                for i in range(100):
+                    f.write('@r{}\n{}\n+\n{}\n'.format(i, 'GC' * i, 'I' * 2 * i))
+            summary = SeqStats.from_path(path).summary()
+        self.assertEqual(100, summary['num_records'])
+        self.assertEqual(9900, summary['total_bases'])
+        self.assertEqual(1.0, summary['gc_fraction'])
+        self.assertEqual(40, summary['mean_quality'])
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_batches_match_records(self):
+        records = [(b'r%d' % i, b'ACGTTG'[:i % 6 + 1] * (i + 1), b'5' * ((i % 6 + 1) * (i + 1)))
+                   for i in range(50)]
+        from bird_tool_utils import SeqBatch
+        by_batch = SeqStats()
+        by_batch.add_batch(SeqBatch.from_records(records[:20]))
+        by_batch.add_batch(SeqBatch.from_records(records[20:]))
+        by_record = SeqStats()
+        by_record.add_records(records)
+        self.assertEqual(by_record.summary(), by_batch.summary())
+
+    def test_without_numpy(self):
+        records = [(b'r%d' % i, b'ACGTTGca'[:i % 8 + 1], b'5I#!+'[i % 5:] * 2)
+                   for i in range(50)]
+        records = [(name, seq, qual[:len(seq)].ljust(len(seq), b'I'))
+                   for name, seq, qual in records]
+        with_numpy = SeqStats()
+        with_numpy.add_records(records)
+        with mock.patch('bird_tool_utils.stats._optional_numpy', return_value=None):
+            without_numpy = SeqStats()
+            without_numpy.add_records(records)
+            self.assertEqual(with_numpy.summary(), without_numpy.summary())
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import collections
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import subsample_reads
+from conftest import fastq_file
+
+RECORDS = [('r{}'.format(i), 'A' * (i % 7 + 1), 'I' * (i % 7 + 1)) for i in range(200)]
+
+class Tests(unittest.TestCase):
+    def test_length_and_name_filter(self):
+        got = list(subsample_reads(fastq_file(RECORDS), min_length=3, max_length=4,
+                                   name_filter=lambda name: not name.endswith(b'0')))
+        expected = [(name.encode(), seq.encode(), qual.encode()) for name, seq, qual in RECORDS
+                    if 3 <= len(seq) <= 4 and not name.endswith('0')]
+        self.assertEqual(expected, got)
+
+    def test_fraction_is_seeded(self):
+        first = list(subsample_reads(fastq_file(RECORDS), fraction=0.25, seed=7))
+        second = list(subsample_reads(fastq_file(RECORDS), fraction=0.25, seed=7, block_size=50))
+        self.assertEqual(first, second)
+        self.assertLess(10, len(first))
+        self.assertGreater(90, len(first))
+        self.assertEqual([], list(subsample_reads(fastq_file(RECORDS), fraction=0)))
+        self.assertEqual(200, len(list(subsample_reads(fastq_file(RECORDS), fraction=1))))
+
+    def test_reservoir(self):
+        got = list(subsample_reads(fastq_file(RECORDS), count=10, seed=1))
+        self.assertEqual(10, len(got))
+        # In file order
+        indices = [int(r[0][1:]) for r in got]
+        self.assertEqual(sorted(indices), indices)
+        self.assertEqual(got, list(subsample_reads(fastq_file(RECORDS), count=10, seed=1, block_size=30)))
+        self.assertEqual(200, len(list(subsample_reads(fastq_file(RECORDS), count=1000))))
+
+    def test_reservoir_is_uniform(self):
+        counts = collections.Counter()
+        records = RECORDS[:10]
+        for seed in range(3000):
+            for record in subsample_reads(fastq_file(records), count=3, seed=seed, block_size=20):
+                counts[record[0]] += 1
+        for count in counts.values():
+            self.assertAlmostEqual(900, count, delta=150)
+
+    def test_paired_files(self):
+        got = list(subsample_reads(
+            fastq_file(RECORDS, '/1'), fastq_file(RECORDS, '/2'), fraction=0.5, seed=3,
+            min_length=2, block_size=100))
+        self.assertLess(0, len(got))
+        for forward, reverse in got:
+            self.assertEqual(forward[0][:-2], reverse[0][:-2])
+            self.assertGreaterEqual(len(forward[1]), 2)
+
+        with self.assertRaises(Exception):
+            list(subsample_reads(fastq_file(RECORDS), fastq_file(RECORDS[:-1])))
+        with self.assertRaises(Exception):
+            list(subsample_reads(fastq_file(RECORDS), fastq_file(list(reversed(RECORDS)))))
+
+    def test_interleaved(self):
+        interleaved = [record for name, seq, qual in RECORDS[:20]
+                       for record in ((name + '/1', seq, qual), (name + '/2', seq, qual))]
+        got = list(subsample_reads(fastq_file(interleaved), interleaved=True, count=5, seed=2,
+                                   block_size=33))
+        self.assertEqual(5, len(got))
+        for forward, reverse in got:
+            self.assertTrue(forward[0].endswith(b'/1'))
+            self.assertEqual(forward[0][:-2] + b'/2', reverse[0])
+        with self.assertRaises(Exception):
+            list(subsample_reads(fastq_file(interleaved[:-1]), interleaved=True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+
+import unittest
+import os.path
+import sys
+import tempfile
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+from bird_tool_utils import timing
+from bird_tool_utils import stage
+
+from conftest import run_subcommand_script
+
+SCRIPT = '''
+from bird_tool_utils import BirdArgparser, stage
+
+@stage('decorated')
+def work():
+    return sum(range(1000))
+
+parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+parser.new_subparser('run', 'desc', allow_no_args=True)
+args = parser.parse_the_args()
+with stage('first'):
+    work()
+work()
+'''
+
+def _run(*arguments):
+    return run_subcommand_script(SCRIPT, *arguments)
+
+
+class Tests(unittest.TestCase):
+    def test_stage_disabled_records_nothing(self):
+        with stage('nothing'):
+            pass
+        self.assertNotIn('nothing', [s[0] for s in timing.timing_summary()])
+
+    def test_stage_records_when_enabled(self):
+        saved = timing._enabled
+        timing._enabled = True
+        try:
+            @stage('decorated')
+            def f():
+                return 1
+            with stage('context'):
+                f()
+            f()
+        finally:
+            timing._enabled = saved
+            summary = {s[0]: s for s in timing.timing_summary()}
+            timing._stages.clear()
+        self.assertEqual(2, summary['decorated'][1])
+        self.assertEqual(1, summary['context'][1])
+        self.assertGreaterEqual(summary['context'][2], 0)
+
+    def test_timing_flag(self):
+        output = _run('--timing')
+        self.assertIn('Timing summary', output)
+        self.assertIn('first', output)
+        self.assertIn('decorated', output)
+        self.assertIn('(2 runs)', output)
+        self.assertNotIn('Timing summary', _run())
+
+    def test_profile_flag(self):
+        import pstats
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'run.pstats')
+            _run('--profile', path)
+            stats = pstats.Stats(path)
+            self.assertTrue(any(function == 'work' for (_, _, function) in stats.stats))
+
+    def test_own_profile_and_timing_options_kept(self):
+        # Programs defining their own --profile and --timing keep them, and
+        # they do not turn on profiling or timing
+        script = '''
+import sys
+from bird_tool_utils import BirdArgparser
+parser = BirdArgparser(program='TestProgram', program_invocation='testprog')
+subparser = parser.new_subparser('run', 'desc', allow_no_args=True)
+subparser.add_argument('--profile', help='own profile option')
+subparser.add_argument('--timing', help='own timing option')
+args = parser.parse_the_args()
+with open(args.profile, 'w') as f:
+    f.write(args.timing)
+'''
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'profile.txt')
+            output = run_subcommand_script(script, '--profile', path, '--timing', 'own')
+            with open(path) as f:
+                self.assertEqual('own', f.read())
+        self.assertNotIn('Timing', output)
+
+if __name__ == "__main__":
+    unittest.main()
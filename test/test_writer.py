@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+#=======================================================================
+# Authors: Ben Woodcroft
+#
+# Unit tests.
+#
+# Copyright
+#
+# This is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# Distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.	See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License.
+# If not, see <http://www.gnu.org/licenses/>.
+#=======================================================================
+
+import unittest
+import os.path
+import sys
+import io
+import tempfile
+import gzip
+
+sys.path = [os.path.join(os.path.dirname(os.path.realpath(__file__)),'..')]+sys.path
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import bird_tool_utils
+from bird_tool_utils import *
+from bird_tool_utils import SeqWriter, open_compressed_writer
+from bird_tool_utils.compression import _ProcessWriter
+
+class Tests(unittest.TestCase):
+    maxDiff = None
+
+    def test_fasta_wrapping(self):
+        out = io.BytesIO()
+        with SeqWriter(out, line_width=3) as writer:
+            writer.write('seq1', 'ACGTACG')
+            writer.write(b'seq2', b'ACG')
+        self.assertEqual(b'>seq1\nACG\nTAC\nG\n>seq2\nACG\n', out.getvalue())
+
+    def test_fastq_small_buffer(self):
+        out = io.BytesIO()
+        with SeqWriter(out, buffer_size=1) as writer:
+            writer.write_records([('r1', 'AC', 'II'), ('r2', 'G', '#')])
+        self.assertEqual(b'@r1\nAC\n+\nII\n@r2\nG\n+\n#\n', out.getvalue())
+
+    def test_compressed_round_trip(self):
+        records = [(b'r%d' % i, b'ACGT' * i, b'I' * 4 * i) for i in range(100)]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'out.fq.gz')
+            for use_external_tools in (True, False):
+                with open_compressed_writer(
+                        path, use_external_tools=use_external_tools) as f:
+                    with SeqWriter(f) as writer:
+                        writer.write_records(records)
+                with gzip.open(path) as f:
+                    self.assertEqual(records, list(SeqReader().readfq_bytes(f)))
+            with SeqWriter(path, threads=2) as writer:
+                writer.write_records(records)
+            self.assertEqual(records, list(SeqReader().readfq_path(path, bytes_mode=True)))
+
+    def test_process_writer_stderr(self):
+        # Much more than fits in a pipe is written to stderr while stdin is
+        # being written, which must not block the process
+        script = "import sys; sys.stderr.write('x' * 1000000 + 'error'); " \
+            "sys.stdout.buffer.write(sys.stdin.buffer.read()); sys.exit(int(sys.argv[1]))"
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'out')
+            writer = _ProcessWriter([sys.executable, '-c', script, '0'], path)
+            writer.write(b'contents' * 100000)
+            writer.close()
+            with open(path, 'rb') as f:
+                self.assertEqual(b'contents' * 100000, f.read())
+            writer = _ProcessWriter([sys.executable, '-c', script, '1'], path)
+            with self.assertRaisesRegex(Exception, 'exit status 1: x+error'):
+                writer.close()
+
+    @unittest.skipIf(numpy is None, 'numpy not installed')
+    def test_write_batch(self):
+        contents = b"@r1\nACGT\n+\nIIII\n@r2\nGG\n+\n#I\n"
+        out = io.BytesIO()
+        with SeqWriter(out) as writer:
+            for batch in SeqReader().read_batches(io.BytesIO(contents)):
+                writer.write_batch(batch)
+        self.assertEqual(contents, out.getvalue())
+
+if __name__ == "__main__":
+    unittest.main()